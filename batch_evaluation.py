@@ -0,0 +1,101 @@
+import numpy as np
+
+from bitboard import BitboardPosition, find_raw_window_score
+
+
+EMPTY = 0     # values of the slots in the int8 board arrays taken by BatchEvaluator
+PLAYER_1 = 1
+PLAYER_2 = 2
+NOT_OVER = 0     # outcomes given by BatchEvaluator.find_winners (1 and 2 for the player who won)
+DRAW = 3
+
+
+def boards_to_array(boards, player_1_char, player_2_char):     # boards as taken by ConnectFourBot.find_best_move -> (N, num_rows, num_cols) int8 array
+    slot_values = {"": EMPTY, player_1_char: PLAYER_1, player_2_char: PLAYER_2}
+    return np.array([[[slot_values[slot] for slot in row] for row in board] for board in boards], dtype=np.int8)
+
+
+class BatchEvaluator(object):
+    # Scores many boards at once with the heuristic of ConnectFourBot.evaluation_function, giving exactly the floats of
+    # ConnectFourBot.evaluate_position. Boards come as an (N, num_rows, num_cols) int8 array (row 0 at the top, as in the board lists),
+    # holding EMPTY, PLAYER_1 or PLAYER_2 in every slot.
+    # Every window of num_to_connect slots (in a row, column or diagonal) is a row of window_slots, an index tensor into the flattened boards.
+    # The counters of a window are packed into a pattern of 2 * num_to_connect bits (player 1's in the low half, player 2's in the high half),
+    # which indexes window_scores: the raw score of the window (split penalty included, 0 if it holds both players' counters).
+    # Raw scores are then weighted by the integer weights of ConnectFourBot.find_weighted_lines and summed with one matrix product
+    def __init__(self, bot, num_rows=6, num_cols=7, batch_size=65536):
+        position = BitboardPosition(num_rows, num_cols, bot.num_to_connect)
+        num_to_connect = position.num_to_connect
+        weighted_lines, self.denominator = bot.find_weighted_lines(position)
+        window_slots = list()
+        window_weights = list()
+        for line_mask, lowest_bit, line_scores, weight in weighted_lines:
+            line_slots = list()
+            for bit_index in range(position.board_bits):     # in the order of the line, from its lowest bit
+                if line_mask >> bit_index & 1:
+                    col, height = divmod(bit_index, position.col_stride)
+                    line_slots.append((num_rows - height - 1) * num_cols + col)
+            for start in range(len(line_slots) - num_to_connect + 1):
+                window_slots.append(line_slots[start:start + num_to_connect])
+                window_weights.append(weight)
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_to_connect = num_to_connect
+        self.batch_size = batch_size    # boards scored at once, to bound the memory used by the (batch_size, num_windows, 4) intermediate arrays
+        self.window_slots = np.array(window_slots, dtype=np.intp)
+        self.window_weights = np.array(window_weights, dtype=np.int64)
+        pattern_dtype = np.uint8 if num_to_connect <= 4 else np.uint16 if num_to_connect <= 8 else np.uint32
+        self.slot_codes = np.array([[0, 1 << count, (1 << num_to_connect) << count] for count in range(num_to_connect)], dtype=pattern_dtype)    # [position in window, slot value] -> bits of the pattern
+        self.window_scores = np.zeros(1 << (2 * num_to_connect), dtype=np.int64)
+        for pattern in range(1 << (2 * num_to_connect)):
+            player_1_counts = [count for count in range(num_to_connect) if pattern >> count & 1]
+            player_2_counts = [count for count in range(num_to_connect) if pattern >> (count + num_to_connect) & 1]
+            if player_1_counts and not player_2_counts:
+                self.window_scores[pattern] = find_raw_window_score(player_1_counts)
+            elif player_2_counts and not player_1_counts:
+                self.window_scores[pattern] = -find_raw_window_score(player_2_counts)
+
+    def convert_boards(self, boards):     # boards -> (N, num_rows, num_cols) int8 array, checked to be of the size of this evaluator
+        boards = np.asarray(boards, dtype=np.int8)
+        if boards.ndim != 3 or boards.shape[1:] != (self.num_rows, self.num_cols):
+            raise Exception(f"Boards of shape {boards.shape} given to a BatchEvaluator of {self.num_rows}x{self.num_cols} boards, which takes an (N, {self.num_rows}, {self.num_cols}) array")
+        return boards
+
+    def find_window_patterns(self, boards):     # (N, num_rows, num_cols) int8 -> (N, num_windows) patterns
+        window_values = boards.reshape(len(boards), self.num_rows * self.num_cols)[:, self.window_slots]
+        slot_codes = self.slot_codes
+        patterns = slot_codes[0][window_values[:, :, 0]]
+        for count in range(1, self.num_to_connect):
+            patterns |= slot_codes[count][window_values[:, :, count]]
+        return patterns
+
+    def evaluate(self, boards):     # (N,) float64 array of utilities, positive = good for player 1
+        boards = self.convert_boards(boards)
+        utilities = np.empty(len(boards), dtype=np.float64)
+        for start in range(0, len(boards), self.batch_size):
+            patterns = self.find_window_patterns(boards[start:start + self.batch_size])
+            # integer sums of the weighted scores, divided once at the end like evaluate_position, so the floats come out the same
+            utilities[start:start + self.batch_size] = (self.window_scores[patterns] @ self.window_weights) / self.denominator
+        return utilities
+
+    def has_connected_line(self, player_slots):     # (N, num_rows, num_cols) bool -> (N,) bool, by ANDing each slot with its next num_to_connect - 1 neighbours in every direction
+        has_connected_line = np.zeros(len(player_slots), dtype=bool)
+        num_steps = self.num_to_connect - 1
+        for row_step, col_step in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+            num_rows = self.num_rows - num_steps * row_step
+            num_cols = self.num_cols - num_steps * abs(col_step)
+            if num_rows <= 0 or num_cols <= 0:
+                continue
+            first_col = num_steps if col_step < 0 else 0
+            windows = player_slots[:, :num_rows, first_col:first_col + num_cols].copy()
+            for count in range(1, num_steps + 1):
+                windows &= player_slots[:, count * row_step:count * row_step + num_rows, first_col + count * col_step:first_col + count * col_step + num_cols]
+            has_connected_line |= windows.any(axis=(1, 2))
+        return has_connected_line
+
+    def find_winners(self, boards):     # (N,) int8 array of outcomes: NOT_OVER, PLAYER_1 or PLAYER_2 for the player who won, or DRAW
+        boards = self.convert_boards(boards)
+        outcomes = np.where((boards != EMPTY).all(axis=(1, 2)), DRAW, NOT_OVER).astype(np.int8)
+        outcomes[self.has_connected_line(boards == PLAYER_2)] = PLAYER_2
+        outcomes[self.has_connected_line(boards == PLAYER_1)] = PLAYER_1     # player 1 is checked first in BitboardPosition.find_winner, so it wins ties
+        return outcomes
@@ -0,0 +1,851 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import BitboardPosition
+from connect_four import ConnectFourBot
+from endgame_table import EndgameTable, play_source_games
+from opening_book import OpeningBook
+from transposition_table import SharedTranspositionTable, TranspositionTable
+
+
+PLAYER_1_CHAR = "H"
+PLAYER_2_CHAR = "R"
+
+POSITION_SUITE = [     # (stage, moves played so far), where each digit is a column from 1 to 7 and player 1 moves first
+    ("opening", ""),
+    ("opening", "4"),
+    ("opening", "44"),
+    ("opening", "4453"),
+    ("opening", "433254"),
+    ("opening", "32253236"),
+    ("midgame", "5147256453"),
+    ("midgame", "413211444126"),
+    ("midgame", "24434552152255"),
+    ("midgame", "5721514412767724"),
+    ("midgame", "545562561723462112"),
+    ("endgame", "331542214622452516535443"),
+    ("endgame", "2361345636334325222444512476"),
+    ("endgame", "416332623572455457663356356124"),
+]
+
+SOLVER_SUITE = [     # (difficulty, moves played so far, exact score for the player to move), easiest first
+    ("easy", "474442422242767666776267", -3),
+    ("easy", "647234442422426666267777", -1),
+    ("easy", "257755544444522274753333", -2),
+    ("easy", "45335533125422531225", -2),
+    ("easy", "713131133555566666522222", 0),
+    ("easy", "13544445455541516717", 2),
+    ("medium", "521125554662662526", 4),
+    ("medium", "474442422242767666", 4),
+    ("medium", "536334434443", 6),
+    ("medium", "257755544444522274", -1),
+    ("medium", "117533335552522317", -3),
+    ("medium", "324624444224666263", 1),
+    ("hard", "767677664444", 2),
+    ("hard", "13725555333636", -1),
+    ("hard", "67674635744445", 1),
+]
+
+
+def build_position(moves, num_rows=6, num_cols=7):
+    position = BitboardPosition(num_rows, num_cols)
+    is_minimiser = False    # player 1 moves first
+    for move in moves:
+        position.make_move(int(move) - 1, is_minimiser)
+        is_minimiser = not is_minimiser
+    return position
+
+
+def run_search(moves, depth, **bot_options):
+    position = build_position(moves)
+    is_minimiser = position.num_counters % 2 == 1
+    bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=is_minimiser, **bot_options)
+    start_time = time.perf_counter()
+    utility, best_action = bot.find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+    time_taken = time.perf_counter() - start_time
+    bot.close()
+    return utility, best_action, bot.num_nodes_searched, time_taken
+
+
+def benchmark_move_ordering(depth):
+    print(f"Move ordering at depth {depth} (nodes searched, effective branching factor = nodes ** (1 / depth), time in seconds)")
+    print(f"{'stage':<8} {'moves':<32} {'nodes off':>10} {'nodes on':>10} {'EBF off':>8} {'EBF on':>8} {'time off':>9} {'time on':>9}")
+    total_nodes_off = 0
+    total_nodes_on = 0
+    for stage, moves in POSITION_SUITE:
+        utility_off, best_action_off, nodes_off, time_off = run_search(moves, depth, move_ordering=False)
+        utility_on, best_action_on, nodes_on, time_on = run_search(moves, depth, move_ordering=True)
+        total_nodes_off += nodes_off
+        total_nodes_on += nodes_on
+        print(f"{stage:<8} {moves or '(empty)':<32} {nodes_off:>10} {nodes_on:>10} {nodes_off ** (1 / depth):>8.2f} {nodes_on ** (1 / depth):>8.2f} {time_off:>9.3f} {time_on:>9.3f}")
+    print(f"Total nodes: {total_nodes_off} without move ordering, {total_nodes_on} with move ordering ({total_nodes_on / total_nodes_off:.1%})")
+
+
+def benchmark_symmetry_folding(depth):
+    print(f"Symmetry folding at depth {depth} (nodes searched and time in seconds, with a position and its mirror image kept apart or sharing one table entry)")
+    print(f"{'stage':<8} {'moves':<32} {'nodes off':>10} {'nodes on':>10} {'time off':>9} {'time on':>9} {'same utility':>12}")
+    total_nodes_off = 0
+    total_nodes_on = 0
+    for stage, moves in POSITION_SUITE:
+        utility_off, best_action_off, nodes_off, time_off = run_search(moves, depth, symmetry_folding=False)
+        utility_on, best_action_on, nodes_on, time_on = run_search(moves, depth, symmetry_folding=True)
+        total_nodes_off += nodes_off
+        total_nodes_on += nodes_on
+        print(f"{stage:<8} {moves or '(empty)':<32} {nodes_off:>10} {nodes_on:>10} {time_off:>9.3f} {time_on:>9.3f} {str(utility_off == utility_on):>12}")
+    print(f"Total nodes: {total_nodes_off} without symmetry folding, {total_nodes_on} with symmetry folding ({total_nodes_on / total_nodes_off:.1%})")
+
+
+def benchmark_parallel_search(depths, worker_counts):
+    # worker processes are started before the clock starts, so that only search time is compared
+    print(f"Parallel root search on {len(POSITION_SUITE)} positions (wall-clock seconds, speedup over 1 worker, whether every move matched the serial search)")
+    print(f"{'depth':>5} {'workers':>7} {'time':>9} {'speedup':>8} {'same moves':>10}")
+    for depth in depths:
+        serial_time = None
+        serial_results = list()
+        for num_workers in worker_counts:
+            total_time = 0
+            is_same_as_serial = True
+            for position_index, (stage, moves) in enumerate(POSITION_SUITE):
+                position = build_position(moves)
+                bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=position.num_counters % 2 == 1, num_workers=num_workers)
+                if num_workers > 1:
+                    bot.find_parallel_root_search()
+                start_time = time.perf_counter()
+                utility_and_action = bot.find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+                total_time += time.perf_counter() - start_time
+                bot.close()
+                if serial_time is None:
+                    serial_results.append(utility_and_action)
+                elif utility_and_action != serial_results[position_index]:
+                    is_same_as_serial = False
+            if serial_time is None:
+                serial_time = total_time
+            print(f"{depth:>5} {num_workers:>7} {total_time:>9.2f} {serial_time / total_time:>8.2f} {str(is_same_as_serial):>10}")
+
+
+def search_suite(depth, position_order, transposition_table_size_in_mb, transposition_table=None):     # runs in a worker process of benchmark_shared_table
+    if transposition_table is None:
+        transposition_table = TranspositionTable(transposition_table_size_in_mb)
+    num_nodes_searched = 0
+    for position_index in position_order:
+        stage, moves = POSITION_SUITE[position_index]
+        position = build_position(moves)
+        bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=position.num_counters % 2 == 1, transposition_table=transposition_table)
+        bot.find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+        num_nodes_searched += bot.num_nodes_searched
+    statistics = transposition_table.get_statistics()
+    transposition_table.close()
+    return num_nodes_searched, statistics["num_hits"], statistics["num_misses"]
+
+
+def benchmark_shared_table(depth, num_processes, transposition_table_size_in_mb):
+    # every process searches the whole suite, starting from a different position, as separate games on a server would;
+    # with private tables each process has to find everything out for itself, with a shared table it can use what the others found
+    print(f"{num_processes} processes each searching the suite at depth {depth} (hit rate = probes found in the table, throughput = nodes searched per second)")
+    print(f"{'table':<8} {'nodes':>10} {'hits':>10} {'hit rate':>9} {'time':>8} {'nodes/s':>9}")
+    for table_kind in ["private", "shared"]:
+        shared_transposition_table = None
+        if table_kind == "shared":
+            shared_transposition_table = SharedTranspositionTable(transposition_table_size_in_mb)
+        with ProcessPoolExecutor(max_workers=num_processes) as executor:
+            start_time = time.perf_counter()
+            futures = list()
+            for process_index in range(num_processes):
+                first_position_index = process_index * len(POSITION_SUITE) // num_processes
+                position_order = [(first_position_index + offset) % len(POSITION_SUITE) for offset in range(len(POSITION_SUITE))]
+                futures.append(executor.submit(search_suite, depth, position_order, transposition_table_size_in_mb, shared_transposition_table))
+            results = [future.result() for future in futures]
+            time_taken = time.perf_counter() - start_time
+        if shared_transposition_table is not None:
+            shared_transposition_table.close()
+        total_nodes = sum(num_nodes_searched for num_nodes_searched, num_hits, num_misses in results)
+        total_hits = sum(num_hits for num_nodes_searched, num_hits, num_misses in results)
+        total_probes = sum(num_hits + num_misses for num_nodes_searched, num_hits, num_misses in results)
+        print(f"{table_kind:<8} {total_nodes:>10} {total_hits:>10} {total_hits / total_probes:>9.1%} {time_taken:>8.2f} {total_nodes / time_taken:>9.0f}")
+
+
+def benchmark_opening_book(opening_book_path):
+    opening_book = OpeningBook(opening_book_path)
+    depth = opening_book.depth_of_search
+    print(f"Opening book {opening_book_path}: {opening_book.num_entries} positions with up to {opening_book.num_plies} counters, searched at depth {depth}")
+    print(f"{'moves':<10} {'search time':>12} {'book time':>10} {'same move':>9}")
+    opening_book.close()
+    for stage, moves in POSITION_SUITE:
+        if len(moves) > opening_book.num_plies:
+            continue
+        utility_searched, best_action_searched, nodes, search_time = run_search(moves, depth)
+        utility_booked, best_action_booked, nodes, book_time = run_search(moves, depth, opening_book_path=opening_book_path)
+        print(f"{moves or '(empty)':<10} {search_time * 1000:>10.1f}ms {book_time * 1e6:>8.1f}us {str(best_action_searched == best_action_booked):>9}")
+
+
+def benchmark_solver(difficulties, is_weak):
+    print(f"{'Weak' if is_weak else 'Strong'} solve of the solver suite (score for the player to move, nodes searched, time in seconds)")
+    print(f"{'difficulty':<10} {'moves':<26} {'expected':>8} {'score':>6} {'nodes':>9} {'time':>8}")
+    totals = dict()     # difficulty -> [positions, nodes, time]
+    for difficulty, moves, expected_score in SOLVER_SUITE:
+        if difficulty not in difficulties:
+            continue
+        position = build_position(moves)
+        bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, None, is_minimiser=position.num_counters % 2 == 1)
+        bot.find_solver(position)     # allocated before the clock starts
+        start_time = time.perf_counter()
+        utility, best_action = bot.solve(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR), is_weak)
+        time_taken = time.perf_counter() - start_time
+        score = -utility if bot.is_minimiser else utility
+        if is_weak:
+            expected_score = (expected_score > 0) - (expected_score < 0)
+            score = (score > 0) - (score < 0)
+        if score != expected_score:
+            raise Exception(f"Solver gave {score} instead of {expected_score} for {moves}")
+        print(f"{difficulty:<10} {moves:<26} {expected_score:>8} {score:>6} {bot.num_nodes_searched:>9} {time_taken:>8.3f}")
+        difficulty_totals = totals.setdefault(difficulty, [0, 0, 0])
+        difficulty_totals[0] += 1
+        difficulty_totals[1] += bot.num_nodes_searched
+        difficulty_totals[2] += time_taken
+    for difficulty, (num_positions, total_nodes, total_time) in totals.items():
+        print(f"{difficulty}: mean {total_nodes / num_positions:.0f} nodes and {total_time / num_positions:.3f}s per position")
+
+
+def play_bot_against_bot(depth, opening_moves, transposition_table_path=None):     # returns the nodes searched by both bots in the game
+    transposition_table = TranspositionTable()     # shared by both bots, as a server would have one table per game
+    bots = [ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=is_minimiser, transposition_table=transposition_table) for is_minimiser in [False, True]]
+    position = build_position(opening_moves)
+    if transposition_table_path is not None:
+        transposition_table.load(transposition_table_path, bots[0].find_table_game(position))
+    is_minimiser = position.num_counters % 2 == 1
+    while not position.find_winner():
+        utility, best_action = bots[is_minimiser].find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+        position.make_move(best_action, is_minimiser)
+        is_minimiser = not is_minimiser
+    if transposition_table_path is not None:
+        transposition_table.save(transposition_table_path)
+    transposition_table.close()
+    return sum(bot.num_nodes_searched for bot in bots)
+
+
+def benchmark_persistent_table(depth, num_games):
+    # the same games (bot against bot, after 2 random opening moves) played with tables that start cold every game,
+    # then with a table saved at the end of every game and loaded at the start of the next
+    random_generator = random.Random(0)
+    openings = [f"{random_generator.randint(1, 7)}{random_generator.randint(1, 7)}" for game in range(num_games)]
+    print(f"{num_games} games of bot against bot at depth {depth}, each after 2 random opening moves")
+    print(f"{'table':<11} {'nodes':>10} {'time':>8} {'games/s':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        transposition_table_path = os.path.join(directory, "transposition_table.bin")
+        for table_kind in ["cold", "persistent"]:
+            total_nodes = 0
+            start_time = time.perf_counter()
+            for opening_moves in openings:
+                total_nodes += play_bot_against_bot(depth, opening_moves, transposition_table_path if table_kind == "persistent" else None)
+            time_taken = time.perf_counter() - start_time
+            print(f"{table_kind:<11} {total_nodes:>10} {time_taken:>8.2f} {num_games / time_taken:>8.2f}")
+        print(f"Saved table: {os.path.getsize(transposition_table_path) / 1024 / 1024:.1f} MB")
+
+
+def benchmark_table_reuse(depth, opening_moves):
+    # one game of bot against bot with a table shared by both bots, showing for every move how many of its table probes
+    # were answered by entries stored while searching earlier moves
+    transposition_table = TranspositionTable()
+    bots = [ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=is_minimiser, transposition_table=transposition_table) for is_minimiser in [False, True]]
+    position = build_position(opening_moves)
+    is_minimiser = position.num_counters % 2 == 1
+    print(f"Bot against bot at depth {depth}, after the opening moves {opening_moves!r}")
+    print(f"{'move':>4} {'col':>3} {'nodes':>8} {'hit rate':>8} {'reuse':>6}")
+    while not position.find_winner():
+        bot = bots[is_minimiser]
+        num_nodes_before = bot.num_nodes_searched
+        num_hits_before = transposition_table.num_hits
+        num_probes_before = transposition_table.num_hits + transposition_table.num_misses
+        utility, best_action = bot.find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+        num_probes = transposition_table.num_hits + transposition_table.num_misses - num_probes_before
+        hit_rate = (transposition_table.num_hits - num_hits_before) / num_probes if num_probes else 0
+        position.make_move(best_action, is_minimiser)
+        print(f"{position.num_counters:>4} {best_action + 1:>3} {bot.num_nodes_searched - num_nodes_before:>8} {hit_rate:>8.1%} {bot.table_reuse_rates[-1]:>6.1%}")
+        is_minimiser = not is_minimiser
+    reuse_rates = bots[0].table_reuse_rates + bots[1].table_reuse_rates
+    print(f"Mean reuse rate: {sum(reuse_rates) / len(reuse_rates):.1%}")
+    transposition_table.close()
+
+
+def play_against_simulated_human(depth, think_time_in_seconds, pondering, opponent_depth):
+    # the bot (player 2) against a shallow bot standing in for a human, who takes think_time_in_seconds over every move;
+    # returns the (column, seconds from the human's move to the bot's answer, whether the answer was pondered) of every bot move
+    bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=True, pondering=pondering)
+    human = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, opponent_depth, is_minimiser=False, transposition_table_size_in_mb=4)
+    position = build_position("")
+    bot_moves = list()
+    while True:
+        utility, human_action = human.find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+        bot.start_pondering(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+        time.sleep(think_time_in_seconds)
+        position.make_move(human_action, is_minimiser=False)
+        if position.find_winner():
+            break
+        num_moves_answered_before = bot.ponderer.num_moves_answered if pondering else 0
+        start_time = time.perf_counter()
+        utility, bot_action = bot.find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+        latency = time.perf_counter() - start_time
+        is_pondered = pondering and bot.ponderer.num_moves_answered > num_moves_answered_before
+        bot_moves.append((bot_action, latency, is_pondered))
+        position.make_move(bot_action, is_minimiser=True)
+        if position.find_winner():
+            break
+    bot.close()
+    human.close()
+    return bot_moves
+
+
+def benchmark_pondering(depth, think_time_in_seconds, opponent_depth):
+    print(f"Bot at depth {depth} against a depth {opponent_depth} bot standing in for a human who thinks for {think_time_in_seconds}s per move")
+    print("Latency = seconds from the human's move to the bot's answer; * = answered from the search done while the human was thinking")
+    results = [play_against_simulated_human(depth, think_time_in_seconds, pondering, opponent_depth) for pondering in [False, True]]
+    print(f"{'move':>4} {'col off':>7} {'latency off':>11} {'col on':>6} {'latency on':>11}")
+    for move_index in range(max(len(bot_moves) for bot_moves in results)):
+        row = f"{move_index + 1:>4}"
+        for bot_moves, width in zip(results, [7, 6]):
+            if move_index < len(bot_moves):
+                bot_action, latency, is_pondered = bot_moves[move_index]
+                row += f" {bot_action + 1:>{width}} {latency:>10.3f}{'*' if is_pondered else ' '}"
+        print(row)
+    for pondering, bot_moves in zip(["off", "on"], results):
+        latencies = [latency for bot_action, latency, is_pondered in bot_moves]
+        print(f"Pondering {pondering}: mean latency {sum(latencies) / len(latencies):.3f}s, max {max(latencies):.3f}s, {sum(is_pondered for bot_action, latency, is_pondered in bot_moves)} of {len(bot_moves)} moves pondered")
+
+
+def build_random_positions(num_positions, seed=0, num_rows=6, num_cols=7, num_to_connect=4):     # positions after random moves, of every length (won games included)
+    random_generator = random.Random(seed)
+    positions = list()
+    for position_index in range(num_positions):
+        position = BitboardPosition(num_rows, num_cols, num_to_connect)
+        is_minimiser = False
+        for move_index in range(random_generator.randint(0, num_rows * num_cols)):
+            if position.find_winner():
+                break
+            position.make_move(random_generator.choice(position.find_available_actions()), is_minimiser)
+            is_minimiser = not is_minimiser
+        positions.append(position)
+    return positions
+
+
+BATCH_CHECK_BOARD_SIZES = [(5, 6, 4), (7, 9, 5), (4, 4, 3)]     # (num_rows, num_cols, num_to_connect) of the other boards the batch results are checked on
+
+
+def benchmark_batch_evaluation(num_positions):
+    import numpy as np     # optional dependency, only needed by this benchmark
+    from batch_evaluation import BatchEvaluator, boards_to_array
+    bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, 1, is_minimiser=False, transposition_table_size_in_mb=1)
+    positions = build_random_positions(num_positions)
+    boards = [position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR) for position in positions]
+    batch_evaluator = BatchEvaluator(bot)
+    start_time = time.perf_counter()
+    board_array = boards_to_array(boards, PLAYER_1_CHAR, PLAYER_2_CHAR)
+    conversion_time = time.perf_counter() - start_time
+    print(f"{num_positions} random positions ({conversion_time:.2f}s to convert the boards to an array, not included below)")
+    print(f"{'evaluator':<36} {'time':>8} {'positions/s':>12}")
+    timings = list()
+    for name, evaluate in [("evaluation_function (board lists)", lambda: [bot.evaluation_function(board) for board in boards]),
+                           ("evaluate_position (bitboards)", lambda: [bot.evaluate_position(position) for position in positions]),
+                           ("BatchEvaluator.evaluate", lambda: batch_evaluator.evaluate(board_array)),
+                           ("find_winner (bitboards)", lambda: [position.find_winner() for position in positions]),
+                           ("BatchEvaluator.find_winners", lambda: batch_evaluator.find_winners(board_array))]:
+        start_time = time.perf_counter()
+        results = evaluate()
+        time_taken = time.perf_counter() - start_time
+        timings.append(results)
+        print(f"{name:<36} {time_taken:>8.3f} {num_positions / time_taken:>12.0f}")
+    scalar_utilities, bitboard_utilities, batch_utilities, winners, batch_winners = timings
+    print(f"Largest difference from evaluation_function (which adds up its floats in another order): {float(np.abs(batch_utilities - np.array(scalar_utilities)).max()):.2e}")
+    check_batch_results(positions, bitboard_utilities, batch_utilities, winners, batch_winners, "6x7 connect-4")
+    for num_rows, num_cols, num_to_connect in BATCH_CHECK_BOARD_SIZES:     # the results must match on other boards too
+        bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, 1, is_minimiser=False, transposition_table_size_in_mb=1, num_to_connect=num_to_connect)
+        positions = build_random_positions(max(100, num_positions // 10), 1, num_rows, num_cols, num_to_connect)
+        board_array = boards_to_array([position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR) for position in positions], PLAYER_1_CHAR, PLAYER_2_CHAR)
+        batch_evaluator = BatchEvaluator(bot, num_rows, num_cols)
+        check_batch_results(positions, [bot.evaluate_position(position) for position in positions], batch_evaluator.evaluate(board_array),
+                            [position.find_winner() for position in positions], batch_evaluator.find_winners(board_array), f"{num_rows}x{num_cols} connect-{num_to_connect}")
+
+
+def check_batch_results(positions, bitboard_utilities, batch_utilities, winners, batch_winners, board_name):
+    # raises unless BatchEvaluator gave exactly the utilities of evaluate_position and the outcomes of find_winner
+    import numpy as np     # optional dependency, only needed by the batch evaluation benchmark
+    outcome_codes = {None: 0, "1": 1, "2": 2, "draw": 3}
+    num_different_utilities = int((batch_utilities != np.array(bitboard_utilities)).sum())
+    num_different_outcomes = int((batch_winners != np.array([outcome_codes[winner] for winner in winners])).sum())
+    print(f"{board_name}: {num_different_utilities} utilities differing from evaluate_position and {num_different_outcomes} outcomes differing from find_winner, "
+          f"out of {len(positions)} positions")
+    if num_different_utilities or num_different_outcomes:
+        raise Exception(f"BatchEvaluator does not match the scalar functions on {board_name} boards")
+
+
+def benchmark_search_stats(depth, output_path):
+    # SearchStats of every suite position, written as JSONL if output_path is given, and the time of the suite with and without collecting them
+    print(f"Search stats at depth {depth}")
+    print(f"{'stage':<8} {'moves':<32} {'nodes':>8} {'leaves':>8} {'terminal':>8} {'hit rate':>8} {'first cut':>9} {'EBF':>6} {'PV':<12}")
+    output_file = None
+    if output_path is not None:
+        output_file = open(output_path, "w")
+    total_times = {False: 0, True: 0}
+    for stage, moves in POSITION_SUITE:
+        for search_stats in [False, True]:
+            utility, best_action, num_nodes_searched, time_taken = run_search(moves, depth, search_stats=search_stats)
+            total_times[search_stats] += time_taken
+        collected_stats = list()
+        run_search(moves, depth, search_stats_hook=collected_stats.append)
+        stats = collected_stats[0].to_dict()
+        if output_file is not None:
+            output_file.write(json.dumps({"stage": stage, "moves": moves, "depth": depth, **stats}) + "\n")
+        hit_rate = stats["num_table_hits"] / stats["num_table_probes"] if stats["num_table_probes"] else 0
+        num_beta_cutoffs = sum(stats["beta_cutoffs_by_move_index"])
+        first_move_cutoff_rate = stats["beta_cutoffs_by_move_index"][0] / num_beta_cutoffs if num_beta_cutoffs else 0     # how often the first move tried was good enough
+        principal_variation = "".join(str(action + 1) for action in stats["principal_variation"])
+        print(f"{stage:<8} {moves or '(empty)':<32} {stats['num_nodes']:>8} {stats['num_leaf_evaluations']:>8} {stats['num_terminal_positions']:>8} {hit_rate:>8.1%} {first_move_cutoff_rate:>9.1%} "
+              f"{stats['effective_branching_factor']:>6.2f} {principal_variation:<12}")
+    if output_file is not None:
+        output_file.close()
+        print(f"Stats written to {output_path}")
+    print(f"Suite time: {total_times[False]:.2f}s without stats, {total_times[True]:.2f}s with stats")
+
+
+THREAT_ANALYSIS_SETTINGS = [     # (name, bot options) compared by benchmark_threat_analysis, the first being the baseline
+    ("off", {}),
+    ("pruning", {"threat_analysis": True}),
+    ("extensions", {"threat_analysis": True, "forced_move_extensions": True}),
+]
+
+
+def play_settings_game(depth, opening_moves, bot_options_of_players):     # returns the winner ("1", "2" or "draw") of a game between bots with the given options
+    bots = [ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=is_minimiser, **bot_options_of_players[player])
+            for is_minimiser, player in [(False, "1"), (True, "2")]]
+    position = build_position(opening_moves)
+    is_minimiser = position.num_counters % 2 == 1
+    while not position.find_winner():
+        utility, best_action = bots[is_minimiser].find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+        position.make_move(best_action, is_minimiser)
+        is_minimiser = not is_minimiser
+    for bot in bots:
+        bot.close()
+    return position.find_winner()
+
+
+def benchmark_threat_analysis(depth, num_games):
+    print(f"Threat analysis at depth {depth} (nodes searched and time in seconds; pruning = win/block detection and no moves under a winning slot of the opponent, "
+          f"extensions = pruning and single replies searched one move deeper)")
+    print(f"{'stage':<8} {'moves':<32} " + " ".join(f"{'nodes ' + name:>16} {'time ' + name:>15}" for name, bot_options in THREAT_ANALYSIS_SETTINGS) + f" {'same move':>9}")
+    total_nodes = {name: 0 for name, bot_options in THREAT_ANALYSIS_SETTINGS}
+    for stage, moves in POSITION_SUITE:
+        results = [run_search(moves, depth, **bot_options) for name, bot_options in THREAT_ANALYSIS_SETTINGS]
+        for (name, bot_options), (utility, best_action, num_nodes, time_taken) in zip(THREAT_ANALYSIS_SETTINGS, results):
+            total_nodes[name] += num_nodes
+        is_same_move = all(best_action == results[0][1] for utility, best_action, num_nodes, time_taken in results)
+        print(f"{stage:<8} {moves or '(empty)':<32} " + " ".join(f"{num_nodes:>16} {time_taken:>15.3f}" for utility, best_action, num_nodes, time_taken in results) + f" {str(is_same_move):>9}")
+    baseline_name = THREAT_ANALYSIS_SETTINGS[0][0]
+    print("Total nodes: " + ", ".join(f"{total_nodes[name]} {name} ({total_nodes[name] / total_nodes[baseline_name]:.1%})" for name, bot_options in THREAT_ANALYSIS_SETTINGS))
+    # strength: games against the baseline bot at the same depth, each after 2 random opening moves, moving first in every other game
+    for name, bot_options in THREAT_ANALYSIS_SETTINGS[1:]:
+        random_generator = random.Random(0)
+        results = {"won": 0, "drawn": 0, "lost": 0}
+        for game_index in range(num_games):
+            opening_moves = f"{random_generator.randint(1, 7)}{random_generator.randint(1, 7)}"
+            player = "1" if game_index % 2 == 0 else "2"
+            opponent = "2" if player == "1" else "1"
+            winner = play_settings_game(depth, opening_moves, {player: bot_options, opponent: THREAT_ANALYSIS_SETTINGS[0][1]})
+            if winner == player:
+                results["won"] += 1
+            elif winner == "draw":
+                results["drawn"] += 1
+            else:
+                results["lost"] += 1
+        if num_games > 0:
+            points = results["won"] + results["drawn"] / 2
+            print(f"{name}: {results['won']} won, {results['drawn']} drawn, {results['lost']} lost of {num_games} games against {baseline_name} ({points / num_games:.1%} of the points)")
+
+
+def benchmark_search_windows(depth, aspiration_window):
+    # every setting deepens iteratively up to depth, since aspiration windows are centred on the utilities of the earlier iterations
+    settings = [     # (name, bot options), the first being the baseline
+        ("plain", dict()),
+        ("pvs", dict(principal_variation_search=True)),
+        ("aspiration", dict(aspiration_window=aspiration_window)),
+        ("both", dict(principal_variation_search=True, aspiration_window=aspiration_window)),
+    ]
+    print(f"Principal variation search and aspiration windows (half width {aspiration_window}), iterative deepening up to depth {depth} "
+          f"(nodes searched and time to move in seconds)")
+    print(f"{'stage':<8} {'moves':<32} " + " ".join(f"{'nodes ' + name:>16} {'time ' + name:>15}" for name, bot_options in settings) + f" {'same utility':>12}")
+    total_nodes = {name: 0 for name, bot_options in settings}
+    total_time = {name: 0 for name, bot_options in settings}
+    for stage, moves in POSITION_SUITE:
+        results = [run_search(moves, depth, time_limit_in_seconds=float("inf"), **bot_options) for name, bot_options in settings]
+        for (name, bot_options), (utility, best_action, num_nodes, time_taken) in zip(settings, results):
+            total_nodes[name] += num_nodes
+            total_time[name] += time_taken
+        is_same_utility = all(utility == results[0][0] for utility, best_action, num_nodes, time_taken in results)
+        print(f"{stage:<8} {moves or '(empty)':<32} " + " ".join(f"{num_nodes:>16} {time_taken:>15.3f}" for utility, best_action, num_nodes, time_taken in results) + f" {str(is_same_utility):>12}")
+    baseline_name = settings[0][0]
+    print("Total: " + ", ".join(f"{name} {total_nodes[name]} nodes ({total_nodes[name] / total_nodes[baseline_name]:.1%}) in {total_time[name]:.2f}s "
+                                f"({total_time[name] / total_time[baseline_name]:.1%})" for name, bot_options in settings))
+    # principal variation search also applies to a single search to the full depth, without iterative deepening
+    fixed_depth_results = [[run_search(moves, depth, **bot_options) for stage, moves in POSITION_SUITE] for bot_options in [dict(), dict(principal_variation_search=True)]]
+    plain_nodes, pvs_nodes = [sum(num_nodes for utility, best_action, num_nodes, time_taken in results) for results in fixed_depth_results]
+    plain_time, pvs_time = [sum(time_taken for utility, best_action, num_nodes, time_taken in results) for results in fixed_depth_results]
+    print(f"Fixed depth {depth}: plain {plain_nodes} nodes in {plain_time:.2f}s, pvs {pvs_nodes} nodes ({pvs_nodes / plain_nodes:.1%}) in {pvs_time:.2f}s ({pvs_time / plain_time:.1%})")
+
+
+def benchmark_endgame_table(endgame_table_path, depth, num_games, num_plies_before, seed):
+    # positions num_plies_before moves before the endgames of the games the table was made from (with the default options of endgame_table.py),
+    # searched with and without the table
+    endgame_table = EndgameTable(endgame_table_path)
+    num_counters = endgame_table.num_slots - endgame_table.max_empty_slots - num_plies_before
+    positions = list(play_source_games(num_counters, num_games, 2, 0.2, seed, endgame_table.num_rows, endgame_table.num_cols, endgame_table.num_to_connect))
+    print(f"Endgame table {endgame_table_path}: {endgame_table.num_entries} positions with up to {endgame_table.max_empty_slots} empty slots, "
+          f"{os.path.getsize(endgame_table_path) / 1024:.0f} KB ({EndgameTable.record_struct.size} bytes per position)")
+    print(f"Searching {len(positions)} positions with {endgame_table.num_slots - num_counters} empty slots at depth {depth}, without and with the table")
+    results = {False: [0, 0, 0, 0], True: [0, 0, 0, 0]}     # with the table -> [nodes, time, positions with a forced win or loss found, table hits]
+    num_same_utility = 0
+    for position, is_minimiser in positions:
+        utilities = dict()
+        for is_using_table in [False, True]:
+            bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=is_minimiser, search_stats=True, num_to_connect=position.num_to_connect,
+                                 endgame_table_path=endgame_table_path if is_using_table else None)
+            start_time = time.perf_counter()
+            utility, best_action = bot.find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+            results[is_using_table][1] += time.perf_counter() - start_time
+            results[is_using_table][0] += bot.num_nodes_searched
+            results[is_using_table][2] += abs(utility) >= bot.decisive_utility
+            results[is_using_table][3] += bot.last_search_stats.num_endgame_hits
+            utilities[is_using_table] = utility
+            bot.close()
+        num_same_utility += utilities[False] == utilities[True]
+    for is_using_table, (total_nodes, total_time, num_exact, num_hits) in results.items():
+        print(f"{'with table' if is_using_table else 'without':<12} {total_nodes:>10} nodes {total_time:>8.2f}s {num_exact:>6} forced wins/losses {num_hits:>8} table hits")
+    print(f"Same utility with and without the table: {num_same_utility} of {len(positions)} positions")
+    position, is_minimiser = positions[0] if positions else (None, False)
+    if position is not None:     # time of a lookup, from a position in the table
+        while endgame_table.num_slots - position.num_counters > endgame_table.max_empty_slots:
+            position.make_move(position.find_available_actions()[0], is_minimiser)
+            is_minimiser = not is_minimiser
+        lookup_time = time_calls(endgame_table.find_result, [(position, is_minimiser)], 3)
+        print(f"Lookup: {lookup_time:.1f}us")
+    endgame_table.close()
+
+
+def parse_board_size(board_size_str):     # "rowsxcolsxN", e.g. "9x10x5" for connect-5 on 9 rows and 10 columns
+    num_rows, num_cols, num_to_connect = [int(number_str) for number_str in board_size_str.lower().split("x")]
+    return num_rows, num_cols, num_to_connect
+
+
+def build_search_positions(num_positions, num_rows, num_cols, num_to_connect, seed=0):     # positions after a few random moves, none of them over
+    random_generator = random.Random(seed)
+    positions = list()
+    while len(positions) < num_positions:
+        position = BitboardPosition(num_rows, num_cols, num_to_connect)
+        is_minimiser = False
+        for move_index in range(random_generator.randint(0, num_rows * num_cols // 3)):
+            position.make_move(random_generator.choice(position.find_available_actions()), is_minimiser)
+            is_minimiser = not is_minimiser
+            if position.find_winner():
+                break
+        if not position.find_winner():
+            positions.append(position)
+    return positions
+
+
+def benchmark_board_sizes(depth, num_positions, board_sizes):
+    print(f"Search throughput on different games at depth {depth}, over {num_positions} positions after random moves each (time in seconds)")
+    print(f"{'game':<16} {'nodes':>10} {'time':>8} {'nodes/s':>10} {'relative':>9}")
+    first_nodes_per_second = None
+    for num_rows, num_cols, num_to_connect in board_sizes:
+        total_nodes = 0
+        total_time = 0
+        for position in build_search_positions(num_positions, num_rows, num_cols, num_to_connect):
+            bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=position.num_counters % 2 == 1, transposition_table_size_in_mb=16, num_to_connect=num_to_connect)
+            start_time = time.perf_counter()
+            bot.find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+            total_time += time.perf_counter() - start_time
+            total_nodes += bot.num_nodes_searched
+            bot.close()
+        nodes_per_second = total_nodes / total_time
+        if first_nodes_per_second is None:
+            first_nodes_per_second = nodes_per_second
+        game = f"{num_rows}x{num_cols} connect-{num_to_connect}"
+        print(f"{game:<16} {total_nodes:>10} {total_time:>8.2f} {nodes_per_second:>10.0f} {nodes_per_second / first_nodes_per_second:>9.1%}")
+
+
+SEARCH_MODES = [("standard", False), ("compact", True)]     # (name, compact_search option) compared by benchmark_search_allocations
+
+
+def count_young_collections(bot, board):
+    # gen-0 collections during a search run with the gen-0 threshold at 1, so that one runs whenever two GC-tracked objects (tuples, lists, dicts)
+    # have been made since the last one and not yet freed. Unlike a before/after tracemalloc snapshot, this also sees the short-lived containers
+    # a node builds and drops; objects that are not GC-tracked (floats, ints) are not counted
+    num_collections = 0
+
+    def count_collection(phase, info):
+        nonlocal num_collections
+        if phase == "start" and info["generation"] == 0:
+            num_collections += 1
+
+    threshold = gc.get_threshold()
+    gc.collect()
+    gc.set_threshold(1, 1 << 30, 1 << 30)     # older generations are left alone, so that only gen-0 runs are counted
+    gc.callbacks.append(count_collection)
+    try:
+        bot.find_best_move(board)
+    finally:
+        gc.callbacks.remove(count_collection)
+        gc.set_threshold(*threshold)
+    return num_collections
+
+
+def measure_search_allocations(depth, compact_search):
+    # (utilities and best actions, nodes, seconds, GC pauses in seconds, gen-0 collections at threshold 1 (see count_young_collections),
+    # blocks still allocated after each search, peak KB above the start of any search).
+    # Collections are counted and allocations traced in separate passes, as both slow the search down; the GC is timed through gc.callbacks in the timed pass
+    gc_pauses = list()
+    gc_start_times = list()
+
+    def time_collection(phase, info):
+        if phase == "start":
+            gc_start_times.append(time.perf_counter())
+        else:
+            gc_pauses.append(time.perf_counter() - gc_start_times.pop())
+
+    results = list()
+    total_nodes = 0
+    total_time = 0
+    gc.callbacks.append(time_collection)
+    try:
+        for stage, moves in POSITION_SUITE:
+            position = build_position(moves)
+            bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=position.num_counters % 2 == 1, compact_search=compact_search)
+            start_time = time.perf_counter()
+            results.append(bot.find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR)))
+            total_time += time.perf_counter() - start_time
+            total_nodes += bot.num_nodes_searched
+            bot.close()
+    finally:
+        gc.callbacks.remove(time_collection)
+    num_young_collections = 0
+    for stage, moves in POSITION_SUITE:
+        position = build_position(moves)
+        bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=position.num_counters % 2 == 1, compact_search=compact_search)
+        num_young_collections += count_young_collections(bot, position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+        bot.close()
+    num_retained_blocks = 0
+    peak_memory = 0
+    for stage, moves in POSITION_SUITE:
+        position = build_position(moves)
+        bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=position.num_counters % 2 == 1, compact_search=compact_search)
+        board = position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR)     # the bot and its table are made before tracing starts, so only the search is traced
+        tracemalloc.start()
+        snapshot_before = tracemalloc.take_snapshot()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        bot.find_best_move(board)
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1] - memory_before)
+        snapshot_after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        num_retained_blocks += sum(statistic.count_diff for statistic in snapshot_after.compare_to(snapshot_before, "lineno") if statistic.count_diff > 0)
+        bot.close()
+    return results, total_nodes, total_time, gc_pauses, num_young_collections, num_retained_blocks, peak_memory / 1024
+
+
+def benchmark_search_allocations(depth):
+    print(f"Allocations of the standard and compact searches at depth {depth}, over the position suite (gen0/node = gen-0 GC collections per node with the "
+          f"gen-0 threshold at 1, which grow with the tuples, lists and dicts a node makes, short-lived ones included; retained/node = memory blocks traced "
+          f"by tracemalloc that are still allocated after the search, e.g. cache entries; peak = most memory held above the start of a search)")
+    print(f"{'mode':<10} {'nodes':>10} {'time':>8} {'nodes/s':>10} {'gen0/node':>10} {'retained/node':>14} {'peak KB':>9} {'GC runs':>8} {'GC pause ms':>12} {'max pause ms':>13}")
+    results_of_modes = list()
+    for name, compact_search in SEARCH_MODES:
+        results, total_nodes, total_time, gc_pauses, num_young_collections, num_retained_blocks, peak_memory = measure_search_allocations(depth, compact_search)
+        results_of_modes.append(results)
+        print(f"{name:<10} {total_nodes:>10} {total_time:>8.2f} {total_nodes / total_time:>10.0f} {num_young_collections / total_nodes:>10.3f} {num_retained_blocks / total_nodes:>14.4f} {peak_memory:>9.1f} "
+              f"{len(gc_pauses):>8} {sum(gc_pauses) * 1000:>12.3f} {max(gc_pauses, default=0) * 1000:>13.3f}")
+    print(f"Same utilities and moves: {all(results == results_of_modes[0] for results in results_of_modes)}")
+
+
+def time_calls(function, arguments_list, num_repeats, num_loops=200):
+    # best time over num_repeats of calling function num_loops times with each arguments tuple, in microseconds per call
+    best_time = float("inf")
+    for repeat in range(num_repeats):
+        start_time = time.perf_counter()
+        for loop in range(num_loops):
+            for arguments in arguments_list:
+                function(*arguments)
+        best_time = min(best_time, time.perf_counter() - start_time)
+    return best_time / (num_loops * len(arguments_list)) * 1e6
+
+
+def measure_hot_paths(depths, num_repeats):
+    # metric name -> (value, whether lower is better) for the hot paths of the bot, on the positions of POSITION_SUITE:
+    # micro-benchmarks of the board functions, then full find_best_move searches at every depth (time to move, nodes/s, peak memory of the search)
+    bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, 1, is_minimiser=False, transposition_table_size_in_mb=1)
+    positions = [build_position(moves) for stage, moves in POSITION_SUITE]
+    boards = [position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR) for position in positions]
+    actions = [(board, position.find_available_actions()[0], position.num_counters % 2 == 1) for board, position in zip(boards, positions)]
+    metrics = dict()
+    metrics["evaluation_function.us_per_call"] = (time_calls(bot.evaluation_function, [(board,) for board in boards], num_repeats), True)
+    metrics["evaluate_position.us_per_call"] = (time_calls(bot.evaluate_position, [(position,) for position in positions], num_repeats), True)
+    metrics["find_winner.us_per_call"] = (time_calls(bot.find_winner, [(board,) for board in boards], num_repeats), True)
+    metrics["bitboard_find_winner.us_per_call"] = (time_calls(BitboardPosition.find_winner, [(position,) for position in positions], num_repeats), True)
+    metrics["find_winner_after_move.us_per_call"] = (time_calls(BitboardPosition.find_winner_after_move, [(position,) for position in positions], num_repeats), True)
+    metrics["find_result_of_action.us_per_call"] = (time_calls(bot.find_result_of_action, actions, num_repeats), True)
+    bot.close()
+    for depth in depths:
+        best_time = float("inf")
+        for repeat in range(num_repeats):
+            total_time = 0
+            total_nodes = 0
+            for stage, moves in POSITION_SUITE:
+                utility, best_action, num_nodes_searched, time_taken = run_search(moves, depth)
+                total_time += time_taken
+                total_nodes += num_nodes_searched
+            best_time = min(best_time, total_time)
+        peak_memory = 0
+        for stage, moves in POSITION_SUITE:     # in a separate pass, as tracing allocations slows the search down
+            position = build_position(moves)
+            search_bot = ConnectFourBot("1", PLAYER_1_CHAR, PLAYER_2_CHAR, depth, is_minimiser=position.num_counters % 2 == 1)
+            tracemalloc.start()
+            search_bot.find_best_move(position.to_board(PLAYER_1_CHAR, PLAYER_2_CHAR))
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            search_bot.close()
+        metrics[f"find_best_move.depth_{depth}.time_to_move_ms"] = (best_time / len(POSITION_SUITE) * 1000, True)
+        metrics[f"find_best_move.depth_{depth}.nodes"] = (total_nodes, True)
+        metrics[f"find_best_move.depth_{depth}.nodes_per_s"] = (total_nodes / best_time, False)
+        metrics[f"find_best_move.depth_{depth}.peak_memory_kb"] = (peak_memory / 1024, True)
+    return metrics
+
+
+def benchmark_hot_paths(depths, num_repeats, baseline_path, save_path, threshold):
+    # returns whether any metric got worse than in the baseline by more than threshold (a fraction of the baseline value)
+    metrics = measure_hot_paths(depths, num_repeats)
+    baseline = None
+    if baseline_path is not None:
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)["metrics"]
+    print(f"{'metric':<44} {'value':>12} {'baseline':>12} {'change':>8}")
+    has_regression = False
+    for name, (value, is_lower_better) in metrics.items():
+        row = f"{name:<44} {value:>12.2f}"
+        if baseline is not None and name in baseline:
+            baseline_value = baseline[name]["value"]
+            change = (value - baseline_value) / baseline_value if baseline_value else 0
+            is_regression = (change > threshold) if is_lower_better else (change < -threshold)
+            row += f" {baseline_value:>12.2f} {change:>+8.1%}"
+            if is_regression:
+                row += "  REGRESSION"
+                has_regression = True
+        print(row)
+    if save_path is not None:
+        with open(save_path, "w") as save_file:
+            json.dump({"depths": depths, "num_repeats": num_repeats, "python": platform.python_version(),
+                       "metrics": {name: {"value": value, "lower_is_better": is_lower_better} for name, (value, is_lower_better) in metrics.items()}}, save_file, indent=2)
+        print(f"Baseline saved to {save_path}")
+    if has_regression:
+        print(f"Some metrics are more than {threshold:.0%} worse than the baseline")
+    return has_regression
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks for the Connect Four bot")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    move_ordering_parser = subparsers.add_parser("move-ordering", help="compare node counts with and without move ordering")
+    move_ordering_parser.add_argument("--depth", type=int, default=7)
+    symmetry_parser = subparsers.add_parser("symmetry", help="compare node counts with and without folding mirror-image positions together in the transposition table")
+    symmetry_parser.add_argument("--depth", type=int, default=8)
+    parallel_parser = subparsers.add_parser("parallel", help="wall-clock speedup of the parallel root search against the number of workers")
+    parallel_parser.add_argument("--depths", type=int, nargs="+", default=[9, 10, 11, 12])
+    parallel_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="worker counts to compare; the first is the baseline")
+    shared_table_parser = subparsers.add_parser("shared-table", help="hit rate and throughput of a shared transposition table against one table per process")
+    shared_table_parser.add_argument("--depth", type=int, default=8)
+    shared_table_parser.add_argument("--processes", type=int, default=4)
+    shared_table_parser.add_argument("--size-in-mb", type=float, default=16)
+    opening_book_parser = subparsers.add_parser("opening-book", help="time to the first moves with and without the opening book")
+    opening_book_parser.add_argument("--book", default="opening_book.bin", help="book made by opening_book.py")
+    solver_parser = subparsers.add_parser("solver", help="mean time and nodes of the exact solver on positions sorted by difficulty")
+    solver_parser.add_argument("--difficulties", nargs="+", default=["easy", "medium", "hard"], choices=["easy", "medium", "hard"])
+    solver_parser.add_argument("--weak", action="store_true", help="only find whether each position is a win, draw or loss")
+    persistent_table_parser = subparsers.add_parser("persistent-table", help="nodes and games per second with a transposition table kept between games")
+    persistent_table_parser.add_argument("--depth", type=int, default=8)
+    persistent_table_parser.add_argument("--games", type=int, default=20)
+    table_reuse_parser = subparsers.add_parser("table-reuse", help="share of the transposition table probes of every move answered by entries from earlier moves")
+    table_reuse_parser.add_argument("--depth", type=int, default=8)
+    table_reuse_parser.add_argument("--opening", default="44", help="columns (1-7) of the moves played before the bots take over")
+    pondering_parser = subparsers.add_parser("pondering", help="latency of the bot's answers with and without searching while the opponent thinks")
+    pondering_parser.add_argument("--depth", type=int, default=8)
+    pondering_parser.add_argument("--think-time", type=float, default=2, help="seconds the simulated human takes over every move")
+    pondering_parser.add_argument("--opponent-depth", type=int, default=3, help="depth of search of the bot standing in for the human")
+    batch_evaluation_parser = subparsers.add_parser("batch-evaluation", help="positions per second of the NumPy batch evaluator against the scalar evaluators (needs NumPy)")
+    batch_evaluation_parser.add_argument("--positions", type=int, default=20000)
+    search_stats_parser = subparsers.add_parser("search-stats", help="what the search did on every suite position (nodes, cutoffs, principal variation...), and the cost of recording it")
+    search_stats_parser.add_argument("--depth", type=int, default=8)
+    search_stats_parser.add_argument("--output", default=None, help="also write the stats of every position to this JSONL file")
+    threats_parser = subparsers.add_parser("threats", help="node savings and strength of threat analysis (win/block detection and pruning), with and without single-reply extensions")
+    threats_parser.add_argument("--depth", type=int, default=7)
+    threats_parser.add_argument("--games", type=int, default=20, help="games of each setting against the bot without threat analysis (0 to skip)")
+    windows_parser = subparsers.add_parser("windows", help="nodes and time to move of principal variation search and aspiration windows against plain alpha-beta")
+    windows_parser.add_argument("--depth", type=int, default=9)
+    windows_parser.add_argument("--window", type=float, default=2, help="half width of the aspiration windows, in utility")
+    endgame_parser = subparsers.add_parser("endgame", help="nodes, time and forced wins found by the search near the end of games, with and without the endgame table")
+    endgame_parser.add_argument("--table", default="endgame_table.bin", help="table made by endgame_table.py (with its default game options)")
+    endgame_parser.add_argument("--depth", type=int, default=6)
+    endgame_parser.add_argument("--games", type=int, default=1000, help="games played to find the positions searched")
+    endgame_parser.add_argument("--plies-before", type=int, default=2, help="how many moves before the table's endgames the searched positions are")
+    endgame_parser.add_argument("--seed", type=int, default=0, help="seed of the games, the same as the table's to search into its endgames")
+    board_sizes_parser = subparsers.add_parser("board-sizes", help="nodes per second of the search on boards of other sizes and other numbers of counters in a row")
+    board_sizes_parser.add_argument("--depth", type=int, default=6)
+    board_sizes_parser.add_argument("--positions", type=int, default=10)
+    board_sizes_parser.add_argument("--sizes", nargs="+", default=["6x7x4", "7x8x4", "9x10x5"], help="games as rowsxcolsxN, N being the counters in a row needed to win; the first is the baseline")
+    allocations_parser = subparsers.add_parser("allocations", help="allocations per node, memory and GC pauses of the standard search against the compact one")
+    allocations_parser.add_argument("--depth", type=int, default=9)
+    hot_paths_parser = subparsers.add_parser("hot-paths", help="micro-benchmarks of the board functions and full searches, compared with a saved baseline")
+    hot_paths_parser.add_argument("--depths", type=int, nargs="+", default=[5, 6, 7, 8, 9])
+    hot_paths_parser.add_argument("--repeats", type=int, default=3, help="every timing is the best of this many runs")
+    hot_paths_parser.add_argument("--baseline", default=None, help="JSON file saved by an earlier run with --save, to compare against")
+    hot_paths_parser.add_argument("--save", default=None, help="save this run as a baseline to this JSON file")
+    hot_paths_parser.add_argument("--threshold", type=float, default=0.1, help="flag metrics more than this fraction worse than the baseline (exits with status 1)")
+    args = parser.parse_args()
+    if args.benchmark == "move-ordering":
+        benchmark_move_ordering(args.depth)
+    elif args.benchmark == "symmetry":
+        benchmark_symmetry_folding(args.depth)
+    elif args.benchmark == "parallel":
+        benchmark_parallel_search(args.depths, args.workers)
+    elif args.benchmark == "shared-table":
+        benchmark_shared_table(args.depth, args.processes, args.size_in_mb)
+    elif args.benchmark == "opening-book":
+        benchmark_opening_book(args.book)
+    elif args.benchmark == "persistent-table":
+        benchmark_persistent_table(args.depth, args.games)
+    elif args.benchmark == "table-reuse":
+        benchmark_table_reuse(args.depth, args.opening)
+    elif args.benchmark == "pondering":
+        benchmark_pondering(args.depth, args.think_time, args.opponent_depth)
+    elif args.benchmark == "batch-evaluation":
+        benchmark_batch_evaluation(args.positions)
+    elif args.benchmark == "search-stats":
+        benchmark_search_stats(args.depth, args.output)
+    elif args.benchmark == "threats":
+        benchmark_threat_analysis(args.depth, args.games)
+    elif args.benchmark == "windows":
+        benchmark_search_windows(args.depth, args.window)
+    elif args.benchmark == "endgame":
+        benchmark_endgame_table(args.table, args.depth, args.games, args.plies_before, args.seed)
+    elif args.benchmark == "board-sizes":
+        benchmark_board_sizes(args.depth, args.positions, [parse_board_size(board_size_str) for board_size_str in args.sizes])
+    elif args.benchmark == "allocations":
+        benchmark_search_allocations(args.depth)
+    elif args.benchmark == "hot-paths":
+        if benchmark_hot_paths(args.depths, args.repeats, args.baseline, args.save, args.threshold):
+            sys.exit(1)
+    elif args.benchmark == "solver":
+        benchmark_solver(args.difficulties, args.weak)
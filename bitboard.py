@@ -0,0 +1,460 @@
+import random
+
+
+class BitboardPosition(object):
+    # Each column takes num_rows + 1 bits (bottom slot = lowest bit). The extra sentinel bit on top of every column is always 0,
+    # so shifting a bitboard by a direction step never joins counters from two different columns into a line.
+    # A game is won with num_to_connect counters in a row; the standard game (4) has unrolled versions of the line checks
+    line_tables = dict()    # (num_rows, num_cols, num_to_connect) -> rows, columns and diagonals, shared by all positions of that game
+    zobrist_tables = dict()     # (num_rows, num_cols) -> random 64-bit numbers for each (player, slot), shared by all positions of that size
+    mirrored_zobrist_tables = dict()     # (num_rows, num_cols) -> for each (player, slot), the Zobrist number of the slot's mirror image
+    window_tables = dict()     # (num_rows, num_cols, num_to_connect) -> for each slot, the masks of the windows of num_to_connect slots through it
+    run_shift_tables = dict()     # (num_rows, num_cols, num_to_connect) -> for each direction, the shifts that AND a bitboard down to the first slots of its lines
+    completion_shift_tables = dict()     # (num_rows, num_cols, num_to_connect) -> for each direction, the shifts to the other num_to_connect - 1 slots of a line
+    __slots__ = ("num_rows", "num_cols", "num_to_connect", "col_stride", "direction_shifts", "board_bits", "bottom_mask", "board_mask", "player_1_bitboard",
+                 "player_2_bitboard", "heights", "num_counters", "move_history", "zobrist_numbers", "mirrored_zobrist_numbers", "windows_through_slot",
+                 "run_shifts", "completion_shifts", "zobrist_key", "mirrored_zobrist_key")     # no per-instance dict: the search keeps one position and moves in place
+
+    def __init__(self, num_rows=6, num_cols=7, num_to_connect=4):
+        if num_to_connect < 2:
+            raise Exception("Number of counters in a row needed to win must be at least 2")
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_to_connect = num_to_connect
+        self.col_stride = num_rows + 1
+        self.direction_shifts = (1, self.col_stride, self.col_stride - 1, self.col_stride + 1)   # vertical, horizontal, second diagonal (\), first diagonal (/)
+        self.board_bits = self.col_stride * num_cols
+        self.bottom_mask = sum(1 << (col * self.col_stride) for col in range(num_cols))
+        self.board_mask = self.bottom_mask * ((1 << num_rows) - 1)     # every slot of the board, without the sentinel bits
+        self.player_1_bitboard = 0
+        self.player_2_bitboard = 0
+        self.heights = [0 for col in range(num_cols)]
+        self.num_counters = 0
+        self.move_history = list()
+        self.zobrist_numbers = self.find_zobrist_numbers()
+        self.mirrored_zobrist_numbers = self.find_mirrored_zobrist_numbers()
+        self.windows_through_slot = self.find_windows_through_slot()
+        self.run_shifts = self.find_run_shifts()
+        self.completion_shifts = self.find_completion_shifts()
+        self.zobrist_key = 0    # XOR of the Zobrist numbers of all counters in the board, updated on every move
+        self.mirrored_zobrist_key = 0   # Zobrist key of the board with its columns in reverse order, updated alongside
+
+    @classmethod
+    def from_board(cls, board, player_1_char, player_2_char, num_to_connect=4):
+        num_rows = len(board)
+        num_cols = len(board[0])
+        position = cls(num_rows, num_cols, num_to_connect)
+        for col in range(num_cols):
+            for height in range(num_rows):
+                slot = board[num_rows - height - 1][col]
+                if not slot:
+                    break
+                bit = 1 << (col * position.col_stride + height)
+                if slot == player_1_char:
+                    position.player_1_bitboard |= bit
+                    position.zobrist_key ^= position.zobrist_numbers[0][col * position.col_stride + height]
+                    position.mirrored_zobrist_key ^= position.mirrored_zobrist_numbers[0][col * position.col_stride + height]
+                else:
+                    position.player_2_bitboard |= bit
+                    position.zobrist_key ^= position.zobrist_numbers[1][col * position.col_stride + height]
+                    position.mirrored_zobrist_key ^= position.mirrored_zobrist_numbers[1][col * position.col_stride + height]
+                position.heights[col] += 1
+                position.num_counters += 1
+            for height in range(position.heights[col], num_rows):
+                if board[num_rows - height - 1][col]:
+                    raise Exception("There are empty slots below a counter; board cannot be converted")
+        return position
+
+    @classmethod
+    def from_bitboards(cls, num_rows, num_cols, player_1_bitboard, player_2_bitboard, num_to_connect=4):
+        position = cls(num_rows, num_cols, num_to_connect)
+        position.player_1_bitboard = player_1_bitboard
+        position.player_2_bitboard = player_2_bitboard
+        for col in range(num_cols):
+            for height in range(num_rows):
+                bit_index = col * position.col_stride + height
+                if player_1_bitboard >> bit_index & 1:
+                    position.zobrist_key ^= position.zobrist_numbers[0][bit_index]
+                    position.mirrored_zobrist_key ^= position.mirrored_zobrist_numbers[0][bit_index]
+                elif player_2_bitboard >> bit_index & 1:
+                    position.zobrist_key ^= position.zobrist_numbers[1][bit_index]
+                    position.mirrored_zobrist_key ^= position.mirrored_zobrist_numbers[1][bit_index]
+                else:
+                    break
+                position.heights[col] += 1
+                position.num_counters += 1
+        return position
+
+    def to_board(self, player_1_char, player_2_char):
+        board = [["" for col in range(self.num_cols)] for row in range(self.num_rows)]
+        for col in range(self.num_cols):
+            for height in range(self.heights[col]):
+                bit = 1 << (col * self.col_stride + height)
+                if self.player_1_bitboard & bit:
+                    board[self.num_rows - height - 1][col] = player_1_char
+                else:
+                    board[self.num_rows - height - 1][col] = player_2_char
+        return board
+
+    def copy(self):
+        new_position = BitboardPosition(self.num_rows, self.num_cols, self.num_to_connect)
+        new_position.player_1_bitboard = self.player_1_bitboard
+        new_position.player_2_bitboard = self.player_2_bitboard
+        new_position.heights = list(self.heights)
+        new_position.num_counters = self.num_counters
+        new_position.move_history = list(self.move_history)
+        new_position.zobrist_key = self.zobrist_key
+        new_position.mirrored_zobrist_key = self.mirrored_zobrist_key
+        return new_position
+
+    def find_zobrist_numbers(self):
+        table_key = (self.num_rows, self.num_cols)
+        if table_key not in BitboardPosition.zobrist_tables:
+            random_generator = random.Random(self.num_rows * 1000 + self.num_cols)     # fixed seed, so keys stay the same between runs
+            BitboardPosition.zobrist_tables[table_key] = tuple([random_generator.getrandbits(64) for bit_index in range(self.board_bits)] for player in range(2))
+        return BitboardPosition.zobrist_tables[table_key]
+
+    def find_mirrored_zobrist_numbers(self):
+        table_key = (self.num_rows, self.num_cols)
+        if table_key not in BitboardPosition.mirrored_zobrist_tables:
+            mirrored_bit_indices = [(self.num_cols - 1 - bit_index // self.col_stride) * self.col_stride + bit_index % self.col_stride for bit_index in range(self.board_bits)]
+            BitboardPosition.mirrored_zobrist_tables[table_key] = tuple([zobrist_numbers[mirrored_bit_index] for mirrored_bit_index in mirrored_bit_indices] for zobrist_numbers in self.zobrist_numbers)
+        return BitboardPosition.mirrored_zobrist_tables[table_key]
+
+    def find_windows_through_slot(self):
+        table_key = (self.num_rows, self.num_cols, self.num_to_connect)
+        if table_key not in BitboardPosition.window_tables:
+            windows_through_slot = [list() for bit_index in range(self.board_bits)]
+            first_offsets = range(1 - self.num_to_connect, 1)
+            for col in range(self.num_cols):
+                for height in range(self.num_rows):
+                    # vertical windows only from the slot down, since a counter dropped into the column is always the top one
+                    for col_step, height_step, window_first_offsets in [(0, 1, first_offsets[:1]), (1, 0, first_offsets), (1, -1, first_offsets), (1, 1, first_offsets)]:
+                        for first_offset in window_first_offsets:
+                            window_slots = [(col + col_step * offset, height + height_step * offset) for offset in range(first_offset, first_offset + self.num_to_connect)]
+                            if all(0 <= window_col < self.num_cols and 0 <= window_height < self.num_rows for window_col, window_height in window_slots):
+                                window_mask = sum(1 << (window_col * self.col_stride + window_height) for window_col, window_height in window_slots)
+                                windows_through_slot[col * self.col_stride + height].append(window_mask)
+            BitboardPosition.window_tables[table_key] = windows_through_slot
+        return BitboardPosition.window_tables[table_key]
+
+    def find_run_shifts(self):
+        # runs of 1 counter are doubled in length by each shift, up to num_to_connect: e.g. for 5 in a row, shifting by 1, 2 and 1 steps
+        # leaves the slots with 2, 4 and then 5 counters in a row from them
+        table_key = (self.num_rows, self.num_cols, self.num_to_connect)
+        if table_key not in BitboardPosition.run_shift_tables:
+            run_lengths = list()
+            run_length = 1
+            while run_length < self.num_to_connect:
+                run_lengths.append(min(run_length, self.num_to_connect - run_length))
+                run_length += run_lengths[-1]
+            BitboardPosition.run_shift_tables[table_key] = tuple(tuple(length * shift for length in run_lengths) for shift in self.direction_shifts)
+        return BitboardPosition.run_shift_tables[table_key]
+
+    def find_completion_shifts(self):
+        table_key = (self.num_rows, self.num_cols, self.num_to_connect)
+        if table_key not in BitboardPosition.completion_shift_tables:
+            BitboardPosition.completion_shift_tables[table_key] = tuple(tuple(count * shift for count in range(1, self.num_to_connect)) for shift in self.direction_shifts)
+        return BitboardPosition.completion_shift_tables[table_key]
+
+    def key(self):
+        return self.player_1_bitboard | (self.player_2_bitboard << self.board_bits)
+
+    def find_compact_key(self, own_bitboard):     # own counters + all counters + bottom row: tells positions apart (whoever owns the other counters) in board_bits bits
+        return own_bitboard + (self.player_1_bitboard | self.player_2_bitboard) + self.bottom_mask
+
+    def find_mirrored_bitboard(self, bitboard):     # the same counters with the columns in reverse order
+        col_mask = (1 << self.col_stride) - 1
+        mirrored_bitboard = 0
+        for col in range(self.num_cols):
+            mirrored_bitboard |= ((bitboard >> (col * self.col_stride)) & col_mask) << ((self.num_cols - 1 - col) * self.col_stride)
+        return mirrored_bitboard
+
+    def find_available_actions(self):
+        num_rows = self.num_rows
+        return [col for col, height in enumerate(self.heights) if height < num_rows]
+
+    def can_play(self, col):
+        return 0 <= col < self.num_cols and self.heights[col] < self.num_rows
+
+    def make_move(self, col, is_minimiser):
+        height = self.heights[col]
+        if height == self.num_rows:
+            raise Exception("Column selected was already filled to begin with, set of available actions are wrong")
+        bit_index = col * self.col_stride + height
+        if is_minimiser:
+            self.player_2_bitboard |= 1 << bit_index
+            self.zobrist_key ^= self.zobrist_numbers[1][bit_index]
+            self.mirrored_zobrist_key ^= self.mirrored_zobrist_numbers[1][bit_index]
+        else:
+            self.player_1_bitboard |= 1 << bit_index
+            self.zobrist_key ^= self.zobrist_numbers[0][bit_index]
+            self.mirrored_zobrist_key ^= self.mirrored_zobrist_numbers[0][bit_index]
+        self.heights[col] = height + 1
+        self.num_counters += 1
+        self.move_history.append(col)
+
+    def unmake_move(self):
+        col = self.move_history.pop()
+        height = self.heights[col] - 1
+        bit_index = col * self.col_stride + height
+        bit = 1 << bit_index
+        if self.player_1_bitboard & bit:
+            self.player_1_bitboard ^= bit
+            self.zobrist_key ^= self.zobrist_numbers[0][bit_index]
+            self.mirrored_zobrist_key ^= self.mirrored_zobrist_numbers[0][bit_index]
+        else:
+            self.player_2_bitboard ^= bit
+            self.zobrist_key ^= self.zobrist_numbers[1][bit_index]
+            self.mirrored_zobrist_key ^= self.mirrored_zobrist_numbers[1][bit_index]
+        self.heights[col] = height
+        self.num_counters -= 1
+        return col
+
+    def find_playable_slots(self):     # mask of the slot that the next counter in each column would fill
+        return ((self.player_1_bitboard | self.player_2_bitboard) + self.bottom_mask) & self.board_mask
+
+    def find_winning_slots(self, bitboard, mask=None):
+        # mask of the empty slots that would complete a line of num_to_connect for the owner of the bitboard; mask is every counter on the board,
+        # which defaults to the counters of this position (ConnectFourSolver passes its own, using the position only for its layout)
+        if mask is None:
+            mask = self.player_1_bitboard | self.player_2_bitboard
+        if self.num_to_connect != 4:
+            return self.find_line_completing_slots(bitboard) & (self.board_mask ^ mask)
+        winning_slots = (bitboard << 1) & (bitboard << 2) & (bitboard << 3)     # vertical: only possible on top of 3 counters
+        for shift in self.direction_shifts[1:]:
+            pairs = (bitboard << shift) & (bitboard << (2 * shift))
+            winning_slots |= pairs & (bitboard << (3 * shift))     # 3 counters on one side
+            winning_slots |= pairs & (bitboard >> shift)     # 2 counters on one side, 1 on the other
+            pairs = (bitboard >> shift) & (bitboard >> (2 * shift))
+            winning_slots |= pairs & (bitboard << shift)
+            winning_slots |= pairs & (bitboard >> (3 * shift))
+        return winning_slots & (self.board_mask ^ mask)
+
+    def find_line_completing_slots(self, bitboard):     # slots (empty or not) that would give the owner of the bitboard num_to_connect in a row, for any num_to_connect
+        vertical_shifts = self.completion_shifts[0]
+        line_completing_slots = -1
+        for shift in vertical_shifts:     # vertical: only on top of num_to_connect - 1 counters
+            line_completing_slots &= bitboard << shift
+        for shifts in self.completion_shifts[1:]:
+            runs_after = [-1]     # runs_after[count]: slots followed by count counters in the direction of the line (-1 = every slot)
+            runs_before = [-1]
+            run_after = run_before = -1
+            for shift in shifts:
+                run_after &= bitboard >> shift
+                runs_after.append(run_after)
+                run_before &= bitboard << shift
+                runs_before.append(run_before)
+            runs_before.reverse()     # so that the counts of every pair add up to num_to_connect - 1
+            for run_after, run_before in zip(runs_after, runs_before):
+                line_completing_slots |= run_after & run_before
+        return line_completing_slots & self.board_mask
+
+    def has_connected_line(self, bitboard):     # whether the owner of the bitboard has num_to_connect counters in a row
+        if self.num_to_connect != 4:
+            for run_shifts in self.run_shifts:
+                runs = bitboard
+                for run_shift in run_shifts:
+                    runs &= runs >> run_shift
+                if runs:
+                    return True
+            return False
+        vertical_shift, horizontal_shift, second_diagonal_shift, first_diagonal_shift = self.direction_shifts
+        pairs = bitboard & (bitboard >> vertical_shift)
+        if pairs & (pairs >> (2 * vertical_shift)):
+            return True
+        pairs = bitboard & (bitboard >> horizontal_shift)
+        if pairs & (pairs >> (2 * horizontal_shift)):
+            return True
+        pairs = bitboard & (bitboard >> second_diagonal_shift)
+        if pairs & (pairs >> (2 * second_diagonal_shift)):
+            return True
+        pairs = bitboard & (bitboard >> first_diagonal_shift)
+        return bool(pairs & (pairs >> (2 * first_diagonal_shift)))
+
+    def find_winner(self):     # same outcomes as ConnectFourBot.find_winner: "1", "2", "draw" or None
+        if self.has_connected_line(self.player_1_bitboard):
+            return "1"
+        if self.has_connected_line(self.player_2_bitboard):
+            return "2"
+        if self.num_counters == self.num_rows * self.num_cols:     # game is a draw
+            return "draw"
+        return None
+
+    def find_winner_after_move(self):
+        # same outcomes as find_winner, for a position that was not over before its last make_move: only the player who just moved
+        # can have won, and only on a window through the counter they dropped
+        if not self.move_history:     # nothing is known about how the position was reached
+            return self.find_winner()
+        if self.num_counters < 2 * self.num_to_connect - 1:     # neither player has enough counters yet
+            return None
+        col = self.move_history[-1]
+        bit_index = col * self.col_stride + self.heights[col] - 1
+        if self.player_1_bitboard >> bit_index & 1:
+            bitboard = self.player_1_bitboard
+            player = "1"
+        else:
+            bitboard = self.player_2_bitboard
+            player = "2"
+        for window_mask in self.windows_through_slot[bit_index]:
+            if bitboard & window_mask == window_mask:
+                return player
+        if self.num_counters == self.num_rows * self.num_cols:     # game is a draw
+            return "draw"
+        return None
+
+    def find_lines(self):
+        table_key = (self.num_rows, self.num_cols, self.num_to_connect)
+        if table_key not in BitboardPosition.line_tables:
+            BitboardPosition.line_tables[table_key] = self.build_lines()
+        return BitboardPosition.line_tables[table_key]
+
+    def build_lines(self):
+        # every row, column and diagonal with room for at least num_to_connect counters
+        # each line is (kind, index of row or col used for weighting, mask of its slots, position of its lowest bit, scores of counter patterns on it)
+        num_rows = self.num_rows
+        num_cols = self.num_cols
+        lines = list()
+
+        def add_line(kind, weight_index, slots):
+            if len(slots) < self.num_to_connect:
+                return
+            bit_indices = sorted(col * self.col_stride + (num_rows - row - 1) for row, col in slots)
+            mask = 0
+            for bit_index in bit_indices:
+                mask |= 1 << bit_index
+            line_scores = LineScores(len(bit_indices), bit_indices[1] - bit_indices[0], self.board_bits, self.num_to_connect)
+            lines.append((kind, weight_index, mask, bit_indices[0], line_scores))
+
+        for row in range(num_rows - 1, -1, -1):
+            add_line("row", row, [(row, col) for col in range(num_cols)])
+        for col in range(num_cols):
+            add_line("col", col, [(row, col) for row in range(num_rows)])
+        # first diagonal (/), starting from the bottom left of each line
+        for row, col in [(row, 0) for row in range(num_rows - 1)] + [(num_rows - 1, col) for col in range(num_cols)]:
+            add_line("diagonal", -1, [(row - count, col + count) for count in range(min(row + 1, num_cols - col))])
+        # second diagonal (\), starting from the top left of each line
+        for row, col in [(row, 0) for row in range(1, num_rows)] + [(0, col) for col in range(num_cols)]:
+            add_line("diagonal", -1, [(row + count, col + count) for count in range(min(num_rows - row, num_cols - col))])
+        return lines
+
+
+class LineScores(dict):
+    # maps the counters on a line (player 1's counters, with player 2's counters shifted above them by board_bits, all shifted down
+    # to the line's lowest bit) to the sum of raw scores of its windows of num_to_connect slots, as given by ConnectFourBot.evaluation_function:
+    # 2 points per counter minus 1, and another point off if the counters are split by a gap; windows holding both players' counters score nothing
+    # scores are positive for player 1 and negative for player 2, and are only worked out the first time a pattern is seen
+    def __init__(self, num_slots, step, board_bits, num_to_connect=4):
+        super().__init__()
+        self.num_slots = num_slots
+        self.step = step
+        self.board_bits = board_bits
+        self.num_to_connect = num_to_connect
+
+    def __missing__(self, pattern):
+        player_1_slots = pattern & ((1 << self.board_bits) - 1)
+        player_2_slots = pattern >> self.board_bits
+        line_score = 0
+        for start in range(self.num_slots - self.num_to_connect + 1):
+            player_1_counts = [count for count in range(self.num_to_connect) if player_1_slots >> ((start + count) * self.step) & 1]
+            player_2_counts = [count for count in range(self.num_to_connect) if player_2_slots >> ((start + count) * self.step) & 1]
+            if player_1_counts and not player_2_counts:
+                line_score += find_raw_window_score(player_1_counts)
+            elif player_2_counts and not player_1_counts:
+                line_score -= find_raw_window_score(player_2_counts)
+        self[pattern] = line_score
+        return line_score
+
+
+def find_raw_window_score(occupied_counts):
+    raw_score = len(occupied_counts) * 2 - 1
+    if occupied_counts[-1] - occupied_counts[0] + 1 > len(occupied_counts):     # counters are not contiguous
+        raw_score -= 1
+    return raw_score
+
+
+class IncrementallyEvaluatedPosition(BitboardPosition):
+    # BitboardPosition that keeps the heuristic score of ConnectFourBot.evaluate_position up to date as counters are placed and removed.
+    # Placing a counter only changes the score of the (at most 4) lines through its slot, so only those lines are rescored,
+    # and removing a counter restores the score saved when it was placed
+    __slots__ = ("weighted_lines", "denominator", "line_score_changes_at_slot", "weighted_score", "weighted_score_history")
+
+    def __init__(self, num_rows, num_cols, weighted_lines, denominator, num_to_connect=4):
+        super().__init__(num_rows, num_cols, num_to_connect)
+        self.weighted_lines = weighted_lines    # as given by ConnectFourBot.find_weighted_lines, in the order of find_lines
+        self.denominator = denominator
+        self.line_score_changes_at_slot = [list() for bit_index in range(self.board_bits)]
+        for line_mask, lowest_bit, line_scores, weight in weighted_lines:
+            for bit_index in range(self.board_bits):
+                if line_mask >> bit_index & 1:
+                    line_score_changes = LineScoreChanges(line_scores, weight, bit_index - lowest_bit, self.board_bits)
+                    self.line_score_changes_at_slot[bit_index].append((line_mask, lowest_bit, line_score_changes))
+        self.weighted_score = 0
+        self.weighted_score_history = list()
+
+    @classmethod
+    def from_position(cls, position, weighted_lines, denominator):
+        new_position = cls(position.num_rows, position.num_cols, weighted_lines, denominator, position.num_to_connect)
+        new_position.player_1_bitboard = position.player_1_bitboard
+        new_position.player_2_bitboard = position.player_2_bitboard
+        new_position.heights = list(position.heights)
+        new_position.num_counters = position.num_counters
+        new_position.move_history = list(position.move_history)
+        new_position.zobrist_key = position.zobrist_key
+        new_position.mirrored_zobrist_key = position.mirrored_zobrist_key
+        board_state = new_position.key()
+        for line_mask, lowest_bit, line_scores, weight in weighted_lines:
+            pattern = board_state & line_mask
+            if pattern:
+                new_position.weighted_score += line_scores[pattern >> lowest_bit] * weight
+        return new_position
+
+    def make_move(self, col, is_minimiser):     # same as BitboardPosition.make_move, written out again to save a method call per node
+        height = self.heights[col]
+        if height == self.num_rows:
+            raise Exception("Column selected was already filled to begin with, set of available actions are wrong")
+        bit_index = col * self.col_stride + height
+        if is_minimiser:
+            self.player_2_bitboard |= 1 << bit_index
+            self.zobrist_key ^= self.zobrist_numbers[1][bit_index]
+            self.mirrored_zobrist_key ^= self.mirrored_zobrist_numbers[1][bit_index]
+        else:
+            self.player_1_bitboard |= 1 << bit_index
+            self.zobrist_key ^= self.zobrist_numbers[0][bit_index]
+            self.mirrored_zobrist_key ^= self.mirrored_zobrist_numbers[0][bit_index]
+        self.heights[col] = height + 1
+        self.num_counters += 1
+        self.move_history.append(col)
+        board_state = self.player_1_bitboard | (self.player_2_bitboard << self.board_bits)
+        weighted_score = self.weighted_score
+        self.weighted_score_history.append(weighted_score)
+        for line_mask, lowest_bit, line_score_changes in self.line_score_changes_at_slot[bit_index]:
+            weighted_score += line_score_changes[(board_state & line_mask) >> lowest_bit]
+        self.weighted_score = weighted_score
+
+    def unmake_move(self):
+        self.weighted_score = self.weighted_score_history.pop()
+        return BitboardPosition.unmake_move(self)
+
+    def evaluate(self):
+        return self.weighted_score / self.denominator
+
+
+class LineScoreChanges(dict):
+    # for one slot on one line: maps the counters on the line just after a counter was placed in that slot (in the same form as LineScores)
+    # to the resulting change in the weighted score of the line
+    def __init__(self, line_scores, weight, slot_offset, board_bits):
+        super().__init__()
+        self.line_scores = line_scores
+        self.weight = weight
+        self.slot_offset = slot_offset
+        self.board_bits = board_bits
+
+    def __missing__(self, pattern):
+        if pattern >> self.slot_offset & 1:     # counter placed belongs to player 1
+            old_pattern = pattern ^ (1 << self.slot_offset)
+        else:
+            old_pattern = pattern ^ (1 << (self.slot_offset + self.board_bits))
+        score_change = (self.line_scores[pattern] - self.line_scores[old_pattern]) * self.weight
+        self[pattern] = score_change
+        return score_change
@@ -1,39 +1,67 @@
 import copy
+import math
+import os
+import time
+from array import array
+from fractions import Fraction
 
+from bitboard import BitboardPosition, IncrementallyEvaluatedPosition
+from endgame_table import EndgameTable
+from opening_book import OpeningBook
+from parallel_search import ParallelRootSearch
+from pondering import Ponderer
+from search_stats import SearchStats, SearchTimeout
+from solver import ConnectFourSolver
+from transposition_table import EXACT, LOWER_BOUND, UPPER_BOUND, SharedTranspositionTable, TranspositionTable
 
-class ConnectFour(object):
-    def __init__(self, first_player, num_rows=6, num_cols=7, bot_depth_of_search=9):
+
+class ConnectFourGameState(object):
+    # Board and rules of a game, without any input or output, so that games can be played programmatically (e.g. by self_play.py):
+    # apply_move plays a counter for the player to move, find_legal_moves and find_winner tell how the game stands, and clone copies it.
+    # Boards are in the format taken by ConnectFourBot.find_best_move. A player wins with num_to_connect counters in a row
+    def __init__(self, first_player, num_rows=6, num_cols=7, player_1_char="H", player_2_char="R", num_to_connect=4):
+        if num_rows < 1 or num_cols < 1 or num_to_connect < 2:
+            raise Exception(f"A game needs at least 1 row, 1 column and 2 counters in a row to win, not {num_rows}x{num_cols} connect-{num_to_connect}")
         self.num_rows = num_rows
         self.num_cols = num_cols
+        self.num_to_connect = num_to_connect
         self.board = [["" for col in range(num_cols)] for row in range(num_rows)]
         self.heights = [0 for col in range(num_cols)]
         self.available_columns = {col for col in range(self.num_cols)}
+        self.first_player = first_player
         self.current_player = first_player
-        self.player_1_char = "H"    # player 1 (human) is the maximiser in minimax algorithm
-        self.player_2_char = "R"    # player 2 (robot) is the minimiser in minimax algorithm
-        self.empty_char = "_"
+        self.player_1_char = player_1_char    # player 1 is the maximiser in minimax algorithm
+        self.player_2_char = player_2_char    # player 2 is the minimiser in minimax algorithm
         self.winner = None
         self.num_counters_in_board = 0
         self.col_of_last_counter = -1
-        self.bot = ConnectFourBot(self.current_player, self.player_1_char, self.player_2_char, bot_depth_of_search, is_minimiser=True)
+        self.is_over = False    # kept up to date by apply_move
+        self.moves = list()     # columns played so far, in order
 
-    def print_board(self):
-        print(f"Current board ({self.player_1_char} = Your counter, {self.player_2_char} = Robot's counter, {self.empty_char} = Empty):")
-        for row in self.board:
-            row_str = ""
-            is_first_slot = True
-            for slot in row:
-                if not slot:
-                    added_char = self.empty_char
-                else:
-                    added_char = slot
-                if is_first_slot:
-                    row_str += added_char
-                    is_first_slot = False
-                else:
-                    row_str += f" {added_char}"
-            print(row_str)
-        print()
+    def clone(self):
+        cloned_state = copy.copy(self)
+        cloned_state.board = [list(row) for row in self.board]
+        cloned_state.heights = list(self.heights)
+        cloned_state.available_columns = set(self.available_columns)
+        cloned_state.moves = list(self.moves)
+        return cloned_state
+
+    def find_legal_moves(self):
+        if self.is_over:
+            return []
+        return sorted(self.available_columns)
+
+    def find_winner(self):     # "1" or "2" once a player has won, None otherwise (including draws)
+        return self.winner
+
+    def apply_move(self, col):     # plays a counter in col for the player to move, then hands the move to the other player
+        if self.is_over:
+            raise Exception("Game is already over")
+        if not self.place_counter(col):
+            raise Exception(f"Column {col} is not available")
+        self.col_of_last_counter = col
+        self.switch_player()
+        self.is_over = self.game_is_over(col)
 
     def place_counter(self, col):
         if col not in self.available_columns:  # checks whether column is completely filled
@@ -43,14 +71,13 @@ class ConnectFour(object):
             raise Exception("Slot is already occupied by a counter. Heights were not adjusted properly")
         if self.current_player == "1":
             self.board[self.num_rows - current_height_of_col - 1][col] = self.player_1_char
-            print(f"You have inserted a counter into column {col + 1}\n")
         else:
             self.board[self.num_rows - current_height_of_col - 1][col] = self.player_2_char
-            print(f"Robot has inserted a counter into column {col + 1}\n")
         self.heights[col] += 1
         if self.heights[col] == self.num_rows:
             self.available_columns.remove(col)
         self.num_counters_in_board += 1
+        self.moves.append(col)
         return True
 
     def game_is_over(self, col_of_last_counter):
@@ -62,9 +89,10 @@ class ConnectFour(object):
             last_player_symbol = self.player_2_char
         else:  # last player was player 1
             last_player_symbol = self.player_1_char
+        num_to_connect = self.num_to_connect
         # first check column
-        if height_of_last_counter >= 4:
-            for row in range(row_of_last_counter + 1, row_of_last_counter + 4):
+        if height_of_last_counter >= num_to_connect:
+            for row in range(row_of_last_counter + 1, row_of_last_counter + num_to_connect):
                 slot = self.board[row][col_of_last_counter]
                 if not slot:
                     raise Exception("There are empty slots below the last counter added; last counter was inserted wrongly")
@@ -77,9 +105,9 @@ class ConnectFour(object):
                     self.winner = "1"
                 return True
         # now check row
-        current_moving_col = max(0, col_of_last_counter - 3)
-        while current_moving_col <= min(self.num_cols - 4, col_of_last_counter):
-            for count in range(4):
+        current_moving_col = max(0, col_of_last_counter - num_to_connect + 1)
+        while current_moving_col <= min(self.num_cols - num_to_connect, col_of_last_counter):
+            for count in range(num_to_connect):
                 slot = self.board[row_of_last_counter][current_moving_col]
                 if slot != last_player_symbol:
                     current_moving_col += 1
@@ -92,9 +120,9 @@ class ConnectFour(object):
                     self.winner = "1"
                 return True
         # now check first diagonal (/)
-        row_bound = min(self.num_rows - 1, row_of_last_counter + 3)
+        row_bound = min(self.num_rows - 1, row_of_last_counter + num_to_connect - 1)
         steps_from_last_counter_to_row_bound = row_bound - row_of_last_counter
-        col_bound = max(0, col_of_last_counter - 3)
+        col_bound = max(0, col_of_last_counter - num_to_connect + 1)
         steps_from_last_counter_to_col_bound = col_of_last_counter - col_bound
         if steps_from_last_counter_to_row_bound >= steps_from_last_counter_to_col_bound:
             current_moving_row = row_of_last_counter + steps_from_last_counter_to_col_bound
@@ -102,8 +130,8 @@ class ConnectFour(object):
         else:
             current_moving_row = row_bound
             current_moving_col = col_of_last_counter - steps_from_last_counter_to_row_bound
-        while current_moving_row >= max(3, row_of_last_counter) and current_moving_col <= min(self.num_cols - 4, col_of_last_counter):
-            for count in range(4):
+        while current_moving_row >= max(num_to_connect - 1, row_of_last_counter) and current_moving_col <= min(self.num_cols - num_to_connect, col_of_last_counter):
+            for count in range(num_to_connect):
                 slot = self.board[current_moving_row][current_moving_col]
                 if slot != last_player_symbol:
                     current_moving_row -= 1
@@ -118,9 +146,9 @@ class ConnectFour(object):
                     self.winner = "1"
                 return True
         # now check second diagonal (\)
-        row_bound = max(0, row_of_last_counter - 3)
+        row_bound = max(0, row_of_last_counter - num_to_connect + 1)
         steps_from_last_counter_to_row_bound = row_of_last_counter - row_bound
-        col_bound = max(0, col_of_last_counter - 3)
+        col_bound = max(0, col_of_last_counter - num_to_connect + 1)
         steps_from_last_counter_to_col_bound = col_of_last_counter - col_bound
         if steps_from_last_counter_to_row_bound >= steps_from_last_counter_to_col_bound:
             current_moving_row = row_of_last_counter - steps_from_last_counter_to_col_bound
@@ -128,8 +156,8 @@ class ConnectFour(object):
         else:
             current_moving_row = row_bound
             current_moving_col = col_of_last_counter - steps_from_last_counter_to_row_bound
-        while current_moving_row <= min(self.num_rows - 4, row_of_last_counter) and current_moving_col <= min(self.num_cols - 4, col_of_last_counter):
-            for count in range(4):
+        while current_moving_row <= min(self.num_rows - num_to_connect, row_of_last_counter) and current_moving_col <= min(self.num_cols - num_to_connect, col_of_last_counter):
+            for count in range(num_to_connect):
                 slot = self.board[current_moving_row][current_moving_col]
                 if slot != last_player_symbol:
                     current_moving_row += 1
@@ -153,12 +181,90 @@ class ConnectFour(object):
         else:
             self.current_player = "1"
 
+
+# Game records: one game per line, as the columns played in order (1 = leftmost, and after 9 come a, b, c...), e.g. "4453",
+# optionally followed by the player who moved first ("1" if not given) and the game as rowsxcolsxN (6x7x4 if not given),
+# e.g. "4453 2" or "44536 1 7x8x5". A game with no moves yet is written "-"
+COLUMN_CHARS = "123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def format_game_record(state):     # ConnectFourGameState (or ConnectFour) -> its game record
+    if state.num_cols > len(COLUMN_CHARS):
+        raise Exception(f"Game records cannot hold games with more than {len(COLUMN_CHARS)} columns")
+    fields = ["".join(COLUMN_CHARS[col] for col in state.moves) or "-"]
+    if (state.num_rows, state.num_cols, state.num_to_connect) != (6, 7, 4):
+        fields += [state.first_player, f"{state.num_rows}x{state.num_cols}x{state.num_to_connect}"]
+    elif state.first_player != "1":
+        fields.append(state.first_player)
+    return " ".join(fields)
+
+
+def parse_game_record(record_str, player_1_char="H", player_2_char="R"):     # game record -> ConnectFourGameState with its moves played
+    fields = record_str.split()
+    if not 1 <= len(fields) <= 3:
+        raise Exception(f"Game record {record_str!r} should be: moves [first player [rowsxcolsxN]]")
+    first_player = fields[1] if len(fields) > 1 else "1"
+    if first_player not in ["1", "2"]:
+        raise Exception(f"First player of game record {record_str!r} must be 1 or 2")
+    num_rows, num_cols, num_to_connect = 6, 7, 4
+    if len(fields) > 2:
+        try:
+            num_rows, num_cols, num_to_connect = [int(size_str) for size_str in fields[2].lower().split("x")]
+        except ValueError:
+            raise Exception(f"Game of record {record_str!r} must be given as rowsxcolsxN, e.g. 6x7x4")
+    state = ConnectFourGameState(first_player, num_rows, num_cols, player_1_char, player_2_char, num_to_connect)
+    if fields[0] != "-":
+        for col_char in fields[0].lower():
+            col = COLUMN_CHARS.find(col_char)
+            if col == -1 or col >= num_cols or col not in state.find_legal_moves():
+                raise Exception(f"Move {col_char!r} of game record {record_str!r} is not a legal move")
+            state.apply_move(col)
+    return state
+
+
+class ConnectFour(ConnectFourGameState):
+    def __init__(self, first_player, num_rows=6, num_cols=7, bot_depth_of_search=9, bot_transposition_table_size_in_mb=64, bot_time_limit_in_seconds=None, bot_node_limit=None, bot_num_workers=1, bot_shared_transposition_table=False, bot_opening_book_path=None, bot_transposition_table_path=None, bot_pondering=False, bot_endgame_table_path=None, num_to_connect=4):
+        ConnectFourGameState.__init__(self, first_player, num_rows, num_cols, player_1_char="H", player_2_char="R", num_to_connect=num_to_connect)    # player 1 is the human, player 2 the robot
+        self.empty_char = "_"
+        self.bot = ConnectFourBot(self.current_player, self.player_1_char, self.player_2_char, bot_depth_of_search, is_minimiser=True, transposition_table_size_in_mb=bot_transposition_table_size_in_mb,
+                                  time_limit_in_seconds=bot_time_limit_in_seconds, node_limit=bot_node_limit, num_workers=bot_num_workers, shared_transposition_table=bot_shared_transposition_table,
+                                  opening_book_path=bot_opening_book_path, transposition_table_path=bot_transposition_table_path, pondering=bot_pondering, num_to_connect=num_to_connect,
+                                  endgame_table_path=bot_endgame_table_path)
+
+    def print_board(self):
+        print(f"Current board ({self.player_1_char} = Your counter, {self.player_2_char} = Robot's counter, {self.empty_char} = Empty):")
+        for row in self.board:
+            row_str = ""
+            is_first_slot = True
+            for slot in row:
+                if not slot:
+                    added_char = self.empty_char
+                else:
+                    added_char = slot
+                if is_first_slot:
+                    row_str += added_char
+                    is_first_slot = False
+                else:
+                    row_str += f" {added_char}"
+            print(row_str)
+        print()
+
+    def place_counter(self, col):
+        if not ConnectFourGameState.place_counter(self, col):
+            return False
+        if self.current_player == "1":
+            print(f"You have inserted a counter into column {col + 1}\n")
+        else:
+            print(f"Robot has inserted a counter into column {col + 1}\n")
+        return True
+
     def play(self):
         print("You have started a Connect Four game!")
         print("-------------------------------------")
         self.print_board()
         while not self.game_is_over(self.col_of_last_counter):
             if self.current_player == "1":
+                self.bot.start_pondering(self.board)     # the robot searches its replies while you think
                 print("It's your turn to make a move!")
                 col_chosen_str = input(f"Which column would you like to place a counter in? Enter a number from 1 to {self.num_cols} (1 = leftmost column, {self.num_cols} = rightmost column): ")
                 while True:
@@ -179,6 +285,8 @@ class ConnectFour(object):
                 min_utility, bot_col_chosen = self.bot.find_best_move(self.board)
                 self.place_counter(bot_col_chosen)
                 print(f"Robot's evaluation of current position (Positive = Better for you, Negative = Better for robot): {min_utility}")
+                if self.bot.is_time_controlled():
+                    print(f"Robot searched {self.bot.depth_of_last_completed_search} moves ahead")
                 self.col_of_last_counter = bot_col_chosen
             self.print_board()
             self.switch_player()
@@ -190,17 +298,70 @@ class ConnectFour(object):
         else:
             print("Sorry, you lost, better luck next time!")
             print("---------------------------------------")
+        self.bot.close()
 
 
 class ConnectFourBot(object):
-    def __init__(self, first_player, player_1_char, player_2_char, bot_depth_of_search, is_minimiser):
+    decisive_utility = 5000     # evaluation_function never gets near this, so only wins and losses are scored beyond it
+    heuristic_version = 1     # to be raised whenever evaluation_function changes, so that transposition tables saved with the old one are not loaded
+
+    def __init__(self, first_player, player_1_char, player_2_char, bot_depth_of_search, is_minimiser, transposition_table_size_in_mb=64, time_limit_in_seconds=None, node_limit=None, move_ordering=True, incremental_evaluation=True, num_workers=1, shared_transposition_table=False, transposition_table=None, opening_book_path=None, symmetry_folding=True, transposition_table_path=None, pondering=False, search_stats=False, search_stats_hook=None, threat_analysis=False, forced_move_extensions=False, num_to_connect=4, compact_search=False, principal_variation_search=False, aspiration_window=None, endgame_table_path=None):
         self.first_player = first_player
         self.player_1_char = player_1_char
         self.player_2_char = player_2_char
         self.is_minimiser = is_minimiser
-        self.transposition_table = dict()
-        self.bot_depth_of_search = bot_depth_of_search
+        self.num_to_connect = num_to_connect     # counters in a row needed to win
+        if transposition_table is not None:     # table handed over by the caller (e.g. one shared by several games), who is in charge of closing it
+            self.transposition_table = transposition_table
+        elif shared_transposition_table:     # lets the worker processes of the parallel search read and fill the same table
+            self.transposition_table = SharedTranspositionTable(transposition_table_size_in_mb)
+        else:
+            self.transposition_table = TranspositionTable(transposition_table_size_in_mb)
+        self.is_transposition_table_owner = transposition_table is None
+        self.transposition_table_path = transposition_table_path     # if given, the table is warm-started from this file (by the first search, once the game is known) and saved back to it by close
+        self.opening_book = None    # moves looked up in the book file instead of searched, for positions it covers
+        if opening_book_path is not None:
+            self.opening_book = OpeningBook(opening_book_path)
+        self.endgame_table_path = endgame_table_path
+        self.endgame_table = None     # exact results looked up by the search for positions with few empty slots, instead of searching or evaluating them
+        if endgame_table_path is not None:
+            self.endgame_table = EndgameTable(endgame_table_path)
+        self.bot_depth_of_search = bot_depth_of_search    # in time-controlled mode, this is only a cap on the iterative deepening (None = no cap)
+        self.time_limit_in_seconds = time_limit_in_seconds
+        self.node_limit = node_limit
+        self.search_deadline = None
+        self.search_node_budget = None
+        self.num_nodes_at_next_budget_check = float("inf")
+        self.depth_of_last_completed_search = 0
+        self.move_ordering = move_ordering     # if False, only the best action from the transposition table is moved to the front
+        self.killer_moves = dict()     # current depth -> up to 2 actions that recently caused a cutoff at that depth
+        self.history_scores = (dict(), dict())     # for player 1 and player 2: slot filled by an action -> credit for the cutoffs it caused
+        self.centre_out_actions = dict()     # num_cols -> columns from the middle outwards
+        self.threat_analysis = threat_analysis     # if True, immediate wins and forced blocks are found before expanding a position, and moves under a winning slot of the opponent are pruned
+        self.forced_move_extensions = forced_move_extensions     # if True (with threat_analysis), positions with a single reply are searched one move deeper
+        self.compact_search = compact_search     # if True, searches with compact_alpha_beta_pruning, which finds the same results with fewer allocations per node
+        self.ordered_action_stacks = list()     # ply -> list the compact search orders the actions of its node at that ply into
+        self.best_action_stack = array("b")     # ply -> best action found by the compact search at that ply
+        self.principal_variation_search = principal_variation_search     # if True, actions after the first are searched with a null window first, and again with the full window only if they beat it
+        self.aspiration_window = aspiration_window     # if given, iterations of the iterative deepening from the third on search this far either side of the utility found 2 moves shallower
+        self.num_workers = num_workers     # above 1, searches with a fixed depth split the root actions between this many worker processes
+        self.parallel_root_search = None
+        self.incremental_evaluation = incremental_evaluation    # if True, the search keeps the heuristic score up to date move by move instead of rescanning the board at every leaf
         self.current_depth = 1
+        self.weighted_lines = dict()     # (num_rows, num_cols, num_to_connect) -> lines used by evaluate_position, with their row/col weights
+        self.diagonal_starting_points = dict()     # (num_rows, num_cols) -> slots the diagonals checked by find_winner and evaluation_function start from
+        self.symmetry_folding = symmetry_folding     # if True, a position and its mirror image share one transposition table entry (only for boards where the heuristic is symmetric too)
+        self.is_folding_mirror_positions = False     # whether symmetry folding applies to the current search, set by create_search_position
+        self.num_nodes_searched = 0
+        self.table_reuse_rates = list()     # for every searched move, the share of its table probes answered by entries from earlier searches
+        self.solvers = dict()     # (num_rows, num_cols, num_to_connect) -> ConnectFourSolver used by solve
+        self.ponderer = None    # if pondering, searches the replies to the opponent's possible moves in the background (started by start_pondering)
+        if pondering:
+            self.ponderer = Ponderer(self)
+        self.is_collecting_search_stats = search_stats or search_stats_hook is not None    # if True, every find_best_move fills a SearchStats
+        self.search_stats_hook = search_stats_hook     # if given, called with the SearchStats of every find_best_move, e.g. to send them to a metrics system
+        self.search_stats = None    # SearchStats of the search under way, only while collecting stats
+        self.last_search_stats = None
 
     def find_available_actions(self, board):
         available_actions = set()
@@ -228,16 +389,17 @@ class ConnectFourBot(object):
     def find_winner(self, board):
         num_rows_in_board = len(board)
         num_cols_in_board = len(board[0])
+        num_to_connect = self.num_to_connect
         # check rows
         for row in board:
             col = 0
             slot_checked = row[col]
-            while col <= num_cols_in_board - 4:
+            while col <= num_cols_in_board - num_to_connect:
                 if not slot_checked:
                     col += 1
                     slot_checked = row[col]
                     continue
-                for count in range(4):
+                for count in range(num_to_connect):
                     moving_slot = row[col]
                     if moving_slot != slot_checked:
                         slot_checked = moving_slot
@@ -251,12 +413,12 @@ class ConnectFourBot(object):
         for col in range(num_cols_in_board):
             row = 0
             slot_checked = board[row][col]
-            while row <= num_rows_in_board - 4:
+            while row <= num_rows_in_board - num_to_connect:
                 if not slot_checked:
                     row += 1
                     slot_checked = board[row][col]
                     continue
-                for count in range(4):
+                for count in range(num_to_connect):
                     moving_slot = board[row][col]
                     if moving_slot != slot_checked:
                         slot_checked = moving_slot
@@ -267,21 +429,17 @@ class ConnectFourBot(object):
                         return "1"
                     return "2"
         # check first diagonal (/)
-        first_diagonal_starting_points = list()
-        for row in range(3, num_rows_in_board - 1):
-            first_diagonal_starting_points.append((row, 0))
-        for col in range(num_cols_in_board - 3):
-            first_diagonal_starting_points.append((num_rows_in_board - 1, col))
+        first_diagonal_starting_points, second_diagonal_starting_points = self.find_diagonal_starting_points(num_rows_in_board, num_cols_in_board)
         for starting_point in first_diagonal_starting_points:
             row, col = starting_point
             slot_checked = board[row][col]
-            while row >= 3 and col <= num_cols_in_board - 4:
+            while row >= num_to_connect - 1 and col <= num_cols_in_board - num_to_connect:
                 if not slot_checked:
                     row -= 1
                     col += 1
                     slot_checked = board[row][col]
                     continue
-                for count in range(4):
+                for count in range(num_to_connect):
                     moving_slot = board[row][col]
                     if moving_slot != slot_checked:
                         slot_checked = moving_slot
@@ -293,21 +451,16 @@ class ConnectFourBot(object):
                         return "1"
                     return "2"
         # check second diagonal (\)
-        second_diagonal_starting_points = list()
-        for row in range(1, num_rows_in_board - 3):
-            second_diagonal_starting_points.append((row, 0))
-        for col in range(num_cols_in_board - 3):
-            second_diagonal_starting_points.append((0, col))
         for starting_point in second_diagonal_starting_points:
             row, col = starting_point
             slot_checked = board[row][col]
-            while row <= num_rows_in_board - 4 and col <= num_cols_in_board - 4:
+            while row <= num_rows_in_board - num_to_connect and col <= num_cols_in_board - num_to_connect:
                 if not slot_checked:
                     row += 1
                     col += 1
                     slot_checked = board[row][col]
                     continue
-                for count in range(4):
+                for count in range(num_to_connect):
                     moving_slot = board[row][col]
                     if moving_slot != slot_checked:
                         slot_checked = moving_slot
@@ -322,16 +475,30 @@ class ConnectFourBot(object):
             return "draw"
         return None
 
+    def find_diagonal_starting_points(self, num_rows_in_board, num_cols_in_board):
+        # (first diagonal (/) lines from their bottom left slot, second diagonal (\) lines from their top left slot), for diagonals with room
+        # for num_to_connect counters; worked out once for each board size
+        table_key = (num_rows_in_board, num_cols_in_board)
+        if table_key not in self.diagonal_starting_points:
+            num_to_connect = self.num_to_connect
+            first_diagonal_starting_points = list()
+            for row in range(num_to_connect - 1, num_rows_in_board - 1):
+                first_diagonal_starting_points.append((row, 0))
+            for col in range(num_cols_in_board - num_to_connect + 1):
+                first_diagonal_starting_points.append((num_rows_in_board - 1, col))
+            second_diagonal_starting_points = list()
+            for row in range(1, num_rows_in_board - num_to_connect + 1):
+                second_diagonal_starting_points.append((row, 0))
+            for col in range(num_cols_in_board - num_to_connect + 1):
+                second_diagonal_starting_points.append((0, col))
+            self.diagonal_starting_points[table_key] = (first_diagonal_starting_points, second_diagonal_starting_points)
+        return self.diagonal_starting_points[table_key]
+
     def is_terminal_state(self, board):
         return bool(self.find_winner(board))
 
     def find_utility(self, terminal_board, current_depth):     # 100 for player 1 winning, 0 for draw, -100 for player 2 winning
-        outcome = self.find_winner(terminal_board)
-        if outcome == "1":
-            return 10000 - current_depth
-        if outcome == "2":
-            return -10000 + current_depth
-        return 0
+        return self.find_utility_of_outcome(self.find_winner(terminal_board), current_depth)
 
     def find_row_weight(self, row, num_rows_in_board):
         return ((row + 1) / num_rows_in_board) + ((num_rows_in_board - 1) / (2 * num_rows_in_board))       # weighted by height of row; added additional term to standardise around 1
@@ -347,6 +514,7 @@ class ConnectFourBot(object):
     def evaluation_function(self, board):
         num_rows_in_board = len(board)
         num_cols_in_board = len(board[0])
+        num_to_connect = self.num_to_connect
         player_1_score = 0
         player_2_score = 0
         # check rows
@@ -355,10 +523,10 @@ class ConnectFourBot(object):
             if self.player_1_char not in row and self.player_2_char not in row:
                 break
             col = 0
-            while col <= num_cols_in_board - 4:
+            while col <= num_cols_in_board - num_to_connect:
                 stretch_of_slots = dict()
                 is_split = False
-                for count in range(4):
+                for count in range(num_to_connect):
                     slot = row[col + count]
                     if slot not in stretch_of_slots:
                         if (slot == self.player_1_char and self.player_2_char in stretch_of_slots) or (slot == self.player_2_char and self.player_1_char in stretch_of_slots):
@@ -392,12 +560,12 @@ class ConnectFourBot(object):
                 continue
             row = num_rows_in_board - 1
             lowest_empty_row = -1
-            while row >= 3:
+            while row >= num_to_connect - 1:
                 if row == lowest_empty_row:
                     break
                 stretch_of_slots = dict()
                 is_successful_stretch = True
-                for count in range(4):
+                for count in range(num_to_connect):
                     slot = board[row - count][col]
                     if slot not in stretch_of_slots:
                         if not slot:
@@ -424,17 +592,13 @@ class ConnectFourBot(object):
                         player_1_score -= player_2_score_gained
                 row -= 1
         # check first diagonal (/)
-        first_diagonal_starting_points = list()
-        for row in range(3, num_rows_in_board - 1):
-            first_diagonal_starting_points.append((row, 0))
-        for col in range(num_cols_in_board - 3):
-            first_diagonal_starting_points.append((num_rows_in_board - 1, col))
+        first_diagonal_starting_points, second_diagonal_starting_points = self.find_diagonal_starting_points(num_rows_in_board, num_cols_in_board)
         for starting_point in first_diagonal_starting_points:
             row, col = starting_point
-            while row >= 3 and col <= num_cols_in_board - 4:
+            while row >= num_to_connect - 1 and col <= num_cols_in_board - num_to_connect:
                 stretch_of_slots = dict()
                 is_split = False
-                for count in range(4):
+                for count in range(num_to_connect):
                     slot = board[row - count][col + count]
                     if slot not in stretch_of_slots:
                         stretch_of_slots[slot] = list()
@@ -468,17 +632,12 @@ class ConnectFourBot(object):
                 row -= 1
                 col += 1
         # check second diagonal (\)
-        second_diagonal_starting_points = list()
-        for row in range(1, num_rows_in_board - 3):
-            second_diagonal_starting_points.append((row, 0))
-        for col in range(num_cols_in_board - 3):
-            second_diagonal_starting_points.append((0, col))
         for starting_point in second_diagonal_starting_points:
             row, col = starting_point
-            while row <= num_rows_in_board - 4 and col <= num_cols_in_board - 4:
+            while row <= num_rows_in_board - num_to_connect and col <= num_cols_in_board - num_to_connect:
                 stretch_of_slots = dict()
                 is_split = False
-                for count in range(4):
+                for count in range(num_to_connect):
                     slot = board[row + count][col + count]
                     if slot not in stretch_of_slots:
                         stretch_of_slots[slot] = list()
@@ -521,85 +680,752 @@ class ConnectFourBot(object):
         tuple_sequence = tuple(tuple_sequence)
         return tuple_sequence
 
-    def alpha_beta_pruning(self, board, is_minimiser, alpha, beta, current_depth, max_depth):
-        board_state = self.convert_board_to_tuple(board)
-        board_state_is_in_table = False
-        if board_state in self.transposition_table:
-            board_state_is_in_table = True
-            stored_utility, best_action, max_depth_searched_to_produce_info, nature_of_stored_utility = self.transposition_table[board_state]
-            if max_depth_searched_to_produce_info >= max_depth:
-                if nature_of_stored_utility == "exact":
-                    return stored_utility, best_action
-                if nature_of_stored_utility == "upper bound" and stored_utility <= alpha:
-                    return stored_utility, best_action
-                if nature_of_stored_utility == "lower bound" and stored_utility >= beta:
-                    return stored_utility, best_action
-        if self.is_terminal_state(board):
-            info_stored_in_table = (self.find_utility(board, current_depth), -1, max_depth, "exact")  # no action can be taken in terminal state
-            self.transposition_table[board_state] = info_stored_in_table
-            return info_stored_in_table[0], info_stored_in_table[1]
-        if current_depth == max_depth:
-            info_stored_in_table = (self.evaluation_function(board), -1, max_depth, "exact")  # no action is required at max depth
-            self.transposition_table[board_state] = info_stored_in_table
-            return info_stored_in_table[0], info_stored_in_table[1]
-        available_actions = self.find_available_actions(board)
-        if board_state_is_in_table:
-            recorded_best_action = self.transposition_table[board_state][1]
+    def find_weighted_lines(self, position):
+        # row and column weights are turned into exact fractions over a common denominator, so that evaluate_position can add up
+        # integer scores and divide once at the end, giving the same float whatever order the lines are visited in
+        table_key = (position.num_rows, position.num_cols, position.num_to_connect)
+        if table_key not in self.weighted_lines:
+            fractional_weights = list()
+            for kind, weight_index, mask, lowest_bit, line_scores in position.find_lines():
+                if kind == "row":
+                    weight = Fraction(self.find_row_weight(weight_index, position.num_rows)).limit_denominator(10000)
+                elif kind == "col":
+                    weight = Fraction(self.find_col_weight(weight_index, position.num_cols)).limit_denominator(10000)
+                else:   # diagonals are not weighted
+                    weight = Fraction(1)
+                fractional_weights.append((mask, lowest_bit, line_scores, weight))
+            denominator = 1
+            for mask, lowest_bit, line_scores, weight in fractional_weights:
+                denominator = denominator * weight.denominator // math.gcd(denominator, weight.denominator)
+            # each line mask covers the line's slots in both halves of BitboardPosition.key, so one AND picks out both players' counters
+            weighted_lines = [(mask | (mask << position.board_bits), lowest_bit, line_scores, int(weight * denominator)) for mask, lowest_bit, line_scores, weight in fractional_weights]
+            self.weighted_lines[table_key] = (weighted_lines, denominator)
+        return self.weighted_lines[table_key]
+
+    def evaluate_position(self, position):     # same heuristic as evaluation_function, computed on a BitboardPosition
+        weighted_lines, denominator = self.find_weighted_lines(position)
+        board_state = position.key()
+        player_1_score = 0
+        for line_mask, lowest_bit, line_scores, weight in weighted_lines:
+            pattern = board_state & line_mask
+            if pattern:
+                player_1_score += line_scores[pattern >> lowest_bit] * weight
+        return player_1_score / denominator    # player 2 is looking to minimise utility
+
+    def find_utility_of_outcome(self, outcome, current_depth):
+        if outcome == "1":
+            return 10000 - current_depth
+        if outcome == "2":
+            return -10000 + current_depth
+        return 0
+
+    def find_table_utility(self, utility, current_depth):     # wins and losses are stored as distances from the position rather than from the empty board
+        if utility >= self.decisive_utility:
+            return utility + current_depth
+        if utility <= -self.decisive_utility:
+            return utility - current_depth
+        return utility
+
+    def find_utility_from_table(self, table_utility, current_depth):
+        if table_utility >= self.decisive_utility:
+            return table_utility - current_depth
+        if table_utility <= -self.decisive_utility:
+            return table_utility + current_depth
+        return table_utility
+
+    def find_centre_out_actions(self, num_cols):
+        if num_cols not in self.centre_out_actions:
+            self.centre_out_actions[num_cols] = sorted(range(num_cols), key=lambda col: abs(2 * col - (num_cols - 1)))
+        return self.centre_out_actions[num_cols]
+
+    def find_action_in_slots(self, position, slots):     # the column nearest the middle whose next counter would fill one of the slots
+        for action in self.find_centre_out_actions(position.num_cols):
+            if position.heights[action] < position.num_rows and slots >> (action * position.col_stride + position.heights[action]) & 1:
+                return action
+        return -1
+
+    def analyse_threats(self, position, is_minimiser, current_depth):
+        # returns (utility, action, 0, False) if the position is decided within the next 2 moves,
+        # otherwise (None, -1, slots filled by the actions worth searching, whether the only such action is forced)
+        if is_minimiser:
+            own_bitboard, opponent_bitboard, own_outcome, opponent_outcome = position.player_2_bitboard, position.player_1_bitboard, "2", "1"
+        else:
+            own_bitboard, opponent_bitboard, own_outcome, opponent_outcome = position.player_1_bitboard, position.player_2_bitboard, "1", "2"
+        playable_slots = position.find_playable_slots()
+        winning_slots = position.find_winning_slots(own_bitboard) & playable_slots
+        if winning_slots:
+            return self.find_utility_of_outcome(own_outcome, current_depth + 1), self.find_action_in_slots(position, winning_slots), 0, False
+        opponent_winning_slots = position.find_winning_slots(opponent_bitboard)
+        forced_slots = opponent_winning_slots & playable_slots
+        if forced_slots & (forced_slots - 1):     # the opponent can win in two places, only one of which can be blocked
+            return self.find_utility_of_outcome(opponent_outcome, current_depth + 2), self.find_action_in_slots(position, forced_slots), 0, False
+        if forced_slots:
+            return None, -1, forced_slots, True
+        safe_slots = playable_slots & ~(opponent_winning_slots >> 1)     # a counter right under a winning slot of the opponent lets them win on top of it
+        if not safe_slots:
+            return self.find_utility_of_outcome(opponent_outcome, current_depth + 2), self.find_action_in_slots(position, playable_slots), 0, False
+        return None, -1, safe_slots, False
+
+    def find_ordered_actions(self, position, is_minimiser, table_entry, current_depth):
+        if self.move_ordering:
+            return self.order_actions(position, is_minimiser, table_entry, current_depth)
+        available_actions = position.find_available_actions()
+        if table_entry is not None:
+            recorded_best_action = table_entry[1]
             if recorded_best_action != -1:
                 available_actions.remove(recorded_best_action)
-                available_actions = [recorded_best_action] + list(available_actions)
+                available_actions = [recorded_best_action] + available_actions
+        return available_actions
+
+    def order_actions(self, position, is_minimiser, table_entry, current_depth):
+        # order: best action from the transposition table, actions that win immediately, actions that block an immediate win of the opponent,
+        # killer moves at this depth, then the rest by history score (columns nearer the middle first when scores are tied)
+        if is_minimiser:
+            own_bitboard, opponent_bitboard = position.player_2_bitboard, position.player_1_bitboard
+        else:
+            own_bitboard, opponent_bitboard = position.player_1_bitboard, position.player_2_bitboard
+        playable_slots = position.find_playable_slots()
+        winning_slots = position.find_winning_slots(own_bitboard) & playable_slots
+        blocking_slots = position.find_winning_slots(opponent_bitboard) & playable_slots
+        table_best_action = table_entry[1] if table_entry is not None else -1
+        killer_moves = self.killer_moves.get(current_depth, ())
+        history_scores = self.history_scores[is_minimiser]
+        col_stride = position.col_stride
+        heights = position.heights
+        action_priorities = list()
+        for action in self.find_centre_out_actions(position.num_cols):
+            if heights[action] == position.num_rows:
+                continue
+            slot_index = action * col_stride + heights[action]
+            if action == table_best_action:
+                priority = (0, 0)
+            elif winning_slots >> slot_index & 1:
+                priority = (1, 0)
+            elif blocking_slots >> slot_index & 1:
+                priority = (2, 0)
+            elif action in killer_moves:
+                priority = (3, killer_moves.index(action))
+            else:
+                priority = (4, -history_scores.get(slot_index, 0))
+            action_priorities.append((priority, action))
+        action_priorities.sort(key=lambda priority_and_action: priority_and_action[0])     # stable, so ties stay in centre-out order
+        return [action for priority, action in action_priorities]
+
+    def record_cutoff(self, position, is_minimiser, action, current_depth, max_depth):
+        killer_moves = self.killer_moves.setdefault(current_depth, list())
+        if action not in killer_moves:
+            killer_moves.insert(0, action)
+            del killer_moves[2:]
+        slot_index = action * position.col_stride + position.heights[action]
+        history_scores = self.history_scores[is_minimiser]
+        history_scores[slot_index] = history_scores.get(slot_index, 0) + (max_depth - current_depth) ** 2     # cutoffs far from the leaves count for more
+
+    def alpha_beta_pruning(self, position, is_minimiser, alpha, beta, current_depth, max_depth):
+        self.num_nodes_searched += 1
+        if self.num_nodes_searched >= self.num_nodes_at_next_budget_check:
+            self.check_search_budget()
+        board_state = position.zobrist_key
+        is_mirrored = False
+        if self.is_folding_mirror_positions and position.mirrored_zobrist_key < board_state:     # stored under the key of its mirror image, with the best action mirrored too
+            board_state = position.mirrored_zobrist_key
+            is_mirrored = True
+        remaining_depth = max_depth - current_depth     # entries hold the number of moves searched below the position, so they can be reused at any ply
+        table_entry = self.transposition_table.probe(board_state)
+        if table_entry is not None:
+            if is_mirrored and table_entry[1] != -1:
+                table_entry = (table_entry[0], position.num_cols - 1 - table_entry[1], table_entry[2], table_entry[3])
+            stored_utility, best_action, depth_searched_to_produce_info, nature_of_stored_utility = table_entry
+            stored_utility = self.find_utility_from_table(stored_utility, current_depth)
+            if depth_searched_to_produce_info >= remaining_depth:
+                if nature_of_stored_utility == EXACT or (nature_of_stored_utility == UPPER_BOUND and stored_utility <= alpha) or (nature_of_stored_utility == LOWER_BOUND and stored_utility >= beta):
+                    if self.search_stats is not None:
+                        self.search_stats.record_table_cutoff(nature_of_stored_utility)
+                    return stored_utility, best_action
+        outcome = position.find_winner_after_move()     # the parent was not over, so only the last counter can have ended the game
+        if outcome:
+            if self.search_stats is not None:
+                self.search_stats.num_terminal_positions += 1
+            utility = self.find_utility_of_outcome(outcome, current_depth)
+            self.transposition_table.store(board_state, self.find_table_utility(utility, current_depth), -1, remaining_depth, EXACT)     # no action can be taken in terminal state
+            return utility, -1
+        if self.endgame_table is not None:
+            endgame_result = self.endgame_table.find_result(position, is_minimiser)
+            if endgame_result is not None:     # exact, as if searched to the end of the game
+                if self.search_stats is not None:
+                    self.search_stats.num_endgame_hits += 1
+                outcome, num_counters_to_end, action = endgame_result
+                utility = self.find_utility_of_outcome(outcome, current_depth + num_counters_to_end)
+                table_action = position.num_cols - 1 - action if is_mirrored else action
+                self.transposition_table.store(board_state, self.find_table_utility(utility, current_depth), table_action, position.num_rows * position.num_cols - position.num_counters, EXACT)
+                return utility, action
+        if current_depth == max_depth:
+            if self.search_stats is not None:
+                self.search_stats.num_leaf_evaluations += 1
+            if self.incremental_evaluation:
+                utility = position.evaluate()
+            else:
+                utility = self.evaluate_position(position)
+            self.transposition_table.store(board_state, utility, -1, 0, EXACT)     # no action is required at max depth
+            return utility, -1
+        searched_slots = None
+        if self.threat_analysis:
+            utility, action, searched_slots, is_forced = self.analyse_threats(position, is_minimiser, current_depth)
+            if utility is not None:
+                if self.search_stats is not None:
+                    self.search_stats.num_threat_cutoffs += 1
+                table_action = position.num_cols - 1 - action if is_mirrored else action
+                self.transposition_table.store(board_state, self.find_table_utility(utility, current_depth), table_action, remaining_depth, EXACT)
+                return utility, action
+            if is_forced and self.forced_move_extensions:     # a single reply costs one node, so it does not use up a move of the depth of search
+                max_depth += 1
+                if self.search_stats is not None:
+                    self.search_stats.num_forced_extensions += 1
+        available_actions = self.find_ordered_actions(position, is_minimiser, table_entry, current_depth)
+        if searched_slots is not None:
+            available_actions = [action for action in available_actions if searched_slots >> (action * position.col_stride + position.heights[action]) & 1]
         if is_minimiser:
             min_utility = float("inf")
             best_action = -1
             is_exact_utility = True
+            beta_at_start = beta
             for action in available_actions:
-                possible_min_utility, next_player_best_action = self.alpha_beta_pruning(self.find_result_of_action(board, action, is_minimiser=True), False, alpha, beta, current_depth=current_depth + 1, max_depth=max_depth)
+                position.make_move(action, is_minimiser=True)
+                if self.principal_variation_search and best_action != -1:     # after the first action, only whether an action beats beta is searched at first
+                    possible_min_utility, next_player_best_action = self.alpha_beta_pruning(position, False, math.nextafter(beta, -math.inf), beta, current_depth=current_depth + 1, max_depth=max_depth)
+                    if alpha < possible_min_utility < beta:     # it does, so it is searched again between alpha and the bound it came back with
+                        if self.search_stats is not None:
+                            self.search_stats.num_re_searches += 1
+                        possible_min_utility, next_player_best_action = self.alpha_beta_pruning(position, False, alpha, possible_min_utility, current_depth=current_depth + 1, max_depth=max_depth)
+                else:
+                    possible_min_utility, next_player_best_action = self.alpha_beta_pruning(position, False, alpha, beta, current_depth=current_depth + 1, max_depth=max_depth)
+                position.unmake_move()
                 if possible_min_utility < min_utility:
                     min_utility = possible_min_utility
                     best_action = action
                 beta = min(beta, possible_min_utility)
                 if alpha >= beta:
                     is_exact_utility = False
+                    if self.move_ordering:
+                        self.record_cutoff(position, True, action, current_depth, max_depth)
+                    if self.search_stats is not None:
+                        self.search_stats.record_beta_cutoff(available_actions.index(action))
                     break
-            if is_exact_utility:
-                nature_of_stored_utility = "exact"
+            if not is_exact_utility:
+                nature_of_stored_utility = UPPER_BOUND
+            elif min_utility >= beta_at_start:      # every action failed high, so the true utility can only be higher
+                nature_of_stored_utility = LOWER_BOUND
+            else:
+                nature_of_stored_utility = EXACT
+            table_utility = self.find_table_utility(min_utility, current_depth)
+            if is_mirrored:
+                self.transposition_table.store(board_state, table_utility, position.num_cols - 1 - best_action, remaining_depth, nature_of_stored_utility)
             else:
-                nature_of_stored_utility = "upper bound"
-            info_stored_in_table = (min_utility, best_action, max_depth, nature_of_stored_utility)
-            self.transposition_table[board_state] = info_stored_in_table
-            return info_stored_in_table[0], info_stored_in_table[1]
+                self.transposition_table.store(board_state, table_utility, best_action, remaining_depth, nature_of_stored_utility)
+            return min_utility, best_action
         else:
             max_utility = float("-inf")
             best_action = -1
             is_exact_utility = True
+            alpha_at_start = alpha
             for action in available_actions:
-                possible_max_utility, next_player_best_action = self.alpha_beta_pruning(self.find_result_of_action(board, action, is_minimiser=False), True, alpha, beta, current_depth=current_depth + 1, max_depth=max_depth)
+                position.make_move(action, is_minimiser=False)
+                if self.principal_variation_search and best_action != -1:
+                    possible_max_utility, next_player_best_action = self.alpha_beta_pruning(position, True, alpha, math.nextafter(alpha, math.inf), current_depth=current_depth + 1, max_depth=max_depth)
+                    if alpha < possible_max_utility < beta:
+                        if self.search_stats is not None:
+                            self.search_stats.num_re_searches += 1
+                        possible_max_utility, next_player_best_action = self.alpha_beta_pruning(position, True, possible_max_utility, beta, current_depth=current_depth + 1, max_depth=max_depth)
+                else:
+                    possible_max_utility, next_player_best_action = self.alpha_beta_pruning(position, True, alpha, beta, current_depth=current_depth + 1, max_depth=max_depth)
+                position.unmake_move()
                 if possible_max_utility > max_utility:
                     max_utility = possible_max_utility
                     best_action = action
                 alpha = max(alpha, possible_max_utility)
                 if alpha >= beta:
                     is_exact_utility = False
+                    if self.move_ordering:
+                        self.record_cutoff(position, False, action, current_depth, max_depth)
+                    if self.search_stats is not None:
+                        self.search_stats.record_beta_cutoff(available_actions.index(action))
                     break
-            if is_exact_utility:
-                nature_of_stored_utility = "exact"
+            if not is_exact_utility:
+                nature_of_stored_utility = LOWER_BOUND
+            elif max_utility <= alpha_at_start:     # every action failed low, so the true utility can only be lower
+                nature_of_stored_utility = UPPER_BOUND
+            else:
+                nature_of_stored_utility = EXACT
+            table_utility = self.find_table_utility(max_utility, current_depth)
+            if is_mirrored:
+                self.transposition_table.store(board_state, table_utility, position.num_cols - 1 - best_action, remaining_depth, nature_of_stored_utility)
+            else:
+                self.transposition_table.store(board_state, table_utility, best_action, remaining_depth, nature_of_stored_utility)
+            return max_utility, best_action
+
+    def prepare_compact_search(self, position):
+        # one list of ordered actions and one best action per ply, made once per board size and reused by every node at that ply
+        num_plies = position.num_rows * position.num_cols + 2
+        if len(self.best_action_stack) < num_plies:
+            self.ordered_action_stacks = [list() for ply in range(num_plies)]
+            self.best_action_stack = array("b", [-1]) * num_plies
+
+    def search_position(self, position, is_minimiser, alpha, beta, current_depth, max_depth):     # (utility, best action), with whichever search the bot was made with
+        if not self.compact_search:
+            return self.alpha_beta_pruning(position, is_minimiser, alpha, beta, current_depth=current_depth, max_depth=max_depth)
+        self.prepare_compact_search(position)
+        utility = self.compact_alpha_beta_pruning(position, is_minimiser, alpha, beta, current_depth, max_depth)
+        return utility, self.best_action_stack[current_depth]
+
+    def fill_ordered_actions(self, position, is_minimiser, table_best_action, current_depth, searched_slots, ordered_actions):
+        # same order as find_ordered_actions (then filtered by searched_slots, unless it is -1), written into ordered_actions in place.
+        # The priorities of order_actions are packed into one int per action, with the centre-out rank of the action in the lowest digit,
+        # so that a plain sort of ints gives the order of the stable tuple sort
+        del ordered_actions[:]
+        heights = position.heights
+        num_rows = position.num_rows
+        col_stride = position.col_stride
+        if not self.move_ordering:
+            if table_best_action != -1 and searched_slots >> (table_best_action * col_stride + heights[table_best_action]) & 1:
+                ordered_actions.append(table_best_action)
+            for action in range(position.num_cols):
+                if heights[action] < num_rows and action != table_best_action and searched_slots >> (action * col_stride + heights[action]) & 1:
+                    ordered_actions.append(action)
+            return
+        if is_minimiser:
+            own_bitboard, opponent_bitboard = position.player_2_bitboard, position.player_1_bitboard
+        else:
+            own_bitboard, opponent_bitboard = position.player_1_bitboard, position.player_2_bitboard
+        playable_slots = position.find_playable_slots()
+        winning_slots = position.find_winning_slots(own_bitboard) & playable_slots
+        blocking_slots = position.find_winning_slots(opponent_bitboard) & playable_slots
+        killer_moves = self.killer_moves.get(current_depth, ())
+        history_scores = self.history_scores[is_minimiser]
+        centre_out_actions = self.find_centre_out_actions(position.num_cols)
+        num_cols = position.num_cols
+        for rank in range(num_cols):
+            action = centre_out_actions[rank]
+            if heights[action] == num_rows:
+                continue
+            slot_index = action * col_stride + heights[action]
+            if not searched_slots >> slot_index & 1:
+                continue
+            if action == table_best_action:
+                sort_code = 0
+            elif winning_slots >> slot_index & 1:
+                sort_code = 1 << 40
+            elif blocking_slots >> slot_index & 1:
+                sort_code = 2 << 40
+            elif action in killer_moves:
+                sort_code = (3 << 40) + killer_moves.index(action)
             else:
-                nature_of_stored_utility = "lower bound"
-            info_stored_in_table = (max_utility, best_action, max_depth, nature_of_stored_utility)
-            self.transposition_table[board_state] = info_stored_in_table
-            return info_stored_in_table[0], info_stored_in_table[1]
+                sort_code = (4 << 40) - history_scores.get(slot_index, 0)
+            ordered_actions.append(sort_code * num_cols + rank)
+        ordered_actions.sort()
+        for index in range(len(ordered_actions)):
+            ordered_actions[index] = centre_out_actions[ordered_actions[index] % num_cols]
+
+    def compact_alpha_beta_pruning(self, position, is_minimiser, alpha, beta, current_depth, max_depth):
+        # The search of alpha_beta_pruning, node for node, for bots made with compact_search=True. Most of the per-node tuples and lists of the
+        # search are left out: the utility is returned on its own and the best action left in best_action_stack[current_depth], table entries are
+        # read as packed ints by probe_info, and actions are ordered into the list of ordered_action_stacks kept for the ply. Utilities are still
+        # new floats at every node
+        self.num_nodes_searched += 1
+        if self.num_nodes_searched >= self.num_nodes_at_next_budget_check:
+            self.check_search_budget()
+        best_action_stack = self.best_action_stack
+        transposition_table = self.transposition_table
+        board_state = position.zobrist_key
+        is_mirrored = False
+        if self.is_folding_mirror_positions and position.mirrored_zobrist_key < board_state:
+            board_state = position.mirrored_zobrist_key
+            is_mirrored = True
+        remaining_depth = max_depth - current_depth
+        table_best_action = -1
+        table_info = transposition_table.probe_info(board_state)     # bit 0: in use, bits 1-2: bound type, bits 3-8: best action + 1, bits 17 and up: depth
+        if table_info:
+            table_best_action = ((table_info >> 3) & 63) - 1
+            if is_mirrored and table_best_action != -1:
+                table_best_action = position.num_cols - 1 - table_best_action
+            if table_info >> 17 >= remaining_depth:
+                stored_utility = self.find_utility_from_table(transposition_table.probed_utility, current_depth)
+                nature_of_stored_utility = (table_info >> 1) & 3
+                if nature_of_stored_utility == EXACT or (nature_of_stored_utility == UPPER_BOUND and stored_utility <= alpha) or (nature_of_stored_utility == LOWER_BOUND and stored_utility >= beta):
+                    if self.search_stats is not None:
+                        self.search_stats.record_table_cutoff(nature_of_stored_utility)
+                    best_action_stack[current_depth] = table_best_action
+                    return stored_utility
+        outcome = position.find_winner_after_move()
+        if outcome:
+            if self.search_stats is not None:
+                self.search_stats.num_terminal_positions += 1
+            utility = self.find_utility_of_outcome(outcome, current_depth)
+            transposition_table.store(board_state, self.find_table_utility(utility, current_depth), -1, remaining_depth, EXACT)
+            best_action_stack[current_depth] = -1
+            return utility
+        if self.endgame_table is not None:
+            endgame_result = self.endgame_table.find_result(position, is_minimiser)
+            if endgame_result is not None:
+                if self.search_stats is not None:
+                    self.search_stats.num_endgame_hits += 1
+                outcome, num_counters_to_end, action = endgame_result
+                utility = self.find_utility_of_outcome(outcome, current_depth + num_counters_to_end)
+                table_action = position.num_cols - 1 - action if is_mirrored else action
+                transposition_table.store(board_state, self.find_table_utility(utility, current_depth), table_action, position.num_rows * position.num_cols - position.num_counters, EXACT)
+                best_action_stack[current_depth] = action
+                return utility
+        if current_depth == max_depth:
+            if self.search_stats is not None:
+                self.search_stats.num_leaf_evaluations += 1
+            if self.incremental_evaluation:
+                utility = position.evaluate()
+            else:
+                utility = self.evaluate_position(position)
+            transposition_table.store(board_state, utility, -1, 0, EXACT)
+            best_action_stack[current_depth] = -1
+            return utility
+        searched_slots = -1     # every slot
+        if self.threat_analysis:
+            utility, action, searched_slots, is_forced = self.analyse_threats(position, is_minimiser, current_depth)
+            if utility is not None:
+                if self.search_stats is not None:
+                    self.search_stats.num_threat_cutoffs += 1
+                table_action = position.num_cols - 1 - action if is_mirrored else action
+                transposition_table.store(board_state, self.find_table_utility(utility, current_depth), table_action, remaining_depth, EXACT)
+                best_action_stack[current_depth] = action
+                return utility
+            if is_forced and self.forced_move_extensions:
+                max_depth += 1
+                if self.search_stats is not None:
+                    self.search_stats.num_forced_extensions += 1
+        ordered_actions = self.ordered_action_stacks[current_depth]
+        self.fill_ordered_actions(position, is_minimiser, table_best_action, current_depth, searched_slots, ordered_actions)
+        best_action = -1
+        action_index = 0
+        if is_minimiser:
+            min_utility = float("inf")
+            beta_at_start = beta
+            nature_of_stored_utility = EXACT
+            for action in ordered_actions:
+                position.make_move(action, True)
+                if self.principal_variation_search and action_index:
+                    possible_min_utility = self.compact_alpha_beta_pruning(position, False, math.nextafter(beta, -math.inf), beta, current_depth + 1, max_depth)
+                    if alpha < possible_min_utility < beta:
+                        if self.search_stats is not None:
+                            self.search_stats.num_re_searches += 1
+                        possible_min_utility = self.compact_alpha_beta_pruning(position, False, alpha, possible_min_utility, current_depth + 1, max_depth)
+                else:
+                    possible_min_utility = self.compact_alpha_beta_pruning(position, False, alpha, beta, current_depth + 1, max_depth)
+                position.unmake_move()
+                if possible_min_utility < min_utility:
+                    min_utility = possible_min_utility
+                    best_action = action
+                if possible_min_utility < beta:
+                    beta = possible_min_utility
+                if alpha >= beta:
+                    nature_of_stored_utility = UPPER_BOUND
+                    if self.move_ordering:
+                        self.record_cutoff(position, True, action, current_depth, max_depth)
+                    if self.search_stats is not None:
+                        self.search_stats.record_beta_cutoff(action_index)
+                    break
+                action_index += 1
+            if nature_of_stored_utility == EXACT and min_utility >= beta_at_start:
+                nature_of_stored_utility = LOWER_BOUND
+            utility = min_utility
+        else:
+            max_utility = float("-inf")
+            alpha_at_start = alpha
+            nature_of_stored_utility = EXACT
+            for action in ordered_actions:
+                position.make_move(action, False)
+                if self.principal_variation_search and action_index:
+                    possible_max_utility = self.compact_alpha_beta_pruning(position, True, alpha, math.nextafter(alpha, math.inf), current_depth + 1, max_depth)
+                    if alpha < possible_max_utility < beta:
+                        if self.search_stats is not None:
+                            self.search_stats.num_re_searches += 1
+                        possible_max_utility = self.compact_alpha_beta_pruning(position, True, possible_max_utility, beta, current_depth + 1, max_depth)
+                else:
+                    possible_max_utility = self.compact_alpha_beta_pruning(position, True, alpha, beta, current_depth + 1, max_depth)
+                position.unmake_move()
+                if possible_max_utility > max_utility:
+                    max_utility = possible_max_utility
+                    best_action = action
+                if possible_max_utility > alpha:
+                    alpha = possible_max_utility
+                if alpha >= beta:
+                    nature_of_stored_utility = LOWER_BOUND
+                    if self.move_ordering:
+                        self.record_cutoff(position, False, action, current_depth, max_depth)
+                    if self.search_stats is not None:
+                        self.search_stats.record_beta_cutoff(action_index)
+                    break
+                action_index += 1
+            if nature_of_stored_utility == EXACT and max_utility <= alpha_at_start:
+                nature_of_stored_utility = UPPER_BOUND
+            utility = max_utility
+        if is_mirrored and best_action != -1:
+            transposition_table.store(board_state, self.find_table_utility(utility, current_depth), position.num_cols - 1 - best_action, remaining_depth, nature_of_stored_utility)
+        else:
+            transposition_table.store(board_state, self.find_table_utility(utility, current_depth), best_action, remaining_depth, nature_of_stored_utility)
+        best_action_stack[current_depth] = best_action
+        return utility
+
+    def is_time_controlled(self):
+        return self.time_limit_in_seconds is not None or self.node_limit is not None
+
+    def check_search_budget(self):
+        if self.ponderer is not None and self.ponderer.is_stop_requested():
+            raise SearchTimeout()
+        if self.search_deadline is not None and time.perf_counter() >= self.search_deadline:
+            raise SearchTimeout()
+        if self.search_node_budget is not None and self.num_nodes_searched >= self.search_node_budget:
+            raise SearchTimeout()
+        self.num_nodes_at_next_budget_check = self.num_nodes_searched + 1024     # reading the clock at every node would slow the search down
+        if self.search_node_budget is not None:
+            self.num_nodes_at_next_budget_check = min(self.num_nodes_at_next_budget_check, self.search_node_budget)
+
+    def iterative_deepening(self, position, is_minimiser):
+        # searches 1, 2, 3... moves ahead until the time or node budget runs out, and returns the result of the deepest search that finished
+        # best actions stored in the transposition table by each search are tried first by the next one
+        if self.time_limit_in_seconds is not None:
+            self.search_deadline = time.perf_counter() + self.time_limit_in_seconds
+        if self.node_limit is not None:
+            self.search_node_budget = self.num_nodes_searched + self.node_limit
+        num_empty_slots = position.num_rows * position.num_cols - position.num_counters
+        max_depth_of_search = num_empty_slots
+        if self.bot_depth_of_search is not None:
+            max_depth_of_search = min(max_depth_of_search, self.bot_depth_of_search)
+        utility_and_action = None
+        utilities_of_depths = list()     # utility found by every finished iteration
+        try:
+            for depth_of_search in range(1, max_depth_of_search + 1):
+                start_time = time.perf_counter()
+                num_nodes_searched_before = self.num_nodes_searched
+                if self.aspiration_window is not None and len(utilities_of_depths) >= 2:
+                    # centred on the iteration before last, as the heuristic swings between odd and even depths (the side that moved last looks better)
+                    utility_and_action = self.search_aspiration_windows(position, is_minimiser, utilities_of_depths[-2], depth_of_search)
+                else:
+                    utility_and_action = self.search_position(position, is_minimiser, float("-inf"), float("inf"), current_depth=self.current_depth, max_depth=self.current_depth + depth_of_search)
+                utilities_of_depths.append(utility_and_action[0])
+                self.depth_of_last_completed_search = depth_of_search
+                if self.search_stats is not None:
+                    self.search_stats.depth_times.append((depth_of_search, time.perf_counter() - start_time, self.num_nodes_searched - num_nodes_searched_before))
+                if abs(utility_and_action[0]) >= self.decisive_utility:     # a forced win or loss has been found, searching deeper will not change it
+                    break
+                if self.num_nodes_at_next_budget_check == float("inf"):     # the first search always finishes, so that there is a move to return
+                    self.num_nodes_at_next_budget_check = self.num_nodes_searched
+        except SearchTimeout:
+            pass
+        self.search_deadline = None
+        self.search_node_budget = None
+        self.num_nodes_at_next_budget_check = float("inf")
+        return utility_and_action
+
+    def search_aspiration_windows(self, position, is_minimiser, previous_utility, depth_of_search):
+        # searches a window of aspiration_window either side of the utility expected from earlier iterations; a utility outside it is only a bound,
+        # so the search is repeated with the window opened on that side, until the utility falls inside
+        alpha = previous_utility - self.aspiration_window
+        beta = previous_utility + self.aspiration_window
+        while True:
+            utility, best_action = self.search_position(position, is_minimiser, alpha, beta, current_depth=self.current_depth, max_depth=self.current_depth + depth_of_search)
+            if utility <= alpha and alpha != float("-inf"):
+                alpha = float("-inf")
+            elif utility >= beta and beta != float("inf"):
+                beta = float("inf")
+            else:
+                return utility, best_action
+            if self.search_stats is not None:
+                self.search_stats.num_aspiration_re_searches += 1
+
+    def is_evaluation_symmetric(self, num_cols):     # whether evaluation_function scores every board the same as its mirror image
+        return all(self.find_col_weight(col, num_cols) == self.find_col_weight(num_cols - 1 - col, num_cols) for col in range(num_cols))
+
+    def find_table_key(self, position):     # (key of the position in the transposition table, whether it is the key of the mirror image)
+        if self.is_folding_mirror_positions and position.mirrored_zobrist_key < position.zobrist_key:
+            return position.mirrored_zobrist_key, True
+        return position.zobrist_key, False
+
+    def find_table_game(self, position):     # what the results in the transposition table depend on besides the position, recorded in saved tables
+        return position.num_rows, position.num_cols, self.num_to_connect, self.heuristic_version
+
+    def load_transposition_table(self, position):     # warm-starts the table from transposition_table_path the first time a game is searched
+        game = self.find_table_game(position)
+        if self.transposition_table.game == game:
+            return
+        if self.transposition_table.game is not None:     # a game of another size, whose results do not carry over
+            self.transposition_table.clear()
+        self.transposition_table.load(self.transposition_table_path, game)
+
+    def create_search_position(self, position):
+        if self.transposition_table_path is not None and self.is_transposition_table_owner:
+            self.load_transposition_table(position)
+        self.is_folding_mirror_positions = self.symmetry_folding and self.is_evaluation_symmetric(position.num_cols)
+        if self.incremental_evaluation:
+            weighted_lines, denominator = self.find_weighted_lines(position)
+            return IncrementallyEvaluatedPosition.from_position(position, weighted_lines, denominator)
+        return position
+
+    def find_parallel_root_search(self):
+        if self.parallel_root_search is None:
+            bot_options = {
+                "first_player": self.first_player,
+                "player_1_char": self.player_1_char,
+                "player_2_char": self.player_2_char,
+                "bot_depth_of_search": self.bot_depth_of_search,
+                "is_minimiser": self.is_minimiser,
+                "transposition_table_size_in_mb": self.transposition_table.size_in_mb,
+                "move_ordering": self.move_ordering,
+                "incremental_evaluation": self.incremental_evaluation,
+                "symmetry_folding": self.symmetry_folding,
+                "threat_analysis": self.threat_analysis,
+                "forced_move_extensions": self.forced_move_extensions,
+                "compact_search": self.compact_search,
+                "principal_variation_search": self.principal_variation_search,
+                "endgame_table_path": self.endgame_table_path,
+                "num_to_connect": self.num_to_connect,
+            }
+            if isinstance(self.transposition_table, SharedTranspositionTable):
+                bot_options["transposition_table"] = self.transposition_table
+            self.parallel_root_search = ParallelRootSearch(ConnectFourBot, bot_options, self.num_workers)
+        return self.parallel_root_search
+
+    def close(self):     # stops the worker processes of the parallel search, if any were started, and frees the transposition table if it is shared
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        if self.parallel_root_search is not None:
+            self.parallel_root_search.shutdown()
+            self.parallel_root_search = None
+        if self.is_transposition_table_owner:
+            if self.transposition_table_path is not None and self.transposition_table.game is not None:     # nothing to save if no game was searched
+                self.transposition_table.save(self.transposition_table_path)
+            self.transposition_table.close()
+        if self.opening_book is not None:
+            self.opening_book.close()
+            self.opening_book = None
+        if self.endgame_table is not None:
+            self.endgame_table.close()
+            self.endgame_table = None
+
+    def find_book_move(self, position):     # (utility, best action) from the opening book, if it has the position and searched it at least as deep as this bot would
+        if self.opening_book is None:
+            return None
+        if not self.is_time_controlled() and self.opening_book.depth_of_search < self.bot_depth_of_search:
+            return None
+        return self.opening_book.find_best_move(position, self.is_minimiser)
+
+    def start_pondering(self, board):     # board with the opponent to move; does nothing unless the bot was made with pondering
+        if self.ponderer is not None:
+            self.ponderer.start(board)
+
+    def find_principal_variation(self, position, is_minimiser, best_action, max_length):     # best_action, then the best actions stored in the transposition table after it
+        principal_variation = list()
+        action = best_action
+        while action != -1 and len(principal_variation) < max_length and position.heights[action] < position.num_rows and not position.find_winner():
+            position.make_move(action, is_minimiser)
+            principal_variation.append(action)
+            is_minimiser = not is_minimiser
+            table_key, is_mirrored = self.find_table_key(position)
+            table_entry = self.transposition_table.probe(table_key)
+            if table_entry is None or table_entry[1] == -1:
+                break
+            action = table_entry[1]
+            if is_mirrored:
+                action = position.num_cols - 1 - action
+        for action in principal_variation:
+            position.unmake_move()
+        return principal_variation
 
     def find_best_move(self, board):
+        if not self.is_collecting_search_stats:
+            return self.find_move(board)
+        search_stats = SearchStats()
+        transposition_table = self.transposition_table
+        num_nodes_searched_before = self.num_nodes_searched
+        num_hits_before = transposition_table.num_hits
+        num_probes_before = transposition_table.num_hits + transposition_table.num_misses
+        start_time = time.perf_counter()
+        if self.ponderer is not None:
+            self.ponderer.stop()     # so that the background search does not count towards these stats (find_move still gets its result)
+        self.search_stats = search_stats
+        try:
+            utility, best_action = self.find_move(board)
+        finally:
+            self.search_stats = None
+        search_stats.time_in_seconds = time.perf_counter() - start_time
+        search_stats.num_nodes = self.num_nodes_searched - num_nodes_searched_before
+        search_stats.num_table_hits = transposition_table.num_hits - num_hits_before
+        search_stats.num_table_probes = transposition_table.num_hits + transposition_table.num_misses - num_probes_before
+        search_stats.utility = utility
+        search_stats.best_action = best_action
+        position = BitboardPosition.from_board(board, self.player_1_char, self.player_2_char, self.num_to_connect)
+        if search_stats.source == "search":
+            if not search_stats.depth_times:     # a single search to the full depth
+                search_stats.depth_times.append((self.bot_depth_of_search, search_stats.time_in_seconds, search_stats.num_nodes))
+            search_stats.depth_of_search = min(search_stats.depth_times[-1][0], position.num_rows * position.num_cols - position.num_counters)
+        search_stats.principal_variation = self.find_principal_variation(position, self.is_minimiser, best_action, max(1, search_stats.depth_of_search))
+        self.last_search_stats = search_stats
+        if self.search_stats_hook is not None:
+            self.search_stats_hook(search_stats)
+        return utility, best_action
+
+    def find_move(self, board):
+        position = BitboardPosition.from_board(board, self.player_1_char, self.player_2_char, self.num_to_connect)
+        if self.ponderer is not None:
+            pondered_move = self.ponderer.stop(position)
+            if pondered_move is not None:     # searched while the opponent was thinking
+                if self.search_stats is not None:
+                    self.search_stats.source = "pondering"
+                return pondered_move
+        self.current_depth = position.num_counters + 1     # plies counted from the empty board, so a position has the same depth in every game and table entries stay valid between games
+        book_move = self.find_book_move(position)
+        if book_move is not None:
+            if self.search_stats is not None:
+                self.search_stats.source = "book"
+            return book_move
+        position = self.create_search_position(position)
+        self.killer_moves = dict()
+        self.history_scores = (dict(), dict())
+        transposition_table = self.transposition_table
+        transposition_table.new_search()
+        num_probes_before = transposition_table.num_hits + transposition_table.num_misses
+        num_reused_hits_before = transposition_table.num_reused_hits
+        best_move = self.search_best_move(position)
+        num_probes = transposition_table.num_hits + transposition_table.num_misses - num_probes_before
+        if num_probes:     # share of the probes of this move answered by entries from earlier moves (or games)
+            self.table_reuse_rates.append((transposition_table.num_reused_hits - num_reused_hits_before) / num_probes)
+        return best_move
+
+    def search_best_move(self, position):
+        if self.is_time_controlled():
+            return self.iterative_deepening(position, self.is_minimiser)
+        if self.num_workers > 1:
+            return self.find_parallel_root_search().search(self, position, self.is_minimiser, current_depth=self.current_depth, max_depth=self.current_depth + self.bot_depth_of_search)
         alpha = float("-inf")
         beta = float("inf")
         if self.is_minimiser:
-            min_utility, best_action = self.alpha_beta_pruning(board, True, alpha, beta, current_depth=self.current_depth, max_depth=self.current_depth + self.bot_depth_of_search)
-            self.current_depth += 2
+            min_utility, best_action = self.search_position(position, True, alpha, beta, current_depth=self.current_depth, max_depth=self.current_depth + self.bot_depth_of_search)
             return min_utility, best_action
-        max_utility, best_action = self.alpha_beta_pruning(board, False, alpha, beta, current_depth=self.current_depth, max_depth=self.current_depth + self.bot_depth_of_search)
-        self.current_depth += 2
+        max_utility, best_action = self.search_position(position, False, alpha, beta, current_depth=self.current_depth, max_depth=self.current_depth + self.bot_depth_of_search)
         return max_utility, best_action
 
+    def find_solver(self, position):
+        table_key = (position.num_rows, position.num_cols, position.num_to_connect)
+        if table_key not in self.solvers:
+            self.solvers[table_key] = ConnectFourSolver(position.num_rows, position.num_cols, self.transposition_table.size_in_mb, position.num_to_connect)
+        return self.solvers[table_key]
+
+    def solve(self, board, is_weak=False):
+        # perfect play instead of a depth-limited search: returns (utility, best action), where the utility is the solver's score from player 1's point of view,
+        # i.e. positive if player 1 wins with best play (the larger, the sooner), 0 for a draw. With is_weak, only the sign of the utility is exact
+        position = BitboardPosition.from_board(board, self.player_1_char, self.player_2_char, self.num_to_connect)
+        solver = self.find_solver(position)
+        num_nodes_searched_before = solver.num_nodes_searched
+        score, best_action = solver.solve_position(position, self.is_minimiser, is_weak)
+        self.num_nodes_searched += solver.num_nodes_searched - num_nodes_searched_before
+        if self.is_minimiser:
+            return -score, best_action
+        return score, best_action
+
 
 if __name__ == '__main__':
     print("Welcome to Connect Four :D")
@@ -611,19 +1437,64 @@ if __name__ == '__main__':
         start_first = "1"       # human is player 1
     else:
         start_first = "2"       # robot is player 2
-    depth_of_search_str = input("Set the depth of search of the robot (Enter a positive integer less than 10): ")
-    while True:
-        try:
-            depth_of_search = int(depth_of_search_str)
-        except ValueError:
-            print("Invalid input!")
-        else:
-            if depth_of_search >= 10 or depth_of_search <= 0:
-                print("Depth of search outside of accepted range!")
+    opening_book_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")     # made by opening_book.py
+    if not os.path.exists(opening_book_path):
+        opening_book_path = None
+    endgame_table_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "endgame_table.bin")     # made by endgame_table.py
+    if not os.path.exists(endgame_table_path):
+        endgame_table_path = None
+    transposition_table_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transposition_table.bin")    # results kept from earlier games
+    is_keeping_table_str = input("Would you like the robot to remember its searches between games (saved to transposition_table.bin)? Y/N: ").lower()
+    while is_keeping_table_str not in ["y", "n"]:
+        print("Invalid input!")
+        is_keeping_table_str = input("Would you like the robot to remember its searches between games (saved to transposition_table.bin)? Y/N: ").lower()
+    if is_keeping_table_str == "n":
+        transposition_table_path = None
+    is_pondering_str = input("Would you like the robot to think about its replies while you think about your move (uses another CPU core)? Y/N: ").lower()
+    while is_pondering_str not in ["y", "n"]:
+        print("Invalid input!")
+        is_pondering_str = input("Would you like the robot to think about its replies while you think about your move (uses another CPU core)? Y/N: ").lower()
+    is_pondering = is_pondering_str == "y"
+    is_time_controlled_str = input("Would you like to give the robot a time limit per move instead of a fixed depth of search? Y/N: ").lower()
+    while is_time_controlled_str not in ["y", "n"]:
+        print("Invalid input!")
+        is_time_controlled_str = input("Would you like to give the robot a time limit per move instead of a fixed depth of search? Y/N: ").lower()
+    if is_time_controlled_str == "y":
+        time_limit_str = input("Set the time limit of the robot in seconds (Enter a positive number): ")
+        while True:
+            try:
+                time_limit = float(time_limit_str)
+            except ValueError:
+                print("Invalid input!")
             else:
-                break
+                if time_limit <= 0:
+                    print("Time limit outside of accepted range!")
+                else:
+                    break
+            time_limit_str = input("Set the time limit of the robot in seconds (Enter a positive number): ")
+        print()
+        game = ConnectFour(first_player=start_first, bot_depth_of_search=None, bot_time_limit_in_seconds=time_limit, bot_opening_book_path=opening_book_path,
+                           bot_transposition_table_path=transposition_table_path, bot_pondering=is_pondering, bot_endgame_table_path=endgame_table_path)     # robot searches as deep as time allows
+    else:
         depth_of_search_str = input("Set the depth of search of the robot (Enter a positive integer less than 10): ")
-    print()
-    game = ConnectFour(first_player=start_first, bot_depth_of_search=depth_of_search)
+        while True:
+            try:
+                depth_of_search = int(depth_of_search_str)
+            except ValueError:
+                print("Invalid input!")
+            else:
+                if depth_of_search >= 10 or depth_of_search <= 0:
+                    print("Depth of search outside of accepted range!")
+                else:
+                    break
+            depth_of_search_str = input("Set the depth of search of the robot (Enter a positive integer less than 10): ")
+        print()
+        game = ConnectFour(first_player=start_first, bot_depth_of_search=depth_of_search, bot_opening_book_path=opening_book_path,
+                           bot_transposition_table_path=transposition_table_path, bot_pondering=is_pondering, bot_endgame_table_path=endgame_table_path)
     game.play()
+    record_path = input("Enter a file name to save the record of this game to, or press Enter to skip: ").strip()
+    if record_path:
+        with open(record_path, "a") as record_file:     # one game per line, so records of several games can be kept in one file
+            record_file.write(format_game_record(game) + "\n")
+        print(f"Game record {format_game_record(game)} saved to {record_path}")
     end = input("Enter any key to quit: ")
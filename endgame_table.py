@@ -0,0 +1,196 @@
+import argparse
+import mmap
+import random
+import struct
+import time
+
+from bitboard import BitboardPosition
+from opening_book import find_book_key
+
+
+class EndgameTable(object):
+    # Sorted binary file of (book key, score, best action) for positions with up to max_empty_slots empty slots, made by generate_endgame_table.
+    # Scores are exact, in the form of ConnectFourSolver (for the player to move: 0 for a draw, the larger the sooner the win, negative for a loss),
+    # so they give both the outcome and how many counters are still to be played until it. Positions are keyed like the opening book,
+    # whichever colour the player to move has and with mirror images sharing an entry. The file is memory-mapped and binary searched on every lookup
+    header_struct = struct.Struct("<4sBBBBI")     # magic, num_rows, num_cols, num_to_connect, max number of empty slots of a table position, num_entries
+    record_struct = struct.Struct("<QbB")     # book key, score, best action (in the orientation of the book key)
+    key_struct = struct.Struct("<Q")
+    magic = b"C4EG"
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.table = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.num_rows, self.num_cols, self.num_to_connect, self.max_empty_slots, self.num_entries = self.header_struct.unpack_from(self.table, 0)
+        if magic != self.magic:
+            raise Exception(f"{path} is not an endgame table")
+        if len(self.table) != self.header_struct.size + self.num_entries * self.record_struct.size:
+            raise Exception(f"Endgame table {path} is truncated or corrupted")
+        self.num_slots = self.num_rows * self.num_cols
+
+    def find_entry(self, table_key):     # returns (score, best action) of the key, or None if it is not in the table
+        table = self.table
+        key_struct = self.key_struct
+        header_size = self.header_struct.size
+        record_size = self.record_struct.size
+        low = 0
+        high = self.num_entries
+        while low < high:
+            middle = (low + high) >> 1
+            middle_key = key_struct.unpack_from(table, header_size + middle * record_size)[0]
+            if middle_key < table_key:
+                low = middle + 1
+            elif middle_key > table_key:
+                high = middle
+            else:
+                table_key, score, best_action = self.record_struct.unpack_from(table, header_size + middle * record_size)
+                return score, best_action
+        return None
+
+    def find_result(self, position, is_minimiser):
+        # returns (outcome, counters still to be played until it, best action) with best play from a position that is not over, where outcome is
+        # "1" or "2" for the player who wins, or "draw" (with every empty slot still to be filled); None if the position is not in the table
+        if position.num_rows != self.num_rows or position.num_cols != self.num_cols or position.num_to_connect != self.num_to_connect:
+            return None
+        num_empty_slots = self.num_slots - position.num_counters
+        if num_empty_slots > self.max_empty_slots:
+            return None
+        table_key, is_mirrored = find_book_key(position, is_minimiser)
+        entry = self.find_entry(table_key)
+        if entry is None:
+            return None
+        score, best_action = entry
+        if is_mirrored:
+            best_action = position.num_cols - 1 - best_action
+        if score == 0:
+            return "draw", num_empty_slots, best_action
+        own_outcome, opponent_outcome = ("2", "1") if is_minimiser else ("1", "2")
+        if score > 0:     # the player to move wins with their own n-th counter from now, as in ConnectFourSolver.find_plies_to_end
+            return own_outcome, 2 * ((self.num_slots + 3 - position.num_counters) // 2 - score) - 1, best_action
+        return opponent_outcome, 2 * ((self.num_slots + 2 - position.num_counters) // 2 + score), best_action
+
+    def close(self):
+        self.table.close()
+        self.file.close()
+
+
+def solve_endgame_position(position, is_minimiser, records, centre_out_actions):
+    # exact score for the player to move (as given by ConnectFourSolver) of a position that is not over, found by playing every move to the end
+    # of the game; the score and best action of the position and of every position below it go into records (book key -> (score, best action))
+    table_key, is_mirrored = find_book_key(position, is_minimiser)
+    if table_key in records:
+        return records[table_key][0]
+    num_slots = position.num_rows * position.num_cols
+    best_score = None
+    best_action = -1
+    for action in centre_out_actions:     # ties go to the column nearest the middle, as in ConnectFourSolver.find_best_move
+        if not position.can_play(action):
+            continue
+        position.make_move(action, is_minimiser)
+        outcome = position.find_winner_after_move()
+        if outcome == "draw":
+            score = 0
+        elif outcome:
+            score = (num_slots + 2 - position.num_counters) // 2     # the winning counter is the player's own (num_slots + 1 - counters before it) // 2-th from the end
+        else:
+            score = -solve_endgame_position(position, not is_minimiser, records, centre_out_actions)
+        position.unmake_move()
+        if best_score is None or score > best_score:
+            best_score = score
+            best_action = action
+    records[table_key] = (best_score, position.num_cols - 1 - best_action if is_mirrored else best_action)
+    return best_score
+
+
+def find_all_positions(num_counters, num_rows, num_cols, num_to_connect):
+    # every position with num_counters counters that can be reached without either player winning (one of each mirror pair), as (position, is_minimiser);
+    # only practical on small boards, since there are billions of them late in a game on the standard one
+    positions = {find_book_key(BitboardPosition(num_rows, num_cols, num_to_connect), False)[0]: (0, 0)}    # book key -> (bitboard of the player to move, bitboard of the other player)
+    for num_counters_so_far in range(num_counters):
+        next_positions = dict()
+        for own_bitboard, opponent_bitboard in positions.values():
+            position = BitboardPosition.from_bitboards(num_rows, num_cols, own_bitboard, opponent_bitboard, num_to_connect)
+            for action in position.find_available_actions():
+                position.make_move(action, is_minimiser=False)
+                if not position.has_connected_line(position.player_1_bitboard):
+                    next_position = BitboardPosition.from_bitboards(num_rows, num_cols, position.player_2_bitboard, position.player_1_bitboard, num_to_connect)     # the other player is to move
+                    next_positions[find_book_key(next_position, False)[0]] = (next_position.player_1_bitboard, next_position.player_2_bitboard)
+                position.unmake_move()
+        positions = next_positions
+    for own_bitboard, opponent_bitboard in positions.values():
+        yield BitboardPosition.from_bitboards(num_rows, num_cols, own_bitboard, opponent_bitboard, num_to_connect), False
+
+
+def play_source_games(num_counters, num_games, depth_of_search, random_move_rate, seed, num_rows, num_cols, num_to_connect):
+    # positions with num_counters counters reached in games between bots searching depth_of_search moves ahead, which play a random move instead
+    # with probability random_move_rate (so that the games spread over many endgames), as (position, is_minimiser); games that end earlier give none
+    from connect_four import ConnectFourBot     # imported here, as connect_four imports this module
+    random_generator = random.Random(seed)
+    bots = [ConnectFourBot("1", "H", "R", depth_of_search, is_minimiser=is_minimiser, transposition_table_size_in_mb=4, num_to_connect=num_to_connect) for is_minimiser in [False, True]]
+    for game_index in range(num_games):
+        position = BitboardPosition(num_rows, num_cols, num_to_connect)
+        is_minimiser = False
+        while position.num_counters < num_counters and not position.find_winner():
+            if random_generator.random() < random_move_rate:
+                action = random_generator.choice(position.find_available_actions())
+            else:
+                utility, action = bots[is_minimiser].find_best_move(position.to_board("H", "R"))
+            position.make_move(action, is_minimiser)
+            is_minimiser = not is_minimiser
+        if position.num_counters == num_counters and not position.find_winner():
+            yield position, is_minimiser
+    for bot in bots:
+        bot.close()
+
+
+GENERATION_MODES = ["sampled", "exhaustive"]
+
+
+def generate_endgame_table(path, max_empty_slots, num_games=1000, depth_of_search=2, random_move_rate=0.2, seed=0, mode="sampled", num_rows=6, num_cols=7, num_to_connect=4):
+    # solves every position with up to max_empty_slots empty slots below the positions with exactly max_empty_slots of them, and writes them to path.
+    # In "exhaustive" mode those positions are every reachable one (small boards only), so the table is complete. In "sampled" mode they are the
+    # endgames of num_games games (see play_source_games), so the table only covers part of the endgames, which part depending on the seed;
+    # positions missing from it are searched as usual
+    if mode not in GENERATION_MODES:
+        raise Exception(f"Unknown mode {mode!r}, expected one of {', '.join(GENERATION_MODES)}")
+    if (num_rows + 1) * num_cols > 64:
+        raise Exception("Endgame tables are keyed by 64-bit keys, so boards can have at most 64 slots including a sentinel row")
+    start_time = time.perf_counter()
+    num_counters = num_rows * num_cols - max_empty_slots
+    if mode == "exhaustive":
+        source_positions = find_all_positions(num_counters, num_rows, num_cols, num_to_connect)
+    else:
+        source_positions = play_source_games(num_counters, num_games, depth_of_search, random_move_rate, seed, num_rows, num_cols, num_to_connect)
+    centre_out_actions = sorted(range(num_cols), key=lambda col: abs(2 * col - (num_cols - 1)))
+    records = dict()
+    num_source_positions = 0
+    for position, is_minimiser in source_positions:
+        solve_endgame_position(position, is_minimiser, records, centre_out_actions)
+        num_source_positions += 1
+    print(f"{len(records)} positions below {num_source_positions} {mode} positions with {max_empty_slots} empty slots solved in {time.perf_counter() - start_time:.1f}s")
+    with open(path, "wb") as table_file:
+        table_file.write(EndgameTable.header_struct.pack(EndgameTable.magic, num_rows, num_cols, num_to_connect, max_empty_slots, len(records)))
+        for table_key in sorted(records):
+            score, best_action = records[table_key]
+            table_file.write(EndgameTable.record_struct.pack(table_key, score, best_action))
+    print(f"Wrote {len(records)} positions to {path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate the endgame table of the Connect Four bot: exact results of positions with few empty slots. "
+                                                 "By default (--mode sampled) only the endgames of sample games are solved, not every reachable one")
+    parser.add_argument("--empty-slots", type=int, default=8, help="solve positions with up to this many empty slots")
+    parser.add_argument("--mode", choices=GENERATION_MODES, default="sampled",
+                        help="sampled: solve only the endgames reached in --games games, a partial table whose coverage depends on --seed (the only practical mode on 6x7); "
+                             "exhaustive: solve every reachable endgame, a complete table (only practical on small boards)")
+    parser.add_argument("--games", type=int, default=1000, help="games played to find the endgames to solve (sampled mode)")
+    parser.add_argument("--depth", type=int, default=2, help="depth of search of the bots playing those games (sampled mode)")
+    parser.add_argument("--random-move-rate", type=float, default=0.2, help="chance of a random move instead of the bot's in those games (sampled mode)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of those games (sampled mode)")
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--cols", type=int, default=7)
+    parser.add_argument("--connect", type=int, default=4, help="counters in a row needed to win")
+    parser.add_argument("--output", default="endgame_table.bin")
+    args = parser.parse_args()
+    generate_endgame_table(args.output, args.empty_slots, args.games, args.depth, args.random_move_rate, args.seed, args.mode, args.rows, args.cols, args.connect)
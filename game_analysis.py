@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import BitboardPosition
+from connect_four import COLUMN_CHARS, ConnectFourBot, ConnectFourGameState, parse_game_record
+
+
+worker_bots = dict()    # (depth of search, transposition table size, is_minimiser, num_rows, num_cols, num_to_connect) -> bot of the worker process, kept between games so that its table stays warm
+
+
+def read_game_records(path):     # yields (line number, game record) for every game in the file, reading one line at a time; blank lines and lines starting with # are skipped
+    with open(path) as record_file:
+        for line_number, line in enumerate(record_file, start=1):
+            record_str = line.strip()
+            if record_str and not record_str.startswith("#"):
+                yield line_number, record_str
+
+
+def find_worker_bot(depth_of_search, transposition_table_size_in_mb, is_minimiser, state):
+    bot_key = (depth_of_search, transposition_table_size_in_mb, is_minimiser, state.num_rows, state.num_cols, state.num_to_connect)
+    if bot_key not in worker_bots:
+        worker_bots[bot_key] = ConnectFourBot("1", state.player_1_char, state.player_2_char, depth_of_search, is_minimiser=is_minimiser,
+                                              transposition_table_size_in_mb=transposition_table_size_in_mb, num_to_connect=state.num_to_connect)
+    return worker_bots[bot_key]
+
+
+def analyse_game(task):     # runs in a worker process; returns a result row for every position of the game, from the empty board to its last move
+    game_index, line_number, record_str, depth_of_search, transposition_table_size_in_mb = task
+    try:     # a record that cannot be parsed, or a game the bot cannot search, gives a single error row rather than stopping the whole run
+        return replay_game(game_index, line_number, parse_game_record(record_str), depth_of_search, transposition_table_size_in_mb)
+    except Exception as exception:
+        return [{"game_index": game_index, "line_number": line_number, "error": str(exception)}]
+
+
+def replay_game(game_index, line_number, final_state, depth_of_search, transposition_table_size_in_mb):
+    moves = final_state.moves
+    state = ConnectFourGameState(final_state.first_player, final_state.num_rows, final_state.num_cols, num_to_connect=final_state.num_to_connect)     # replayed move by move
+    rows = list()
+    for ply in range(len(moves) + 1):
+        row = {
+            "game_index": game_index,
+            "line_number": line_number,
+            "ply": ply,
+            "moves": "".join(COLUMN_CHARS[col] for col in moves[:ply]),
+            "to_move": state.current_player,
+            "played_move": COLUMN_CHARS[moves[ply]] if ply < len(moves) else None,
+        }
+        if state.is_over:
+            row.update({"winner": state.find_winner() or "draw", "evaluation": None, "utility": None, "best_move": None})
+        else:
+            bot = find_worker_bot(depth_of_search, transposition_table_size_in_mb, state.current_player == "2", state)
+            position = BitboardPosition.from_board(state.board, state.player_1_char, state.player_2_char, state.num_to_connect)
+            utility, best_action = bot.find_best_move(state.board)
+            row.update({"winner": None, "evaluation": bot.evaluate_position(position), "utility": utility, "best_move": COLUMN_CHARS[best_action]})
+        rows.append(row)
+        if ply < len(moves):
+            state.apply_move(moves[ply])
+    return rows
+
+
+def analyse_games(input_path, output_path, depth_of_search, num_workers, max_pending_games=None, transposition_table_size_in_mb=16):
+    # Scores every position of every game in the input file (see parse_game_record for the format) and writes one JSON line per position:
+    # evaluation is the static heuristic, utility and best_move come from find_best_move (positive = good for player 1, as in the bot).
+    # The file is read lazily and at most max_pending_games games are handed to the process pool at a time, with their rows written in
+    # input order as soon as they are done, so memory stays the same however large the file is
+    if max_pending_games is None:
+        max_pending_games = 4 * num_workers
+    num_games = 0
+    num_positions = 0
+    num_errors = 0
+    start_time = time.perf_counter()
+    pending_games = deque()     # futures of the games handed to the pool, oldest first
+
+    def write_oldest_game(output_file):
+        nonlocal num_games, num_positions, num_errors
+        for row in pending_games.popleft().result():
+            output_file.write(json.dumps(row) + "\n")
+            if "error" in row:
+                num_errors += 1
+            else:
+                num_positions += 1
+        num_games += 1
+        if num_games % 100 == 0:
+            output_file.flush()
+            print(f"{num_games} games analysed, {num_positions / (time.perf_counter() - start_time):.1f} positions/s")
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor, open(output_path, "w") as output_file:
+        for game_index, (line_number, record_str) in enumerate(read_game_records(input_path)):
+            pending_games.append(executor.submit(analyse_game, (game_index, line_number, record_str, depth_of_search, transposition_table_size_in_mb)))
+            if len(pending_games) >= max_pending_games:
+                write_oldest_game(output_file)
+        while pending_games:
+            write_oldest_game(output_file)
+    time_taken = time.perf_counter() - start_time
+    print(f"{num_games} games ({num_positions} positions, {num_errors} invalid records) with {num_workers} workers in {time_taken:.1f}s: "
+          f"{num_positions / time_taken:.1f} positions/s")
+    print(f"Results written to {output_path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Searches and evaluates every position of a file of game records across worker processes, writing one JSON line per position")
+    parser.add_argument("input", help="game records, one per line: moves as columns from 1 (e.g. 4453), optionally followed by the first player and rowsxcolsxN")
+    parser.add_argument("--output", default="analysis.jsonl")
+    parser.add_argument("--depth", type=int, default=6, help="depth of search of find_best_move")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-pending-games", type=int, default=None, help="games handed to the workers at a time (default: 4 per worker)")
+    parser.add_argument("--size-in-mb", type=float, default=16, help="size of the transposition table of every worker bot")
+    args = parser.parse_args()
+    analyse_games(args.input, args.output, args.depth, args.workers, args.max_pending_games, args.size_in_mb)
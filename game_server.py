@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from connect_four import ConnectFourBot, ConnectFourGameState
+
+
+# Protocol: one JSON object per line each way. Requests, with the fields of their responses:
+#   {"type": "new_game", "first_player": "1" or "2", "depth": 1 to the server's maximum depth, or null, "time_budget": seconds above 0}
+#       -> session_id, and the state of the game (after the robot's first move, if it goes first)
+#   {"type": "move", "session_id": ..., "col": 0 to num_cols - 1} -> the state of the game after your move and the robot's answer
+#   {"type": "state", "session_id": ...} -> the state of the game
+#   {"type": "close", "session_id": ...} -> session_id
+#   {"type": "stats"} -> numbers of sessions, moves served and moves waiting for the process pool
+# The state of a game is given by: moves (columns from 1, in order), board (rows from the top, "_" for empty slots), legal_moves,
+# is_over, winner ("1" = you, "2" = robot, null otherwise), time_left (of the robot's budget), robot_move, evaluation (positive = better for you)
+# and robot_time (seconds the robot's move took, waiting included).
+# When the process pool already has max_pending_moves robot moves waiting, a move is refused with {"error": ..., "busy": true}
+# without being played, so that the client can send it again later. Failed requests get {"error": ...}, and leave the game as it was
+
+
+worker_bots = dict()    # (depth of search, transposition table size) -> bot of the worker process, kept between moves (and sessions) so that its table stays warm;
+                        # depths are checked against the server's maximum, so a worker holds at most that many bots
+
+
+def find_robot_move(board, depth_of_search, time_limit_in_seconds, transposition_table_size_in_mb):     # runs in a worker process
+    bot_key = (depth_of_search, transposition_table_size_in_mb)
+    if bot_key not in worker_bots:
+        worker_bots[bot_key] = ConnectFourBot("1", "H", "R", depth_of_search, is_minimiser=True, transposition_table_size_in_mb=transposition_table_size_in_mb,
+                                              time_limit_in_seconds=time_limit_in_seconds)
+    bot = worker_bots[bot_key]
+    bot.time_limit_in_seconds = time_limit_in_seconds
+    return bot.find_best_move(board)
+
+
+class ServerBusy(Exception):     # the process pool has as many robot moves waiting as the server allows
+    pass
+
+
+class GameSession(object):     # a game against the robot, which has time_budget_in_seconds to spend over all of its moves
+    def __init__(self, session_id, first_player, depth_of_search, time_budget_in_seconds):
+        self.session_id = session_id
+        self.state = ConnectFourGameState(first_player)
+        self.depth_of_search = depth_of_search
+        self.time_budget_in_seconds = time_budget_in_seconds
+        self.time_used_in_seconds = 0
+        self.last_robot_move = None     # (col, evaluation, seconds taken)
+
+    def find_time_limit(self, min_time_limit_in_seconds, max_time_limit_in_seconds):     # share of the remaining budget for the robot's next move
+        num_empty_slots = self.state.num_rows * self.state.num_cols - self.state.num_counters_in_board
+        num_robot_moves_left = max(1, (num_empty_slots + 1) // 2)
+        time_limit = (self.time_budget_in_seconds - self.time_used_in_seconds) / num_robot_moves_left
+        return max(min_time_limit_in_seconds, min(max_time_limit_in_seconds, time_limit))
+
+    def to_dict(self):
+        state = self.state
+        result = {
+            "session_id": self.session_id,
+            "moves": "".join(str(col + 1) for col in state.moves),
+            "board": ["".join(slot or "_" for slot in row) for row in state.board],
+            "legal_moves": state.find_legal_moves(),
+            "is_over": state.is_over,
+            "winner": state.find_winner(),
+            "time_left": round(self.time_budget_in_seconds - self.time_used_in_seconds, 3),
+        }
+        if self.last_robot_move is not None:
+            result["robot_move"], result["evaluation"], result["robot_time"] = self.last_robot_move
+        return result
+
+
+class GameServer(object):
+    # Holds the game sessions of every connection in memory. Robot moves are searched in a bounded process pool, so the event loop
+    # only ever waits on them; each connection is served one request at a time, and is only read again once it has had its answer
+    def __init__(self, num_workers, max_pending_moves, default_depth_of_search=6, default_time_budget_in_seconds=60, min_time_limit_in_seconds=0.01,
+                 max_time_limit_in_seconds=2, transposition_table_size_in_mb=16, max_depth_of_search=12):
+        self.executor = ProcessPoolExecutor(max_workers=num_workers)
+        self.max_pending_moves = max_pending_moves
+        self.default_depth_of_search = default_depth_of_search
+        self.max_depth_of_search = max_depth_of_search     # deepest search a session can ask for (every depth asked for keeps a bot and its table in each worker)
+        self.default_time_budget_in_seconds = default_time_budget_in_seconds
+        self.min_time_limit_in_seconds = min_time_limit_in_seconds
+        self.max_time_limit_in_seconds = max_time_limit_in_seconds
+        self.transposition_table_size_in_mb = transposition_table_size_in_mb
+        self.sessions = dict()    # session id -> GameSession
+        self.session_ids = itertools.count(1)
+        self.num_pending_moves = 0
+        self.num_moves_served = 0
+        self.num_moves_refused = 0
+
+    async def play_robot_move(self, session):
+        time_limit = session.find_time_limit(self.min_time_limit_in_seconds, self.max_time_limit_in_seconds)
+        self.num_pending_moves += 1
+        start_time = time.perf_counter()
+        try:
+            utility, col = await asyncio.get_running_loop().run_in_executor(self.executor, find_robot_move, session.state.board, session.depth_of_search,
+                                                                             time_limit, self.transposition_table_size_in_mb)
+        finally:
+            self.num_pending_moves -= 1
+        time_taken = time.perf_counter() - start_time
+        session.time_used_in_seconds += time_taken
+        session.state.apply_move(col)
+        session.last_robot_move = (col, utility, round(time_taken, 4))
+        self.num_moves_served += 1
+
+    def check_capacity(self):
+        if self.num_pending_moves >= self.max_pending_moves:
+            self.num_moves_refused += 1
+            raise ServerBusy("Server is busy, try again later")
+
+    def find_depth_of_search(self, request):     # depth asked for by a new_game request: None (as deep as the time limit allows) or 1 to max_depth_of_search
+        depth_of_search = request.get("depth", self.default_depth_of_search)
+        if depth_of_search is None:
+            return None
+        if type(depth_of_search) is not int or not 1 <= depth_of_search <= self.max_depth_of_search:
+            raise Exception(f"depth must be null or a whole number from 1 to {self.max_depth_of_search}")
+        return depth_of_search
+
+    def find_time_budget(self, request):     # seconds the robot has for all of its moves, asked for by a new_game request: a finite number above 0
+        time_budget_in_seconds = request.get("time_budget", self.default_time_budget_in_seconds)
+        if type(time_budget_in_seconds) not in [int, float] or not math.isfinite(time_budget_in_seconds) or time_budget_in_seconds <= 0:
+            raise Exception("time_budget must be a finite number of seconds above 0")
+        return time_budget_in_seconds
+
+    def find_session(self, request, session_ids):
+        session_id = request.get("session_id")
+        if session_id not in session_ids:
+            raise Exception(f"No session {session_id} on this connection")
+        return self.sessions[session_id]
+
+    async def handle_request(self, request, session_ids):
+        request_type = request.get("type")
+        if request_type == "new_game":
+            first_player = request.get("first_player", "1")
+            if first_player not in ["1", "2"]:
+                raise Exception("first_player must be \"1\" (you) or \"2\" (robot)")
+            if first_player == "2":
+                self.check_capacity()
+            session = GameSession(next(self.session_ids), first_player, self.find_depth_of_search(request), self.find_time_budget(request))
+            if first_player == "2":
+                await self.play_robot_move(session)
+            self.sessions[session.session_id] = session     # only once the robot has made its first move, so that a failed one leaves no session behind
+            session_ids.add(session.session_id)
+            return session.to_dict()
+        if request_type == "move":
+            session = self.find_session(request, session_ids)
+            col = request.get("col")
+            if col not in session.state.find_legal_moves():
+                raise Exception(f"Column {col} is not a legal move")
+            self.check_capacity()     # before your move is played, so that a refused move can be sent again as it is
+            previous_state = session.state.clone()
+            previous_robot_move = session.last_robot_move
+            session.state.apply_move(col)
+            session.last_robot_move = None
+            if not session.state.is_over:
+                try:
+                    await self.play_robot_move(session)
+                except BaseException:     # the robot could not answer, so your move is taken back rather than leaving the robot to move
+                    session.state = previous_state
+                    session.last_robot_move = previous_robot_move
+                    raise
+            return session.to_dict()
+        if request_type == "state":
+            return self.find_session(request, session_ids).to_dict()
+        if request_type == "close":
+            session = self.find_session(request, session_ids)
+            session_ids.remove(session.session_id)
+            del self.sessions[session.session_id]
+            return {"session_id": session.session_id}
+        if request_type == "stats":
+            return {"num_sessions": len(self.sessions), "num_pending_moves": self.num_pending_moves, "max_pending_moves": self.max_pending_moves,
+                    "num_moves_served": self.num_moves_served, "num_moves_refused": self.num_moves_refused}
+        raise Exception(f"Unknown request type {request_type!r}")
+
+    async def handle_connection(self, reader, writer):
+        session_ids = set()     # sessions opened by this connection, which end with it
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.handle_request(json.loads(line), session_ids)
+                except ServerBusy as exception:
+                    response = {"error": str(exception), "busy": True}
+                except Exception as exception:
+                    response = {"error": str(exception)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session_id in session_ids:
+                del self.sessions[session_id]
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving Connect Four on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Connect Four server: newline-delimited JSON over TCP, for many games against the robot at once")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes searching robot moves")
+    parser.add_argument("--max-pending-moves", type=int, default=None, help="robot moves allowed to wait for the process pool before moves are refused (default: 4 per worker)")
+    parser.add_argument("--depth", type=int, default=6, help="default depth of search of the robot (a session can ask for another)")
+    parser.add_argument("--max-depth", type=int, default=12, help="deepest search a session can ask for")
+    parser.add_argument("--time-budget", type=float, default=60, help="default seconds the robot has for all of its moves in a session")
+    parser.add_argument("--max-move-time", type=float, default=2, help="seconds the robot may spend on one move, whatever its budget")
+    parser.add_argument("--size-in-mb", type=float, default=16, help="size of the transposition table of every worker bot")
+    args = parser.parse_args()
+    max_pending_moves = args.max_pending_moves
+    if max_pending_moves is None:
+        max_pending_moves = 4 * args.workers
+    game_server = GameServer(args.workers, max_pending_moves, args.depth, args.time_budget, max_time_limit_in_seconds=args.max_move_time, transposition_table_size_in_mb=args.size_in_mb,
+                             max_depth_of_search=args.max_depth)
+    try:
+        asyncio.run(game_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        game_server.close()
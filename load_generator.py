@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+async def send_request(reader, writer, request):
+    writer.write(json.dumps(request).encode() + b"\n")
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise Exception("Server closed the connection")
+    return json.loads(line)
+
+
+async def play_sessions(host, port, deadline, random_generator, depth_of_search, time_budget_in_seconds, results):
+    # one simulated player: plays random moves in game after game on its own connection until the deadline, retrying refused moves.
+    # Any other error reply is counted as a failed request (with its message kept for the summary): a failed new game is asked for again,
+    # and a game whose move failed is closed and replaced by a new one
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            response = await send_request(reader, writer, {"type": "new_game", "first_player": random_generator.choice(["1", "2"]), "depth": depth_of_search,
+                                                           "time_budget": time_budget_in_seconds})
+            if response.get("busy"):
+                results["num_refused"] += 1
+                await asyncio.sleep(0.05)
+                continue
+            if "error" in response:
+                record_failed_request(results, response)
+                await asyncio.sleep(0.05)
+                continue
+            session_id = response["session_id"]
+            while not response["is_over"]:
+                request = {"type": "move", "session_id": session_id, "col": random_generator.choice(response["legal_moves"])}
+                start_time = time.perf_counter()
+                move_response = await send_request(reader, writer, request)
+                while move_response.get("busy"):
+                    results["num_refused"] += 1
+                    await asyncio.sleep(0.05)
+                    move_response = await send_request(reader, writer, request)
+                if "error" in move_response:
+                    record_failed_request(results, move_response)
+                    break
+                results["move_latencies"].append(time.perf_counter() - start_time)     # includes any waiting after refusals
+                response = move_response
+            await send_request(reader, writer, {"type": "close", "session_id": session_id})
+            if response["is_over"]:
+                results["num_sessions"] += 1
+    finally:
+        writer.close()
+
+
+def record_failed_request(results, response):
+    results["num_failed"] += 1
+    results["errors"][response["error"]] = results["errors"].get(response["error"], 0) + 1
+
+
+def find_percentile(sorted_values, percentile):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percentile / 100))]
+
+
+async def generate_load(host, port, num_clients, duration_in_seconds, depth_of_search, time_budget_in_seconds, seed):
+    random_generator = random.Random(seed)
+    results = {"move_latencies": list(), "num_sessions": 0, "num_refused": 0, "num_failed": 0, "errors": dict()}     # errors: message -> number of failed requests
+    start_time = time.perf_counter()
+    deadline = start_time + duration_in_seconds
+    await asyncio.gather(*[play_sessions(host, port, deadline, random.Random(random_generator.random()), depth_of_search, time_budget_in_seconds, results) for client in range(num_clients)])
+    time_taken = time.perf_counter() - start_time
+    move_latencies = sorted(results["move_latencies"])
+    print(f"{num_clients} clients for {time_taken:.1f}s: {results['num_sessions']} sessions finished ({results['num_sessions'] / time_taken:.2f} sessions/s), "
+          f"{len(move_latencies)} moves, {results['num_refused']} refused as busy, {results['num_failed']} failed")
+    for error, num_failed in results["errors"].items():
+        print(f"{num_failed} requests failed with: {error}")
+    if move_latencies:
+        print(f"Move latency: p50 {find_percentile(move_latencies, 50) * 1000:.1f}ms, p99 {find_percentile(move_latencies, 99) * 1000:.1f}ms, max {move_latencies[-1] * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plays many random games at once against game_server.py and reports move latency and sessions per second")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=32, help="connections playing at the same time")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep starting new games for")
+    parser.add_argument("--depth", type=int, default=4, help="depth of search asked of the robot")
+    parser.add_argument("--time-budget", type=float, default=10, help="seconds the robot has for all of its moves in a session")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(generate_load(args.host, args.port, args.clients, args.duration, args.depth, args.time_budget, args.seed))
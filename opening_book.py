@@ -0,0 +1,128 @@
+import argparse
+import mmap
+import struct
+import time
+
+from bitboard import BitboardPosition
+
+
+def find_book_key(position, is_minimiser):
+    # key of the position from the point of view of the player to move, so that it does not matter which colour that player has;
+    # a position and its mirror image share the smaller of their two keys. Returns (key, whether the position had to be mirrored)
+    if is_minimiser:
+        own_bitboard = position.player_2_bitboard
+    else:
+        own_bitboard = position.player_1_bitboard
+    compact_key = position.find_compact_key(own_bitboard)
+    mirrored_compact_key = position.find_mirrored_bitboard(compact_key)     # each column of a compact key stays within its own bits, so it mirrors like a bitboard
+    if mirrored_compact_key < compact_key:
+        return mirrored_compact_key, True
+    return compact_key, False
+
+
+class OpeningBook(object):
+    # Sorted binary file of (book key, score, best action) for every position up to a number of counters, made by generate_opening_book.
+    # The file is memory-mapped and binary searched on every lookup, so it is never read into memory as a whole.
+    # Scores are for the player to move (positive = good for them)
+    header_struct = struct.Struct("<4sBBBBI")     # magic, num_rows, num_cols, max number of counters in a book position, depth of search, num_entries
+    record_struct = struct.Struct("<QdB")     # book key, score, best action (in the orientation of the book key)
+    key_struct = struct.Struct("<Q")
+    magic = b"C4OB"
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.book = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.num_rows, self.num_cols, self.num_plies, self.depth_of_search, self.num_entries = self.header_struct.unpack_from(self.book, 0)
+        if magic != self.magic:
+            raise Exception(f"{path} is not an opening book")
+        if len(self.book) != self.header_struct.size + self.num_entries * self.record_struct.size:
+            raise Exception(f"Opening book {path} is truncated or corrupted")
+
+    def find_entry(self, book_key):     # returns (score, best action) of the book key, or None if it is not in the book
+        book = self.book
+        key_struct = self.key_struct
+        header_size = self.header_struct.size
+        record_size = self.record_struct.size
+        low = 0
+        high = self.num_entries
+        while low < high:
+            middle = (low + high) >> 1
+            middle_key = key_struct.unpack_from(book, header_size + middle * record_size)[0]
+            if middle_key < book_key:
+                low = middle + 1
+            elif middle_key > book_key:
+                high = middle
+            else:
+                book_key, score, best_action = self.record_struct.unpack_from(book, header_size + middle * record_size)
+                return score, best_action
+        return None
+
+    def find_best_move(self, position, is_minimiser):     # returns (utility, best action) like ConnectFourBot.find_best_move, or None if the position is not in the book
+        if position.num_rows != self.num_rows or position.num_cols != self.num_cols or position.num_to_connect != 4 or position.num_counters > self.num_plies:     # books are only made for four in a row
+            return None
+        book_key, is_mirrored = find_book_key(position, is_minimiser)
+        entry = self.find_entry(book_key)
+        if entry is None:
+            return None
+        score, best_action = entry
+        if is_mirrored:
+            best_action = position.num_cols - 1 - best_action
+        if is_minimiser:    # utilities are from player 1's point of view
+            score = -score
+        return score, best_action
+
+    def close(self):
+        self.book.close()
+        self.file.close()
+
+
+def generate_opening_book(path, num_plies, depth_of_search, num_rows=6, num_cols=7):
+    # searches every position with up to num_plies counters (one of each mirror pair) and writes the results to path;
+    # every position is searched with its player to move as player 1, so one entry serves both colours
+    from connect_four import ConnectFourBot     # imported here, as connect_four imports this module
+    bot = ConnectFourBot("1", "H", "R", depth_of_search, is_minimiser=False)
+    records = dict()
+    positions = {find_book_key(BitboardPosition(num_rows, num_cols), False)[0]: (0, 0)}    # book key -> (bitboard of the player to move, bitboard of the other player)
+    for num_counters in range(num_plies + 1):
+        start_time = time.perf_counter()
+        num_positions_searched = 0
+        next_positions = dict()
+        for book_key, (own_bitboard, opponent_bitboard) in positions.items():
+            position = BitboardPosition.from_bitboards(num_rows, num_cols, own_bitboard, opponent_bitboard)
+            if position.find_winner():
+                continue
+            score, best_action = bot.find_best_move(position.to_board(bot.player_1_char, bot.player_2_char))
+            if book_key != find_book_key(position, False)[0]:
+                raise Exception("Book key does not match the position it was made from")
+            records[book_key] = (score, best_action)
+            num_positions_searched += 1
+            if num_counters == num_plies:
+                continue
+            for action in position.find_available_actions():
+                position.make_move(action, is_minimiser=False)
+                next_position = BitboardPosition.from_bitboards(num_rows, num_cols, position.player_2_bitboard, position.player_1_bitboard)     # the other player is to move
+                next_book_key, is_mirrored = find_book_key(next_position, False)
+                if is_mirrored:
+                    next_positions[next_book_key] = (next_position.find_mirrored_bitboard(next_position.player_1_bitboard), next_position.find_mirrored_bitboard(next_position.player_2_bitboard))
+                else:
+                    next_positions[next_book_key] = (next_position.player_1_bitboard, next_position.player_2_bitboard)
+                position.unmake_move()
+        print(f"{num_positions_searched} positions with {num_counters} counters searched in {time.perf_counter() - start_time:.1f}s")
+        positions = next_positions
+    bot.close()
+    with open(path, "wb") as book_file:
+        book_file.write(OpeningBook.header_struct.pack(OpeningBook.magic, num_rows, num_cols, num_plies, depth_of_search, len(records)))
+        for book_key in sorted(records):
+            score, best_action = records[book_key]
+            book_file.write(OpeningBook.record_struct.pack(book_key, score, best_action))
+    print(f"Wrote {len(records)} positions to {path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate the opening book of the Connect Four bot")
+    parser.add_argument("--plies", type=int, default=4, help="book every position with up to this many counters")
+    parser.add_argument("--depth", type=int, default=10, help="depth of search used for every book position")
+    parser.add_argument("--output", default="opening_book.bin")
+    args = parser.parse_args()
+    generate_opening_book(args.output, args.plies, args.depth)
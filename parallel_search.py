@@ -0,0 +1,89 @@
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bitboard import BitboardPosition
+from transposition_table import EXACT
+
+
+worker_bot = None   # bot of each worker process, kept between tasks so that its transposition table stays warm
+shared_bound = None     # [best utility found so far at the root, index of the root action that gave it], shared by all processes
+
+
+def initialise_worker(bot_class, bot_options, bound):
+    global worker_bot, shared_bound
+    worker_bot = bot_class(**bot_options)
+    shared_bound = bound
+
+
+def search_root_action(num_rows, num_cols, player_1_bitboard, player_2_bitboard, is_minimiser, action, action_index, current_depth, max_depth, generation):
+    with shared_bound.get_lock():
+        best_utility, best_action_index = shared_bound[0], shared_bound[1]
+    # actions ordered before the current best only have to match it to be chosen (as in the serial search), so they are searched
+    # with a window just wide enough to tell whether they are equal to it; actions ordered after it have to beat it
+    if action_index < best_action_index:
+        if is_minimiser:
+            best_utility = math.nextafter(best_utility, float("inf"))
+        else:
+            best_utility = math.nextafter(best_utility, float("-inf"))
+    worker_bot.transposition_table.generation = generation     # entries stored by the worker belong to the same search as the parent's
+    position = worker_bot.create_search_position(BitboardPosition.from_bitboards(num_rows, num_cols, player_1_bitboard, player_2_bitboard, worker_bot.num_to_connect))
+    position.make_move(action, is_minimiser)
+    num_nodes_searched_before = worker_bot.num_nodes_searched
+    if is_minimiser:
+        utility, next_player_best_action = worker_bot.search_position(position, False, float("-inf"), best_utility, current_depth=current_depth + 1, max_depth=max_depth)
+    else:
+        utility, next_player_best_action = worker_bot.search_position(position, True, best_utility, float("inf"), current_depth=current_depth + 1, max_depth=max_depth)
+    return action_index, utility, worker_bot.num_nodes_searched - num_nodes_searched_before
+
+
+class ParallelRootSearch(object):
+    # Splits the actions at the root between worker processes, Young Brothers Wait style: the first action is searched here with the
+    # full window, then its brothers are handed out to the workers, each starting from the best utility found so far.
+    # Results are merged in the order the serial search would try the actions, so the chosen action is the same as the serial search's
+    def __init__(self, bot_class, bot_options, num_workers):
+        self.num_workers = num_workers
+        self.shared_bound = multiprocessing.Array("d", 2)
+        self.executor = ProcessPoolExecutor(max_workers=num_workers, initializer=initialise_worker, initargs=(bot_class, bot_options, self.shared_bound))
+
+    def share_bound(self, best_utility, best_action_index):
+        with self.shared_bound.get_lock():
+            self.shared_bound[0] = best_utility
+            self.shared_bound[1] = best_action_index
+
+    def search(self, bot, position, is_minimiser, current_depth, max_depth):
+        table_key, is_mirrored = bot.find_table_key(position)
+        table_entry = bot.transposition_table.probe(table_key)
+        if table_entry is not None and is_mirrored and table_entry[1] != -1:
+            table_entry = (table_entry[0], position.num_cols - 1 - table_entry[1], table_entry[2], table_entry[3])
+        ordered_actions = bot.find_ordered_actions(position, is_minimiser, table_entry, current_depth)
+        position.make_move(ordered_actions[0], is_minimiser)
+        best_utility, next_player_best_action = bot.search_position(position, not is_minimiser, float("-inf"), float("inf"), current_depth=current_depth + 1, max_depth=max_depth)
+        position.unmake_move()
+        best_action_index = 0
+        self.share_bound(best_utility, best_action_index)
+        futures = list()
+        for action_index in range(1, len(ordered_actions)):
+            futures.append(self.executor.submit(search_root_action, position.num_rows, position.num_cols, position.player_1_bitboard, position.player_2_bitboard,
+                                                is_minimiser, ordered_actions[action_index], action_index, current_depth, max_depth, bot.transposition_table.generation))
+        for future in as_completed(futures):
+            action_index, utility, num_nodes_searched = future.result()
+            bot.num_nodes_searched += num_nodes_searched
+            if is_minimiser:
+                is_better = utility < best_utility
+            else:
+                is_better = utility > best_utility
+            if is_better or (utility == best_utility and action_index < best_action_index):
+                best_utility = utility
+                best_action_index = action_index
+                self.share_bound(best_utility, best_action_index)
+        best_action = ordered_actions[best_action_index]
+        table_utility = bot.find_table_utility(best_utility, current_depth)
+        if is_mirrored:
+            bot.transposition_table.store(table_key, table_utility, position.num_cols - 1 - best_action, max_depth - current_depth, EXACT)
+        else:
+            bot.transposition_table.store(table_key, table_utility, best_action, max_depth - current_depth, EXACT)
+        return best_utility, ordered_actions[best_action_index]
+
+    def shutdown(self):
+        self.executor.shutdown()
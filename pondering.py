@@ -0,0 +1,96 @@
+import threading
+
+from bitboard import BitboardPosition
+from search_stats import SearchTimeout
+
+
+class Ponderer(object):
+    # Searches the bot's replies to each move the opponent could make, in a background thread while the opponent is thinking
+    # (e.g. while ConnectFour.play waits on input()). The opponent's moves are tried in the order the bot's own search expects them,
+    # so the likely ones are searched first. With a fixed depth of search, every reply is searched to that depth, and a finished one is
+    # played straight away once the opponent makes that move; in time-controlled mode, all replies are deepened together, one move at a time.
+    # Either way, the results fill the transposition table, so the search after the opponent's move starts from the work already done.
+    # Only one thread searches with the bot at a time: stop waits for the background search to give up before the bot searches again
+    def __init__(self, bot):
+        self.bot = bot
+        self.thread = None
+        self.stop_requested = threading.Event()
+        self.pondered_moves = dict()     # Zobrist key of a position after the opponent's move -> (depth of search, utility, best action) of the deepest finished search
+        self.num_nodes_pondered = 0
+        self.num_moves_answered = 0     # moves played straight from a pondered search
+
+    def is_stop_requested(self):
+        return self.stop_requested.is_set()
+
+    def find_depths_of_search(self, num_empty_slots):
+        bot = self.bot
+        if not bot.is_time_controlled():
+            return [min(bot.bot_depth_of_search, num_empty_slots)]
+        max_depth_of_search = num_empty_slots
+        if bot.bot_depth_of_search is not None:
+            max_depth_of_search = min(max_depth_of_search, bot.bot_depth_of_search)
+        return range(1, max_depth_of_search + 1)
+
+    def start(self, board):     # board with the opponent to move
+        self.stop()
+        bot = self.bot
+        position = BitboardPosition.from_board(board, bot.player_1_char, bot.player_2_char, bot.num_to_connect)
+        if position.find_winner():
+            return
+        self.pondered_moves = dict()
+        self.thread = threading.Thread(target=self.ponder, args=(bot.create_search_position(position),), daemon=True)
+        self.thread.start()
+
+    def ponder(self, position):
+        bot = self.bot
+        is_opponent_minimiser = not bot.is_minimiser
+        bot.current_depth = position.num_counters + 1
+        bot.killer_moves = dict()
+        bot.history_scores = (dict(), dict())
+        bot.transposition_table.new_search()
+        table_key, is_mirrored = bot.find_table_key(position)
+        table_entry = bot.transposition_table.probe(table_key)
+        if table_entry is not None and is_mirrored and table_entry[1] != -1:
+            table_entry = (table_entry[0], position.num_cols - 1 - table_entry[1], table_entry[2], table_entry[3])
+        opponent_actions = bot.find_ordered_actions(position, is_opponent_minimiser, table_entry, bot.current_depth)
+        num_nodes_searched_before = bot.num_nodes_searched
+        try:
+            for depth_of_search in self.find_depths_of_search(position.num_rows * position.num_cols - position.num_counters - 1):
+                for action in opponent_actions:
+                    position.make_move(action, is_opponent_minimiser)
+                    try:
+                        if position.find_winner() or bot.find_book_move(position) is not None:
+                            continue
+                        pondered_move = self.pondered_moves.get(position.zobrist_key)
+                        if pondered_move is not None and abs(pondered_move[1]) >= bot.decisive_utility:     # deeper searches will not change a forced win or loss
+                            continue
+                        bot.current_depth = position.num_counters + 1
+                        bot.num_nodes_at_next_budget_check = bot.num_nodes_searched     # checks for a stop request every so often during the search
+                        utility, best_action = bot.search_position(position, bot.is_minimiser, float("-inf"), float("inf"), current_depth=bot.current_depth, max_depth=bot.current_depth + depth_of_search)
+                        self.pondered_moves[position.zobrist_key] = (depth_of_search, utility, best_action)
+                    finally:
+                        position.unmake_move()
+        except SearchTimeout:
+            pass
+        finally:
+            bot.num_nodes_at_next_budget_check = float("inf")
+            self.num_nodes_pondered += bot.num_nodes_searched - num_nodes_searched_before
+
+    def stop(self, position=None):
+        # stops the background search, and returns the pondered (utility, best action) for position if its search finished deep enough to be played, or None
+        if self.thread is not None:
+            self.stop_requested.set()
+            self.thread.join()
+            self.stop_requested.clear()
+            self.thread = None
+        if position is None:
+            return None
+        pondered_move = self.pondered_moves.get(position.zobrist_key)
+        if pondered_move is None:
+            return None
+        depth_of_search, utility, best_action = pondered_move
+        if depth_of_search < self.find_depths_of_search(position.num_rows * position.num_cols - position.num_counters)[-1] and abs(utility) < self.bot.decisive_utility:
+            return None
+        self.bot.depth_of_last_completed_search = depth_of_search
+        self.num_moves_answered += 1
+        return utility, best_action
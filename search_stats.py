@@ -0,0 +1,73 @@
+from transposition_table import EXACT, LOWER_BOUND, UPPER_BOUND
+
+
+BOUND_NAMES = {EXACT: "exact", LOWER_BOUND: "lower_bound", UPPER_BOUND: "upper_bound"}
+
+
+class SearchTimeout(Exception):     # raised inside alpha_beta_pruning when the time or node budget of a search runs out
+    pass
+
+
+class SearchStats(object):
+    # What one call of ConnectFourBot.find_best_move did, for bots made with search_stats=True (or a search_stats_hook).
+    # The counters inside alpha_beta_pruning are only touched when the bot is collecting stats, and only on the branches they count,
+    # so a bot without stats runs the same code as before. Nodes searched by the worker processes of a parallel search are counted,
+    # but the rest of their work is not
+    def __init__(self):
+        self.num_nodes = 0
+        self.num_leaf_evaluations = 0     # positions scored by the heuristic at the maximum depth
+        self.num_terminal_positions = 0     # positions found to be won or drawn
+        self.num_threat_cutoffs = 0     # positions decided by the threat analysis without being expanded (bots made with threat_analysis=True)
+        self.num_forced_extensions = 0     # positions with a single reply, searched one move deeper
+        self.num_endgame_hits = 0     # positions given their exact result by the endgame table (bots made with an endgame_table_path)
+        self.num_re_searches = 0     # actions searched again with the full window after beating the null window (bots made with principal_variation_search=True)
+        self.num_aspiration_re_searches = 0     # iterations searched again after their utility fell outside the aspiration window
+        self.num_table_probes = 0
+        self.num_table_hits = 0
+        self.table_cutoffs = {bound_type: 0 for bound_type in BOUND_NAMES}     # bound type -> searches cut short by a table entry of that type
+        self.beta_cutoffs_by_move_index = list()     # index of the move (in search order) that caused the cutoff -> number of cutoffs
+        self.depth_times = list()     # (depth of search, seconds, nodes) of every completed search, one per depth when iterative deepening
+        self.principal_variation = list()     # actions expected from both players, starting with the best move
+        self.depth_of_search = 0
+        self.time_in_seconds = 0
+        self.utility = None
+        self.best_action = -1
+        self.source = "search"     # or "book" for a move from the opening book, "pondering" for one searched while the opponent was thinking
+
+    def record_table_cutoff(self, bound_type):
+        self.table_cutoffs[bound_type] += 1
+
+    def record_beta_cutoff(self, move_index):
+        beta_cutoffs_by_move_index = self.beta_cutoffs_by_move_index
+        while len(beta_cutoffs_by_move_index) <= move_index:
+            beta_cutoffs_by_move_index.append(0)
+        beta_cutoffs_by_move_index[move_index] += 1
+
+    def find_effective_branching_factor(self):     # nodes ** (1 / depth), as in the move ordering benchmark
+        if self.depth_of_search <= 0 or self.num_nodes <= 0:
+            return 0
+        return self.num_nodes ** (1 / self.depth_of_search)
+
+    def to_dict(self):     # plain data, ready for json.dumps or a metrics system
+        return {
+            "num_nodes": self.num_nodes,
+            "num_leaf_evaluations": self.num_leaf_evaluations,
+            "num_terminal_positions": self.num_terminal_positions,
+            "num_threat_cutoffs": self.num_threat_cutoffs,
+            "num_forced_extensions": self.num_forced_extensions,
+            "num_endgame_hits": self.num_endgame_hits,
+            "num_re_searches": self.num_re_searches,
+            "num_aspiration_re_searches": self.num_aspiration_re_searches,
+            "num_table_probes": self.num_table_probes,
+            "num_table_hits": self.num_table_hits,
+            "table_cutoffs": {BOUND_NAMES[bound_type]: num_cutoffs for bound_type, num_cutoffs in self.table_cutoffs.items()},
+            "beta_cutoffs_by_move_index": list(self.beta_cutoffs_by_move_index),
+            "effective_branching_factor": self.find_effective_branching_factor(),
+            "depth_times": [{"depth": depth, "time": time_in_seconds, "num_nodes": num_nodes} for depth, time_in_seconds, num_nodes in self.depth_times],
+            "principal_variation": list(self.principal_variation),
+            "depth_of_search": self.depth_of_search,
+            "time": self.time_in_seconds,
+            "utility": self.utility,
+            "best_action": self.best_action,
+            "source": self.source,
+        }
@@ -0,0 +1,141 @@
+import argparse
+import csv
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from connect_four import ConnectFourBot, ConnectFourGameState
+
+
+VARIANTS = {     # variant name -> options of ConnectFourBot that change how it plays (the evaluators are left out, as they all give the same scores)
+    "plain": {},
+    "threats": {"threat_analysis": True},
+    "extensions": {"threat_analysis": True, "forced_move_extensions": True},
+}
+RESULT_FIELDS = ["game_index", "player_1", "player_2", "player_1_variant", "player_2_variant", "first_player", "opening", "moves", "winner", "num_moves",
+                 "player_1_nodes", "player_2_nodes", "player_1_time", "player_2_time"]
+
+
+def parse_player(player_str):     # "depth" or "depth:variant", e.g. "6" or "6:threats"
+    depth_str, separator, variant = player_str.partition(":")
+    if not variant:
+        variant = "plain"
+    if variant not in VARIANTS:
+        raise Exception(f"Unknown variant {variant!r} in player {player_str!r}, expected one of {', '.join(VARIANTS)}")
+    depth_of_search = int(depth_str)
+    if depth_of_search < 1:
+        raise Exception(f"Depth of search of player {player_str!r} must be a positive integer")
+    return f"{depth_of_search}:{variant}"
+
+
+def create_bot(player, is_minimiser, first_player, transposition_table_size_in_mb):
+    depth_str, variant = player.split(":")
+    return ConnectFourBot(first_player, "1", "2", int(depth_str), is_minimiser=is_minimiser, transposition_table_size_in_mb=transposition_table_size_in_mb,
+                          **VARIANTS[variant])
+
+
+def play_self_play_game(task):     # runs in a worker process; plays one game from its opening to the end and returns its result row
+    game_index, player_1, player_2, first_player, opening, transposition_table_size_in_mb = task
+    state = ConnectFourGameState(first_player, player_1_char="1", player_2_char="2")
+    for col in opening:
+        state.apply_move(col)
+    bots = {"1": create_bot(player_1, False, first_player, transposition_table_size_in_mb), "2": create_bot(player_2, True, first_player, transposition_table_size_in_mb)}
+    time_taken = {"1": 0, "2": 0}
+    while not state.is_over:
+        player = state.current_player
+        start_time = time.perf_counter()
+        utility, col = bots[player].find_best_move(state.board)
+        time_taken[player] += time.perf_counter() - start_time
+        state.apply_move(col)
+    for bot in bots.values():
+        bot.close()
+    return {
+        "game_index": game_index,
+        "player_1": player_1,
+        "player_2": player_2,
+        "player_1_variant": player_1.split(":")[1],
+        "player_2_variant": player_2.split(":")[1],
+        "first_player": first_player,
+        "opening": "".join(str(col + 1) for col in opening),
+        "moves": "".join(str(col + 1) for col in state.moves),     # including the opening, columns from 1
+        "winner": state.find_winner() or "draw",
+        "num_moves": len(state.moves),
+        "player_1_nodes": bots["1"].num_nodes_searched,
+        "player_2_nodes": bots["2"].num_nodes_searched,
+        "player_1_time": round(time_taken["1"], 4),
+        "player_2_time": round(time_taken["2"], 4),
+    }
+
+
+def create_tasks(players, num_games, num_opening_plies, transposition_table_size_in_mb, seed):
+    # every pairing of players (a player against itself too), with each player first to move in turn; the bots are deterministic,
+    # so every game starts from its own random opening
+    random_generator = random.Random(seed)
+    pairings = [(player_1, player_2, first_player) for player_1 in players for player_2 in players for first_player in ["1", "2"]]
+    tasks = list()
+    for game_index in range(num_games):
+        player_1, player_2, first_player = pairings[game_index % len(pairings)]
+        state = ConnectFourGameState(first_player)
+        for ply in range(num_opening_plies):
+            state.apply_move(random_generator.choice(state.find_legal_moves()))
+        tasks.append((game_index, player_1, player_2, first_player, state.moves, transposition_table_size_in_mb))
+    return tasks
+
+
+class ResultWriter(object):     # writes result rows to a JSONL or CSV file (chosen by its extension) as they come in
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.csv_writer = None
+        if path.endswith(".csv"):
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=RESULT_FIELDS)
+            self.csv_writer.writeheader()
+
+    def write(self, result):
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(result)
+        else:
+            self.file.write(json.dumps(result) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run_self_play(players, num_games, num_workers, output_path, num_opening_plies=2, transposition_table_size_in_mb=4, seed=0):
+    tasks = create_tasks(players, num_games, num_opening_plies, transposition_table_size_in_mb, seed)
+    points = {player: [0, 0] for player in players}     # player -> [points (1 for a win, 0.5 for a draw), games played]
+    result_writer = ResultWriter(output_path)
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for num_games_played, result in enumerate(executor.map(play_self_play_game, tasks, chunksize=max(1, num_games // (num_workers * 16))), start=1):
+            result_writer.write(result)
+            for player_number in ["1", "2"]:
+                player_points = points[result[f"player_{player_number}"]]
+                player_points[1] += 1
+                if result["winner"] == player_number:
+                    player_points[0] += 1
+                elif result["winner"] == "draw":
+                    player_points[0] += 0.5
+            if num_games_played % 100 == 0:
+                print(f"{num_games_played} games played, {num_games_played / (time.perf_counter() - start_time):.2f} games/s")
+    time_taken = time.perf_counter() - start_time
+    result_writer.close()
+    print(f"{num_games} games with {num_workers} workers in {time_taken:.1f}s: {num_games / time_taken:.2f} games/s")
+    for player, (player_points, num_games_of_player) in points.items():
+        print(f"{player:<16} {player_points:>8} points from {num_games_of_player} games")
+    print(f"Results written to {output_path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plays bots against each other across worker processes and writes the result of every game to a JSONL or CSV file")
+    parser.add_argument("--players", nargs="+", default=["2", "4", "6"], help="bots as depth or depth:variant, with variant one of " + ", ".join(VARIANTS))
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--opening-plies", type=int, default=2, help="random moves played before the bots take over")
+    parser.add_argument("--size-in-mb", type=float, default=4, help="size of the transposition table of every bot")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="self_play.jsonl", help="results file; written as CSV if it ends in .csv")
+    args = parser.parse_args()
+    run_self_play([parse_player(player_str) for player_str in args.players], args.games, args.workers, args.output, args.opening_plies, args.size_in_mb, args.seed)
@@ -0,0 +1,150 @@
+from bitboard import BitboardPosition
+from transposition_table import LOWER_BOUND, UPPER_BOUND, TranspositionTable
+
+
+class ConnectFourSolver(object):
+    # Perfect-play solver. Positions are (bitboard of the player to move, mask of all counters), and scores are for the player to move:
+    #   0 for a draw, positive for a win: 1 if they win with their last possible counter, 2 with the one before it, and so on,
+    #   negative for a loss in the same way. So the larger the score, the sooner the win (see find_plies_to_end).
+    # Scores are found by negamax with a null window, binary searching over the range of possible scores (MTD(f) style);
+    # a strong solve finds the exact score, a weak solve only whether the position is a win, a draw or a loss.
+    # Moves that let the opponent win straight away are never searched, and the transposition table is keyed by compact keys
+    # (own counters + all counters + bottom row), which are the same whichever colour the player to move has
+    def __init__(self, num_rows=6, num_cols=7, transposition_table_size_in_mb=64, num_to_connect=4):
+        layout = BitboardPosition(num_rows, num_cols, num_to_connect)
+        self.layout = layout     # empty position of the same game, whose find_winning_slots is given the solver's own counters
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_to_connect = num_to_connect
+        self.num_slots = num_rows * num_cols
+        self.bottom_mask = layout.bottom_mask
+        self.board_mask = layout.board_mask
+        self.column_masks = [((1 << num_rows) - 1) << (col * layout.col_stride) for col in range(num_cols)]
+        self.centre_out_actions = sorted(range(num_cols), key=lambda col: abs(2 * col - (num_cols - 1)))
+        self.transposition_table = TranspositionTable(transposition_table_size_in_mb)
+        self.num_nodes_searched = 0
+
+    def can_win_next(self, own_bitboard, mask):
+        return bool(self.layout.find_winning_slots(own_bitboard, mask) & (mask + self.bottom_mask))
+
+    def negamax(self, own_bitboard, mask, num_counters, alpha, beta):
+        # score of the position if it lies strictly between alpha and beta; otherwise a bound on the same side of the window as the score.
+        # The player to move must not be able to win straight away
+        self.num_nodes_searched += 1
+        num_slots = self.num_slots
+        playable_slots = (mask + self.bottom_mask) & self.board_mask
+        opponent_bitboard = own_bitboard ^ mask
+        opponent_winning_slots = self.layout.find_winning_slots(opponent_bitboard, mask)
+        forced_slots = playable_slots & opponent_winning_slots
+        if forced_slots:
+            if forced_slots & (forced_slots - 1):     # the opponent has two ways to win, only one of which can be blocked
+                return -((num_slots - num_counters) // 2)
+            playable_slots = forced_slots
+        non_losing_slots = playable_slots & ~(opponent_winning_slots >> 1)     # never fill the slot under one the opponent would win on
+        if not non_losing_slots:
+            return -((num_slots - num_counters) // 2)
+        if num_counters >= num_slots - 2:     # neither player can win in the slots left
+            return 0
+        min_score = -((num_slots - 2 - num_counters) // 2)     # the opponent cannot win with their next counter
+        if alpha < min_score:
+            alpha = min_score
+            if alpha >= beta:
+                return alpha
+        max_score = (num_slots - 1 - num_counters) // 2     # the player to move cannot win with this counter
+        if beta > max_score:
+            beta = max_score
+            if alpha >= beta:
+                return beta
+        key = own_bitboard + mask + self.bottom_mask
+        table_entry = self.transposition_table.probe(key)
+        table_best_action = -1
+        if table_entry is not None:
+            stored_score, table_best_action, depth, bound_type = table_entry
+            if bound_type == UPPER_BOUND:
+                if beta > stored_score:
+                    beta = stored_score
+                    if alpha >= beta:
+                        return beta
+            elif alpha < stored_score:     # LOWER_BOUND
+                alpha = stored_score
+                if alpha >= beta:
+                    return alpha
+        # try the best action from the table first, then the moves that leave the most ways to win, middle columns first when tied
+        ordered_moves = list()
+        for col in self.centre_out_actions:
+            move = non_losing_slots & self.column_masks[col]
+            if move:
+                if col == table_best_action:
+                    num_threats = 1000
+                else:
+                    num_threats = self.layout.find_winning_slots(own_bitboard | move, mask | move).bit_count()
+                ordered_moves.append((-num_threats, len(ordered_moves), col, move))
+        ordered_moves.sort()
+        best_action = -1
+        for negative_num_threats, order, col, move in ordered_moves:
+            score = -self.negamax(opponent_bitboard, mask | move, num_counters + 1, -beta, -alpha)
+            if score >= beta:
+                self.transposition_table.store(key, score, col, 0, LOWER_BOUND)
+                return score
+            if score > alpha:
+                alpha = score
+                best_action = col
+        self.transposition_table.store(key, alpha, best_action, 0, UPPER_BOUND)
+        return alpha
+
+    def solve(self, own_bitboard, mask, num_counters, is_weak=False):
+        if self.can_win_next(own_bitboard, mask):
+            return (self.num_slots + 1 - num_counters) // 2
+        if is_weak:     # only the sign of the score is wanted
+            min_score = -1
+            max_score = 1
+        else:
+            min_score = -((self.num_slots - num_counters) // 2)
+            max_score = (self.num_slots + 1 - num_counters) // 2
+        while min_score < max_score:     # binary search with null windows, trying scores near 0 first, where most positions are
+            middle_score = min_score + (max_score - min_score) // 2
+            if middle_score <= 0 and -(-min_score // 2) < middle_score:
+                middle_score = -(-min_score // 2)
+            elif middle_score >= 0 and max_score // 2 > middle_score:
+                middle_score = max_score // 2
+            score = self.negamax(own_bitboard, mask, num_counters, middle_score, middle_score + 1)
+            if score <= middle_score:
+                max_score = score
+            else:
+                min_score = score
+        return min_score
+
+    def find_best_move(self, own_bitboard, mask, num_counters, is_weak=False):     # returns (score, best action) for the player to move
+        score = self.solve(own_bitboard, mask, num_counters, is_weak)
+        playable_slots = (mask + self.bottom_mask) & self.board_mask
+        winning_slots = self.layout.find_winning_slots(own_bitboard, mask) & playable_slots
+        opponent_winning_slots = self.layout.find_winning_slots(own_bitboard ^ mask, mask)
+        fallback_action = -1
+        for col in self.centre_out_actions:
+            move = playable_slots & self.column_masks[col]
+            if not move:
+                continue
+            if move & winning_slots:
+                return score, col
+            if fallback_action == -1:
+                fallback_action = col
+            if ((opponent_winning_slots & playable_slots) and not move & opponent_winning_slots) or move & (opponent_winning_slots >> 1):
+                continue    # lets the opponent win straight away
+            # the move is as good as the position if the opponent's score after it is at most -score
+            if -self.negamax(own_bitboard ^ mask, mask | move, num_counters + 1, -score, -score + 1) >= score:
+                return score, col
+        return score, fallback_action     # every move loses straight away
+
+    def find_plies_to_end(self, score, num_counters):     # number of counters still to be played until the winning one, or None for a draw
+        if score > 0:     # the player to move wins with their own n-th counter from now
+            return 2 * ((self.num_slots + 3 - num_counters) // 2 - score) - 1
+        if score < 0:     # the opponent wins with their n-th counter from now
+            return 2 * ((self.num_slots + 2 - num_counters) // 2 + score)
+        return None
+
+    def solve_position(self, position, is_minimiser, is_weak=False):     # (score for the player to move, best action) of a BitboardPosition
+        if is_minimiser:
+            own_bitboard = position.player_2_bitboard
+        else:
+            own_bitboard = position.player_1_bitboard
+        return self.find_best_move(own_bitboard, position.player_1_bitboard | position.player_2_bitboard, position.num_counters, is_weak)
@@ -0,0 +1,456 @@
+import mmap
+import os
+import struct
+from array import array
+from itertools import chain, compress
+from multiprocessing import shared_memory
+
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+class TranspositionTable(object):
+    # Fixed-capacity table of search results, indexed by the Zobrist key of a position.
+    # Every bucket holds 2 entries: a depth-preferred slot, which is only replaced by results searched at least as deep (or by any result,
+    # once its entry is left over from an earlier search), and an always-replace slot, which takes everything else (including entries
+    # pushed out of the depth-preferred slot).
+    # Entries are kept in 3 parallel arrays rather than as Python objects:
+    #   keys   - full 64-bit Zobrist key, to tell apart positions that land in the same bucket
+    #   scores - utility of the position
+    #   infos  - bit 0: slot is in use, bits 1-2: bound type, bits 3-8: best action + 1, bits 9-16: generation (the search that stored it),
+    #            bits 17 and up: depth (the number of moves that were searched below the position)
+    # Entries can be saved to a file and loaded again (see PersistedTranspositionTable), so that later games start warm
+    entry_size_in_bytes = 8 + 8 + 4
+    entries_per_bucket = 2
+    max_num_saved_entries = 1 << 20     # entries kept in a saved file (about 60 MB of it); the shallowest are dropped beyond this
+
+    def __init__(self, size_in_mb=64):
+        self.size_in_mb = size_in_mb
+        self.num_buckets = max(1, int(size_in_mb * 1024 * 1024) // (self.entry_size_in_bytes * self.entries_per_bucket))
+        self.num_entries = self.num_buckets * self.entries_per_bucket
+        self.persisted_table = None     # table loaded from a file, looked up when a position is not in this one
+        self.game = None     # (num_rows, num_cols, num_to_connect, heuristic version) the entries were searched for, set by load and written into saved files
+        self.generation = 0
+        self.probed_utility = 0     # utility of the entry found by the last successful probe_info
+        self.clear()
+
+    def clear(self):
+        self.keys = array("Q", bytes(8 * self.num_entries))
+        self.scores = array("d", bytes(8 * self.num_entries))
+        self.infos = array("I", bytes(4 * self.num_entries))
+        self.reset_statistics()
+
+    def reset_statistics(self):
+        self.num_persisted_hits = 0     # hits found in the loaded file rather than in memory
+        self.num_reused_hits = 0    # hits on entries stored by an earlier search (including those in the loaded file)
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_collisions = 0     # probes that missed although their bucket was holding other positions
+        self.num_overwrites = 0     # stores that pushed another position out of the table
+
+    def new_search(self):     # entries stored from now on belong to a new generation
+        self.generation = (self.generation + 1) & 255
+
+    def probe(self, key):     # returns (utility, best action, depth, bound type), or None if the position is not in the table
+        index = (key % self.num_buckets) << 1
+        keys = self.keys
+        infos = self.infos
+        if keys[index] == key and infos[index]:
+            slot = index
+        elif keys[index + 1] == key and infos[index + 1]:
+            slot = index + 1
+        else:
+            if self.persisted_table is not None:
+                return self.probe_persisted_table(key)
+            self.num_misses += 1
+            if infos[index] or infos[index + 1]:
+                self.num_collisions += 1
+            return None
+        self.num_hits += 1
+        info = infos[slot]
+        if (info >> 9) & 255 != self.generation:
+            self.num_reused_hits += 1
+        return self.scores[slot], ((info >> 3) & 63) - 1, info >> 17, (info >> 1) & 3
+
+    def probe_info(self, key):
+        # probe without building a tuple, for ConnectFourBot's compact search: returns the info of the entry (laid out as in infos),
+        # or 0 if the position is not in the table, and leaves its utility in probed_utility
+        index = (key % self.num_buckets) << 1
+        keys = self.keys
+        infos = self.infos
+        if keys[index] == key and infos[index]:
+            slot = index
+        elif keys[index + 1] == key and infos[index + 1]:
+            slot = index + 1
+        else:
+            if self.persisted_table is not None:
+                return self.probe_persisted_info(key)
+            self.num_misses += 1
+            if infos[index] or infos[index + 1]:
+                self.num_collisions += 1
+            return 0
+        self.num_hits += 1
+        info = infos[slot]
+        if (info >> 9) & 255 != self.generation:
+            self.num_reused_hits += 1
+        self.probed_utility = self.scores[slot]
+        return info
+
+    def probe_persisted_info(self, key):
+        table_entry = self.probe_persisted_table(key)
+        if table_entry is None:
+            return 0
+        utility, best_action, depth, bound_type = table_entry
+        self.probed_utility = utility
+        return (depth << 17) | ((best_action + 1) << 3) | (bound_type << 1) | 1
+
+    def probe_persisted_table(self, key):
+        table_entry = self.persisted_table.probe(key)
+        if table_entry is None:
+            self.num_misses += 1
+            return None
+        self.num_hits += 1
+        self.num_persisted_hits += 1
+        self.num_reused_hits += 1
+        self.store(key, *table_entry)     # copied into memory, where it can be found faster next time
+        return table_entry
+
+    def store(self, key, utility, best_action, depth, bound_type):
+        index = (key % self.num_buckets) << 1
+        infos = self.infos
+        keys = self.keys
+        info = (depth << 17) | (self.generation << 9) | ((best_action + 1) << 3) | (bound_type << 1) | 1
+        depth_preferred_info = infos[index]
+        if not depth_preferred_info or keys[index] == key or depth >= depth_preferred_info >> 17 or (depth_preferred_info >> 9) & 255 != self.generation:
+            if depth_preferred_info and keys[index] != key:     # previous occupant moves down to the always-replace slot
+                self.write_slot(index + 1, keys[index], self.scores[index], depth_preferred_info)
+            elif infos[index + 1] and keys[index + 1] == key:     # drop the older copy of this position
+                infos[index + 1] = 0
+            keys[index] = key
+            self.scores[index] = utility
+            infos[index] = info
+        else:
+            self.write_slot(index + 1, key, utility, info)
+
+    def write_slot(self, slot, key, utility, info):
+        if self.infos[slot] and self.keys[slot] != key:
+            self.num_overwrites += 1
+        self.keys[slot] = key
+        self.scores[slot] = utility
+        self.infos[slot] = info
+
+    def find_num_entries_in_use(self):
+        return self.num_entries - self.infos.count(0)
+
+    def find_entries_in_use(self):     # yields (key, utility, info) of every entry
+        keys = self.keys
+        scores = self.scores
+        infos = self.infos
+        for slot in compress(range(len(infos)), infos):     # skips the empty slots without a Python loop over them
+            yield keys[slot], scores[slot], infos[slot]
+
+    def load(self, path, game):
+        # warm start from a file written by save for the same game; entries are read from it lazily, when they are first probed.
+        # Returns False without loading anything if the file does not exist or was saved for another game (or an older format or heuristic)
+        if self.persisted_table is not None:
+            self.persisted_table.close()
+            self.persisted_table = None
+        self.game = game
+        if PersistedTranspositionTable.find_game(path) != game:
+            return False
+        self.persisted_table = PersistedTranspositionTable(path)
+        return True
+
+    def save(self, path, max_num_entries=None):
+        # merges the entries of this table (and of the loaded file, if it was another one) into the file at path, or writes a new one
+        # (over a file saved for another game, which cannot be merged). When both have the same position, the one searched deepest is kept,
+        # and when there are more than max_num_entries (default max_num_saved_entries) positions, the shallowest searches are dropped
+        if self.game is None:
+            raise Exception("The game of a transposition table must be given (by load) before it is saved")
+        if max_num_entries is None:
+            max_num_entries = self.max_num_saved_entries
+        new_entries = self.find_entries_in_use()
+        max_num_new_entries = self.find_num_entries_in_use()
+        if self.persisted_table is not None and os.path.abspath(path) != os.path.abspath(self.persisted_table.path):
+            new_entries = chain(self.persisted_table.find_entries_in_use(), new_entries)
+            max_num_new_entries += self.persisted_table.num_entries
+        saved_table = None
+        if PersistedTranspositionTable.find_game(path) == self.game:     # opened again rather than reusing the loaded file, in case another game has saved to it since
+            saved_table = PersistedTranspositionTable(path)
+        PersistedTranspositionTable.write(path, self.game, new_entries, max_num_new_entries, max_num_entries, saved_table)
+        if saved_table is not None:
+            saved_table.close()
+
+    def get_statistics(self):
+        return {
+            "size_in_mb": self.size_in_mb,
+            "num_entries": self.num_entries,
+            "num_entries_in_use": self.find_num_entries_in_use(),
+            "num_hits": self.num_hits,
+            "num_persisted_hits": self.num_persisted_hits,
+            "num_reused_hits": self.num_reused_hits,
+            "num_misses": self.num_misses,
+            "num_collisions": self.num_collisions,
+            "num_overwrites": self.num_overwrites,
+        }
+
+    def close(self):     # a table held in this process's own memory only has the loaded file, if any, to let go of
+        if self.persisted_table is not None:
+            self.persisted_table.close()
+            self.persisted_table = None
+
+
+class SharedTranspositionTable(TranspositionTable):
+    # Transposition table whose entries live in a multiprocessing.shared_memory block, so that several processes (the workers of a
+    # parallel search, or bots playing separate games) read and fill the same table. Pickling the table, e.g. to hand it to a worker
+    # process, attaches the other process to the same block rather than copying the entries.
+    # Entries are written without locks: each key is stored XORed with a checksum of the score and info next to it, so an entry torn
+    # by two processes writing the same slot at once no longer matches its key, and is treated as a miss rather than as a wrong result.
+    # Hit/miss counters are kept per process.
+    key_mask = (1 << 64) - 1
+
+    def __init__(self, size_in_mb=64, name=None):
+        self.size_in_mb = size_in_mb
+        self.num_buckets = max(1, int(size_in_mb * 1024 * 1024) // (self.entry_size_in_bytes * self.entries_per_bucket))
+        self.num_entries = self.num_buckets * self.entries_per_bucket
+        self.is_owner = name is None    # the process that created the block is the one that frees it
+        if self.is_owner:
+            self.shared_memory = shared_memory.SharedMemory(create=True, size=self.entry_size_in_bytes * self.num_entries)     # starts zeroed, i.e. empty
+        else:
+            self.shared_memory = shared_memory.SharedMemory(name=name)
+        self.name = self.shared_memory.name
+        buffer = self.shared_memory.buf
+        self.keys = buffer[:8 * self.num_entries].cast("Q")
+        self.scores = buffer[8 * self.num_entries:16 * self.num_entries].cast("d")
+        self.infos = buffer[16 * self.num_entries:20 * self.num_entries].cast("I")
+        self.persisted_table = None
+        self.game = None
+        self.generation = 0     # kept per process; the workers of a parallel search are handed the generation of the parent
+        self.probed_utility = 0
+        self.reset_statistics()
+
+    def __reduce__(self):
+        return SharedTranspositionTable, (self.size_in_mb, self.name)
+
+    def clear(self):     # empties the table for every process attached to it
+        self.shared_memory.buf[:self.entry_size_in_bytes * self.num_entries] = bytes(self.entry_size_in_bytes * self.num_entries)
+        self.reset_statistics()
+
+    def read_slot(self, slot):     # returns (key, utility, info) of the entry in the slot, reading each field only once
+        info = self.infos[slot]
+        utility = self.scores[slot]
+        return self.keys[slot] ^ ((hash(utility) ^ info) & self.key_mask), utility, info
+
+    def probe(self, key):
+        index = (key % self.num_buckets) << 1
+        key_mask = self.key_mask
+        keys = self.keys
+        scores = self.scores
+        infos = self.infos
+        info = infos[index]
+        utility = scores[index]
+        if not info or keys[index] ^ ((hash(utility) ^ info) & key_mask) != key:
+            other_info = infos[index + 1]
+            utility = scores[index + 1]
+            if not other_info or keys[index + 1] ^ ((hash(utility) ^ other_info) & key_mask) != key:
+                if self.persisted_table is not None:
+                    return self.probe_persisted_table(key)
+                self.num_misses += 1
+                if info or other_info:
+                    self.num_collisions += 1
+                return None
+            info = other_info
+        self.num_hits += 1
+        if (info >> 9) & 255 != self.generation:
+            self.num_reused_hits += 1
+        return utility, ((info >> 3) & 63) - 1, info >> 17, (info >> 1) & 3
+
+    def probe_info(self, key):
+        index = (key % self.num_buckets) << 1
+        key_mask = self.key_mask
+        keys = self.keys
+        scores = self.scores
+        infos = self.infos
+        info = infos[index]
+        utility = scores[index]
+        if not info or keys[index] ^ ((hash(utility) ^ info) & key_mask) != key:
+            other_info = infos[index + 1]
+            utility = scores[index + 1]
+            if not other_info or keys[index + 1] ^ ((hash(utility) ^ other_info) & key_mask) != key:
+                if self.persisted_table is not None:
+                    return self.probe_persisted_info(key)
+                self.num_misses += 1
+                if info or other_info:
+                    self.num_collisions += 1
+                return 0
+            info = other_info
+        self.num_hits += 1
+        if (info >> 9) & 255 != self.generation:
+            self.num_reused_hits += 1
+        self.probed_utility = utility
+        return info
+
+    def store(self, key, utility, best_action, depth, bound_type):
+        index = (key % self.num_buckets) << 1
+        info = (depth << 17) | (self.generation << 9) | ((best_action + 1) << 3) | (bound_type << 1) | 1
+        depth_preferred_key, depth_preferred_utility, depth_preferred_info = self.read_slot(index)
+        if not depth_preferred_info or depth_preferred_key == key or depth >= depth_preferred_info >> 17 or (depth_preferred_info >> 9) & 255 != self.generation:
+            if depth_preferred_info and depth_preferred_key != key:     # previous occupant moves down to the always-replace slot
+                self.write_slot(index + 1, depth_preferred_key, depth_preferred_utility, depth_preferred_info)
+            elif self.infos[index + 1] and self.read_slot(index + 1)[0] == key:     # drop the older copy of this position
+                self.infos[index + 1] = 0
+            self.infos[index] = info
+            self.scores[index] = utility
+            self.keys[index] = key ^ ((hash(utility) ^ info) & self.key_mask)
+        else:
+            self.write_slot(index + 1, key, utility, info)
+
+    def find_num_entries_in_use(self):
+        return self.num_entries - self.infos.tolist().count(0)
+
+    def find_entries_in_use(self):
+        for slot in compress(range(len(self.infos)), self.infos):
+            key, utility, info = self.read_slot(slot)
+            if info:
+                yield key, utility, info
+
+    def write_slot(self, slot, key, utility, info):
+        if self.infos[slot] and self.read_slot(slot)[0] != key:
+            self.num_overwrites += 1
+        self.infos[slot] = info
+        self.scores[slot] = utility
+        self.keys[slot] = key ^ ((hash(utility) ^ info) & self.key_mask)
+
+    def close(self):     # detaches this process from the table; the process that created it also frees the shared memory
+        TranspositionTable.close(self)
+        self.keys.release()
+        self.scores.release()
+        self.infos.release()
+        self.shared_memory.close()
+        if self.is_owner:
+            self.shared_memory.unlink()
+            self.is_owner = False
+
+
+class PersistedTranspositionTable(object):
+    # Read-only transposition table in a file, memory-mapped so that loading it costs nothing until positions are looked up.
+    # Entries are kept in an open-addressing hash table at most half full: a position is in the first slot from key % num_slots on
+    # that holds it, before the next empty slot, so no entry has to be left out however the keys fall.
+    # File format (little-endian): a header of magic, format version, the game the entries were searched for (num_rows, num_cols,
+    # num_to_connect and heuristic version), number of slots and number of entries, then the keys ("Q"), scores ("d") and infos
+    # ("I", packed as in TranspositionTable) of every slot
+    header_struct = struct.Struct("<4sHBBBHQQ")
+    magic = b"C4TT"
+    version = 3     # version 1 had no generation bits in its infos, version 2 did not record its game
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.table = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.table) < self.header_struct.size:
+            raise Exception(f"Transposition table file {path} is truncated or corrupted")
+        magic, version, num_rows, num_cols, num_to_connect, heuristic_version, self.num_slots, self.num_entries = self.header_struct.unpack_from(self.table, 0)
+        if magic != self.magic or version != self.version:
+            raise Exception(f"{path} is not a transposition table file of version {self.version}")
+        self.game = (num_rows, num_cols, num_to_connect, heuristic_version)
+        if len(self.table) != self.header_struct.size + self.num_slots * TranspositionTable.entry_size_in_bytes:
+            raise Exception(f"Transposition table file {path} is truncated or corrupted")
+        start = self.header_struct.size
+        table_view = memoryview(self.table)
+        self.keys = table_view[start:start + 8 * self.num_slots].cast("Q")
+        self.scores = table_view[start + 8 * self.num_slots:start + 16 * self.num_slots].cast("d")
+        self.infos = table_view[start + 16 * self.num_slots:start + 20 * self.num_slots].cast("I")
+        table_view.release()
+
+    @classmethod
+    def find_game(cls, path):     # game recorded in the file at path, or None if there is no transposition table file of this version there
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as table_file:
+            header = table_file.read(cls.header_struct.size)
+        if len(header) < cls.header_struct.size:
+            return None
+        magic, version, num_rows, num_cols, num_to_connect, heuristic_version, num_slots, num_entries = cls.header_struct.unpack(header)
+        if magic != cls.magic or version != cls.version:
+            return None
+        return num_rows, num_cols, num_to_connect, heuristic_version
+
+    @classmethod
+    def find_deepest_entries(cls, entries, max_num_entries):     # (key, utility, info) of the max_num_entries positions searched deepest, one entry per position
+        deepest_entries = dict()     # key -> (utility, info)
+        for key, utility, info in entries:
+            deepest_entry = deepest_entries.get(key)
+            if deepest_entry is None or info >> 17 >= deepest_entry[1] >> 17:
+                deepest_entries[key] = (utility, info)
+        kept_keys = sorted(deepest_entries, key=lambda key: deepest_entries[key][1] >> 17, reverse=True)[:max_num_entries]
+        return [(key, *deepest_entries[key]) for key in kept_keys]
+
+    @classmethod
+    def write(cls, path, game, new_entries, max_num_new_entries, max_num_entries, saved_table=None):
+        # writes saved_table (if any) with new_entries, an iterable of (key, utility, info), merged in, keeping at most max_num_entries
+        # positions. The slots of saved_table are copied as they are while there is room, so that saving after every game does not cost
+        # a pass over every saved entry
+        max_num_merged_entries = max_num_new_entries + (saved_table.num_entries if saved_table is not None else 0)
+        if saved_table is not None and 2 * max_num_merged_entries <= saved_table.num_slots and max_num_merged_entries <= max_num_entries:
+            num_slots = saved_table.num_slots
+            num_entries = saved_table.num_entries
+            keys = array("Q", saved_table.keys.tobytes())
+            scores = array("d", saved_table.scores.tobytes())
+            infos = array("I", saved_table.infos.tobytes())
+        else:     # grown with room to spare (up to the maximum), so that the next saves can copy it
+            if saved_table is not None:
+                new_entries = chain(saved_table.find_entries_in_use(), new_entries)
+            if max_num_merged_entries > max_num_entries:     # the shallowest searches are dropped
+                new_entries = cls.find_deepest_entries(new_entries, max_num_entries)
+                max_num_merged_entries = len(new_entries)
+            num_slots = max(2, 3 * max_num_merged_entries)
+            num_entries = 0
+            keys = array("Q", bytes(8 * num_slots))
+            scores = array("d", bytes(8 * num_slots))
+            infos = array("I", bytes(4 * num_slots))
+        for key, utility, info in new_entries:
+            slot = key % num_slots
+            while infos[slot] and keys[slot] != key:
+                slot = (slot + 1) % num_slots
+            if not infos[slot]:
+                num_entries += 1
+            elif info >> 17 < infos[slot] >> 17:     # already there from a deeper search
+                continue
+            keys[slot] = key
+            scores[slot] = utility
+            infos[slot] = info
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as table_file:
+            table_file.write(cls.header_struct.pack(cls.magic, cls.version, *game, num_slots, num_entries))
+            table_file.write(keys.tobytes())
+            table_file.write(scores.tobytes())
+            table_file.write(infos.tobytes())
+        os.replace(temporary_path, path)     # readers never see a half-written file
+
+    def probe(self, key):     # (utility, best action, depth, bound type), or None
+        keys = self.keys
+        infos = self.infos
+        slot = key % self.num_slots
+        info = infos[slot]
+        while info:
+            if keys[slot] == key:
+                return self.scores[slot], ((info >> 3) & 63) - 1, info >> 17, (info >> 1) & 3
+            slot = (slot + 1) % self.num_slots
+            info = infos[slot]
+        return None
+
+    def find_entries_in_use(self):
+        keys = self.keys
+        scores = self.scores
+        infos = self.infos
+        for slot in compress(range(len(infos)), infos):
+            yield keys[slot], scores[slot], infos[slot]
+
+    def close(self):
+        self.keys.release()
+        self.scores.release()
+        self.infos.release()
+        self.table.close()
+        self.file.close()